@@ -5,6 +5,7 @@ from datetime import timedelta
 from pathlib import Path
 
 import environ
+from celery.schedules import crontab
 
 ROOT_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
 # task_manager/
@@ -295,6 +296,36 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # http://docs.celeryproject.org/en/latest/userguide/configuration.html#beat-scheduler
 # CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# https://docs.celeryproject.org/en/stable/userguide/routing.html#manual-routing
+CELERY_TASK_ROUTES = {
+    "task_manager.tasks.tasks.send_report_batch": {"queue": "email"},
+    "task_manager.tasks.tasks.drain_outbox": {"queue": "email"},
+}
+# https://docs.celeryproject.org/en/stable/userguide/periodic-tasks.html#beat-entries
+# Saving a report queues its own wake-up, this sweep catches lost wake-ups and
+# reports saved further ahead than its horizon
+CELERY_BEAT_SCHEDULE = {
+    "daily-report-scheduler": {
+        "task": "task_manager.tasks.tasks.schedule_reports",
+        "schedule": 600.0,
+        # a run still waiting in the queue when the next one is due is dropped
+        "options": {"expires": 540},
+    },
+    # failed sends queue their own retry, this catches lost ones
+    "email-outbox-drain": {
+        "task": "task_manager.tasks.tasks.drain_outbox",
+        "schedule": 300.0,
+        "options": {"expires": 290},
+    },
+    "daily-stats-rollup": {
+        "task": "task_manager.tasks.tasks.rollup_daily_stats",
+        "schedule": crontab(hour=0, minute=15),
+    },
+}
+# High priority tasks open for longer are listed as overdue in the daily digest
+TASK_OVERDUE_DAYS = env.int("DJANGO_TASK_OVERDUE_DAYS", default=3)
+# "redis" or "file", see task_manager/tasks/locks.py
+TASK_LOCK_BACKEND = env("DJANGO_TASK_LOCK_BACKEND", default="file")
 # django-allauth
 # ------------------------------------------------------------------------------
 ACCOUNT_ALLOW_REGISTRATION = env.bool("DJANGO_ACCOUNT_ALLOW_REGISTRATION", True)
@@ -351,6 +382,18 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson for JSON, MessagePack with `Accept: application/msgpack`
+    'DEFAULT_RENDERER_CLASSES': (
+        'task_manager.tasks.api.renderers.ORJSONRenderer',
+        'task_manager.tasks.api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'task_manager.tasks.api.renderers.ORJSONParser',
+        'task_manager.tasks.api.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 200,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
@@ -162,3 +162,5 @@ LOGGING = {
 
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Periodic task locks shared by every worker host
+TASK_LOCK_BACKEND = "redis"
@@ -15,7 +15,17 @@ from task_manager.tasks.views import (
      CreateTimeView, LoginView, SignUpView, GenericCancelledListView, GenericInProgressListView
 )
 
-from task_manager.tasks.api.views import GetTasksCount, GetBoardsList, GetStatusesList
+from task_manager.tasks.api.views import (
+    GetBoardFlow,
+    GetChanges,
+    GetDailyStats,
+    GetExport,
+    GetImportJob,
+    GetTasksCount,
+    GetBoardsList,
+    GetStatusesList,
+    ImportTasks,
+)
 
 from rest_framework_nested import routers
 # import DefaultRouter
@@ -87,6 +97,14 @@ urlpatterns += [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path(r'api/auth/', include('rest_auth.urls')),
     path(r'api/count/', GetTasksCount.as_view(), name='get_tasks_count'),
+    path(r'api/stats/daily/', GetDailyStats.as_view(), name='get_daily_stats'),
+    path(r'api/stats/flow/<int:board_pk>/', GetBoardFlow.as_view(), name='get_board_flow'),
+    path(r'api/sync/', GetChanges.as_view(), name='get_changes'),
+    re_path(
+        r'^api/export/(?P<kind>tasks|history)\.(?P<file_format>ndjson|csv)$', GetExport.as_view(), name='get_export'
+    ),
+    path(r'api/import/', ImportTasks.as_view(), name='import_tasks'),
+    path(r'api/import/<str:job_id>/', GetImportJob.as_view(), name='get_import_job'),
     path(r'api/list/boards/', GetBoardsList.as_view(), name='get_boards_list'),
     path(r'api/list/status/<int:board_pk>/', GetStatusesList.as_view(), name='get_statuses_list'),
     path(
@@ -1,8 +1,10 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Task, History, Report, Board
+from .models import Task, History, Report, Board, EmailOutbox, UserDailyStats
 admin.site.register(Task)
 admin.site.register(History)
 admin.site.register(Report)
 admin.site.register(Board)
+admin.site.register(EmailOutbox)
+admin.site.register(UserDailyStats)
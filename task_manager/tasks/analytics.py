@@ -0,0 +1,244 @@
+"""
+Flow analytics of a board: cycle time, weekly throughput and cumulative flow.
+
+No query reads every transition of the board. The cumulative flow is
+summed from the StatusDailyChange rows of the board, and the cycle and lead
+times come from the tasks completed within the period only. A task is done
+when its completed flag is set, at `completed_at`, whatever its status is
+called. Every
+metric is computed on whole NumPy arrays, never per task in Python. Times
+are seconds since the epoch, days and weeks are UTC.
+
+The daily changes are written along with the counters, so a task that is
+deleted or moved to another board leaves the flow on that day.
+`rebuild_status_changes` recomputes them from the history instead, where a
+live task is on its board from the day it was created.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, FloatField, Func, IntegerField, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from task_manager.tasks.models import History, Status, StatusDailyChange, Task
+
+EPOCH = date(1970, 1, 1)
+DAY = 24 * 60 * 60
+WEEK = 7 * DAY
+# the epoch was a Thursday, the first Monday is 4 days later
+FIRST_MONDAY = 4 * DAY
+
+# Cycle and lead times of a day or more go into one bucket per day, the
+# last bucket holds everything longer
+HISTOGRAM_DAYS = 60
+PERCENTILES = (50, 85, 95)
+CHUNK_SIZE = 10_000
+
+DONE_DTYPE = np.dtype([("created", "f8"), ("first", "f8"), ("finished", "f8")])
+# as read from the database, the first move is None for a task that never moved
+DONE_ROW_DTYPE = np.dtype([("created", "f8"), ("first", "O"), ("finished", "f8")])
+
+
+class Epoch(Func):
+    """
+    Seconds since the epoch of a datetime, computed by the database so the
+    rows carry plain numbers instead of datetimes to parse
+    """
+    template = "EXTRACT(EPOCH FROM %(expressions)s)"
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template="((julianday(%(expressions)s) - 2440587.5) * 86400.0)", **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="UNIX_TIMESTAMP(%(expressions)s)", **extra_context)
+
+
+def load_changes(board_id):
+    """
+    Returns (status, day, change) arrays of the daily status changes of a
+    board, a few rows per day
+    """
+    rows = list(
+        StatusDailyChange.objects.filter(board_id=board_id).exclude(change=0).values_list("status", "date", "change")
+    )
+    status = np.array([row[0] for row in rows], dtype="i8")
+    day = np.array([(row[1] - EPOCH).days * DAY for row in rows], dtype="f8")
+    change = np.array([row[2] for row in rows], dtype="i8")
+    return status, day, change
+
+
+def load_done(board_id, since):
+    """
+    Returns the creation, first move and completion times of the live tasks
+    of a board completed at or after `since`, read through the board and
+    completion index with one lookup each in the history of their task. The
+    first move is NaN for a task completed without ever changing status.
+    """
+    first = (
+        History.objects.filter(task=OuterRef("pk")).order_by().values("task").annotate(first=Min("change_date"))
+        .values("first")
+    )
+    rows = (
+        Task.objects.filter(
+            board_id=board_id,
+            completed=True,
+            deleted=False,
+            completed_at__gte=datetime.fromtimestamp(since, timezone.utc),
+        )
+        .order_by()
+        .values_list(Epoch("date_created"), Epoch(Subquery(first)), Epoch("completed_at"))
+    )
+    return np.fromiter(rows.iterator(chunk_size=CHUNK_SIZE), dtype=DONE_ROW_DTYPE).astype(DONE_DTYPE)
+
+
+def distribution(seconds):
+    """
+    Summary and per day histogram of durations in seconds
+    """
+    if not len(seconds):
+        return {"count": 0, "mean": None, "percentiles": {}, "histogram": []}
+    days = seconds / DAY
+    buckets = np.minimum(days.astype("i8"), HISTOGRAM_DAYS)
+    return {
+        "count": int(len(days)),
+        "mean": round(float(days.mean()), 2),
+        "percentiles": {
+            f"p{percentile}": round(float(value), 2)
+            for percentile, value in zip(PERCENTILES, np.percentile(days, PERCENTILES))
+        },
+        "histogram": np.bincount(buckets).tolist(),
+    }
+
+
+def week_index(seconds):
+    return (seconds - FIRST_MONDAY) // WEEK
+
+
+def week_date(index):
+    return EPOCH + timedelta(seconds=FIRST_MONDAY + index * WEEK)
+
+
+def day_index(seconds, first_day):
+    """
+    Day of every time counted from `first_day`, earlier times fall on day 0
+    where they only add to the opening counts
+    """
+    return np.maximum((seconds // DAY).astype("i8") - first_day, 0)
+
+
+def flow_cells(columns, days, status, day, weights=None):
+    """
+    Returns the flattened days x columns matrix of the number (or summed
+    `weights`) of events per day and status. Events of other statuses and
+    after the last day are left out.
+    """
+    column = np.searchsorted(columns, status)
+    known = (column < len(columns)) & (day < days)
+    known[known] = columns[column[known]] == status[known]
+    cells = np.bincount(
+        day[known] * len(columns) + column[known],
+        weights=None if weights is None else weights[known],
+        minlength=days * len(columns),
+    )
+    return cells.astype("i8")
+
+
+def flow_metrics(done, changes, columns, since, now):
+    """
+    Computes the flow metrics of one board.
+
+    `done` and `changes` are as returned by load_done and load_changes,
+    `columns` are the sorted status ids of the cumulative flow. `since` and
+    `now` are epoch seconds bounding the reported period.
+    """
+    # cycle time from the first move, of the tasks that moved, lead time
+    # from creation
+    finished = done["finished"]
+    cycle = finished - done["first"]
+    cycle_time = distribution(cycle[~np.isnan(cycle)])
+    lead_time = distribution(finished - done["created"])
+
+    # tasks done per week, empty weeks included
+    first_week = int(week_index(since))
+    weeks = week_index(finished).astype("i8") - first_week
+    counts = np.bincount(weeks, minlength=int(week_index(now)) - first_week + 1)
+    throughput = [{"week": week_date(first_week + i), "count": count} for i, count in enumerate(counts.tolist())]
+
+    # cumulative flow: the changes before the period open it, the others
+    # are accumulated day by day
+    first_day = int(since // DAY)
+    days = int(now // DAY) - first_day + 1
+    status, day, change = changes
+    cells = flow_cells(columns, days, status, day_index(day, first_day), change)
+    flow = cells.reshape(days, len(columns)).cumsum(axis=0)
+
+    return {
+        "cycle_time": cycle_time,
+        "lead_time": lead_time,
+        "throughput": throughput,
+        "cumulative_flow": {
+            "days": [EPOCH + timedelta(days=first_day + i) for i in range(days)],
+            "counts": flow.T.tolist(),
+        },
+    }
+
+
+def board_flow(board, days, now=None):
+    """
+    Returns the flow metrics of a board over the last `days` days
+    """
+    now = (now or timezone.now()).timestamp()
+    since = (now // DAY - days + 1) * DAY
+    statuses = list(Status.objects.filter(board=board, deleted=False).order_by("id").values("id", "title"))
+    columns = np.array([status["id"] for status in statuses], dtype="i8")
+
+    metrics = flow_metrics(load_done(board.id, since), load_changes(board.id), columns, since, now)
+    metrics["cumulative_flow"]["statuses"] = [
+        dict(status, counts=counts) for status, counts in zip(statuses, metrics["cumulative_flow"].pop("counts"))
+    ]
+    return metrics
+
+
+def rebuild_status_changes(boards=None):
+    """
+    Recompute the daily status changes from the task and history tables:
+    every live task enters its first status on the day it was created and
+    moves with its transitions. Returns the number of rows written.
+    """
+    tasks = Task.objects.filter(deleted=False)
+    history = History.objects.filter(task__deleted=False)
+    rows = StatusDailyChange.objects.all()
+    if boards is not None:
+        tasks = tasks.filter(board__in=boards)
+        history = history.filter(task__board__in=boards)
+        rows = rows.filter(board__in=boards)
+
+    changes = defaultdict(int)
+    first_status = History.objects.filter(task=OuterRef("pk")).order_by("change_date", "id").values("old_status")[:1]
+    created = tasks.annotate(
+        first_status=Coalesce(Subquery(first_status), "status", output_field=IntegerField()),
+        day=TruncDate("date_created", tzinfo=timezone.utc),
+    )
+    for row in created.order_by().values("board", "first_status", "day").annotate(count=Count("id")):
+        if row["first_status"] is not None:
+            changes[(row["board"], row["first_status"], row["day"])] += row["count"]
+    moves = history.annotate(day=TruncDate("change_date", tzinfo=timezone.utc))
+    for row in moves.order_by().values("task__board", "old_status", "new_status", "day").annotate(count=Count("id")):
+        changes[(row["task__board"], row["new_status"], row["day"])] += row["count"]
+        changes[(row["task__board"], row["old_status"], row["day"])] -= row["count"]
+
+    new_rows = [
+        StatusDailyChange(board_id=board_id, status_id=status_id, date=day, change=change)
+        for (board_id, status_id, day), change in changes.items()
+        if change
+    ]
+    with transaction.atomic():
+        rows.delete()
+        StatusDailyChange.objects.bulk_create(new_rows, batch_size=1000)
+    return len(new_rows)
@@ -0,0 +1,89 @@
+"""
+Conditional GET for API views.
+
+Responses are validated against the version stamp of the user's data
+(`task_manager.tasks.cache.get_version`), which every write replaces. A
+request whose ETag or Last-Modified still matches is answered with 304
+before the view runs its queries or serializers.
+"""
+import hashlib
+import time
+
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from task_manager.tasks.cache import get_version
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+    default_detail = "Not modified."
+
+
+def etag_matches(header, etag):
+    """
+    Weak comparison of an If-None-Match header with `etag`
+    """
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag and Last-Modified to successful GET responses and answers
+    matching If-None-Match / If-Modified-Since requests with 304.
+
+    The validators cover the data of the user, views that depend on
+    something else override `get_version()`.
+    """
+
+    def get_version(self, request):
+        """
+        Returns the version stamp, an integer of nanoseconds that grows with
+        every write to the data the view reads
+        """
+        return get_version(request.user.pk)
+
+    def get_etag(self, request, version):
+        # the same data renders differently per URL and format
+        key = f"{version}:{request.get_full_path()}:{request.accepted_media_type}"
+        return f'W/"{hashlib.md5(key.encode()).hexdigest()}"'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.last_modified = None
+        if request.method not in ("GET", "HEAD"):
+            return
+
+        version = self.get_version(request)
+        self.etag = self.get_etag(request, version)
+        # HTTP dates have whole seconds, the one after the stamp is safe to
+        # hand out once it has begun: later writes get later seconds
+        self.last_modified = version // 1_000_000_000 + 1
+
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is not None:
+            if etag_matches(if_none_match, self.etag):
+                raise NotModified()
+            return
+        if_modified_since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+        if if_modified_since is not None and self.last_modified <= if_modified_since:
+            raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "etag", None) and response.status_code in (200, 304):
+            response["ETag"] = self.etag
+            if time.time() >= self.last_modified:
+                response["Last-Modified"] = http_date(self.last_modified)
+            # clients must revalidate, shared caches must not store
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,91 @@
+"""
+Fast JSON and MessagePack renderers and parsers for the REST API.
+
+`ORJSONRenderer` produces the same documents as DRF's `JSONRenderer`:
+datetimes, dates and UUIDs are encoded natively by orjson in the format of
+DRF's encoder (UTC as "Z"), anything else orjson does not know, such as
+Decimal or the querysets some views return in their data, falls back to
+`rest_framework.utils.encoders.JSONEncoder.default`.
+
+MessagePack is negotiated with `Accept: application/msgpack` (or
+`?format=msgpack`) and encodes values the way JSON does, so both formats
+carry the same strings for dates, UUIDs and decimals.
+"""
+import msgpack
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# DRF's fallbacks for the types neither format knows
+encode_default = JSONEncoder().default
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Renders JSON with orjson. Indented output, asked for with an `indent`
+    media type parameter, is left to DRF's renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type or "", renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            rendered = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError as error:
+            raise TypeError(str(error)) from error
+        # like DRF, keep the output valid JavaScript
+        return rendered.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class ORJSONParser(BaseParser):
+    """
+    Parses JSON request bodies with orjson
+    """
+    media_type = "application/json"
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        data = stream.read()
+        try:
+            if encoding.lower().replace("-", "") != "utf8":
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except (orjson.JSONDecodeError, UnicodeDecodeError) as error:
+            raise ParseError(f"JSON parse error - {error}")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack, with the values JSON would carry
+    """
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encode_default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack request bodies
+    """
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as error:
+            raise ParseError(f"MessagePack parse error - {error}")
@@ -0,0 +1,89 @@
+"""
+Serialization of `values()` rows for read-only list endpoints.
+
+A ModelSerializer builds every item through its fields: one attribute
+lookup, `get_attribute()` and `to_representation()` call per field and row,
+plus a query per row for each related attribute that was not joined.
+`RowMapper` reads the columns the serializer needs in one query, joins
+included, and turns each row into the same output with a single `zip`.
+"""
+from functools import lru_cache
+from operator import itemgetter
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import fields, relations
+
+# Fields whose output is the database value as is
+PASSTHROUGH_FIELDS = (
+    fields.BooleanField,
+    fields.CharField,
+    fields.ChoiceField,
+    fields.IntegerField,
+    relations.PrimaryKeyRelatedField,
+)
+
+# Fields whose `to_representation()` is still applied, to the column only
+CONVERTED_FIELDS = (
+    fields.DateField,
+    fields.DateTimeField,
+    fields.DecimalField,
+    fields.FloatField,
+    fields.UUIDField,
+)
+
+
+class RowMapper:
+    """
+    Maps `values()` rows to the representation of `serializer_class`,
+    compiled once from its readable fields, or only those in `fields`.
+    Fields of other types than the ones above are not supported and raise
+    ImproperlyConfigured.
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        self.keys, self.lookups, self.converters = [], [], []
+        for name, field in serializer_class().fields.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue
+            if not isinstance(field, PASSTHROUGH_FIELDS + CONVERTED_FIELDS) or field.source == "*":
+                raise ImproperlyConfigured(
+                    f"{serializer_class.__name__}.{name}: {type(field).__name__} cannot be read from rows"
+                )
+            self.keys.append(name)
+            # "board.title" reads the board__title column of a join
+            self.lookups.append("__".join(field.source_attrs))
+            if isinstance(field, CONVERTED_FIELDS):
+                self.converters.append((name, field.to_representation))
+        # itemgetter of a single item would return it instead of a tuple
+        lookups = self.lookups
+        self.getter = itemgetter(*lookups) if len(lookups) > 1 else lambda row: (row[lookups[0]],)
+
+    def values(self, queryset):
+        """
+        Returns `queryset` as rows of the serialized columns and of the
+        columns it is ordered on, keyset pagination reads its position from
+        them
+        """
+        ordering = [name.lstrip("-") for name in queryset.query.order_by if isinstance(name, str)]
+        return queryset.values(*dict.fromkeys([*self.lookups, *ordering]))
+
+    def __call__(self, rows):
+        """
+        Returns the representation of each row
+        """
+        keys, getter = self.keys, self.getter
+        data = [dict(zip(keys, getter(row))) for row in rows]
+        for key, convert in self.converters:
+            for item in data:
+                if item[key] is not None:
+                    item[key] = convert(item[key])
+        return data
+
+
+@lru_cache(maxsize=256)
+def row_mapper(serializer_class, fields=None):
+    """
+    The RowMapper of a serializer class and a frozenset of its fields,
+    compiled on first use
+    """
+    return RowMapper(serializer_class, fields)
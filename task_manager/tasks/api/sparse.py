@@ -0,0 +1,129 @@
+"""
+Sparse fieldsets for API views.
+
+`?fields=id,title` limits a GET response to the listed serializer fields.
+The selection is applied twice: `SparseFieldsetFilter` defers the columns no
+selected field reads, and `SparseFieldsetMixin` drops the other fields from
+the serializer, so both the rows read and the payload shrink.
+"""
+from functools import lru_cache
+
+import coreapi
+import coreschema
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+FIELDS_PARAM = "fields"
+
+
+@lru_cache(maxsize=None)
+def readable_fields(serializer_class):
+    """
+    Returns the readable fields of a serializer class by name, in order
+    """
+    return {name: field for name, field in serializer_class().fields.items() if not field.write_only}
+
+
+def parse_fields(request, serializer_class):
+    """
+    Returns the set of field names selected by the request, None when the
+    request does not select any
+    """
+    value = request.query_params.get(FIELDS_PARAM, "")
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    if not names:
+        return None
+    available = readable_fields(serializer_class)
+    unknown = sorted(names - set(available))
+    if unknown:
+        raise ValidationError({
+            FIELDS_PARAM: f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(available)}."
+        })
+    return frozenset(names)
+
+
+def model_columns(model, fields):
+    """
+    Returns the columns the given serializer fields read, as `only()`
+    names, and the relations to join for them. A field of a related row
+    (`board.title`) reads it through a join, other sources load the foreign
+    key or nothing.
+    """
+    columns, relations = set(), set()
+    concrete = {field.name: field for field in model._meta.concrete_fields}
+    for field in fields:
+        if not field.source_attrs or field.source_attrs[0] not in concrete:
+            continue
+        name, *rest = field.source_attrs
+        columns.add(name)
+        related = concrete[name].related_model
+        if related is not None and len(rest) == 1 and rest[0] in {f.name for f in related._meta.concrete_fields}:
+            columns.add(f"{name}__{rest[0]}")
+            relations.add(name)
+    return columns, relations
+
+
+class SparseFieldsetMixin:
+    """
+    Drops the fields not selected with `?fields=` from the serializer of
+    GET requests. Views using it list `SparseFieldsetFilter` in their
+    `filter_backends` to defer the columns as well.
+    """
+
+    def get_sparse_fields(self):
+        if not hasattr(self, "_sparse_fields"):
+            request = getattr(self, "request", None)
+            self._sparse_fields = None
+            if request is not None and request.method in ("GET", "HEAD"):
+                self._sparse_fields = parse_fields(request, self.get_serializer_class())
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields:
+            target = getattr(serializer, "child", serializer)
+            for name in list(target.fields):
+                if name not in fields:
+                    target.fields.pop(name)
+        return serializer
+
+
+class SparseFieldsetFilter(BaseFilterBackend):
+    """
+    Loads only the columns of the fields selected with `?fields=`, and the
+    primary key
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        fields = view.get_sparse_fields()
+        if not fields:
+            return queryset
+        available = readable_fields(view.get_serializer_class())
+        columns, relations = model_columns(queryset.model, [available[name] for name in fields])
+        return queryset.select_related(*relations).only(queryset.model._meta.pk.name, *columns)
+
+    def get_description(self, view):
+        names = ", ".join(readable_fields(view.get_serializer_class()))
+        return f"Comma separated fields to include in the response, out of {names}. All of them by default."
+
+    def get_schema_fields(self, view):
+        return [
+            coreapi.Field(
+                name=FIELDS_PARAM,
+                required=False,
+                location="query",
+                schema=coreschema.String(description=self.get_description(view)),
+            )
+        ]
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": FIELDS_PARAM,
+                "required": False,
+                "in": "query",
+                "description": self.get_description(view),
+                "schema": {"type": "string"},
+            },
+        ]
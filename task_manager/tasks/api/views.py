@@ -1,16 +1,59 @@
 
+from datetime import timedelta
 from http.client import responses
 from urllib import response
+from uuid import uuid4
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.serializers import ModelSerializer, CharField, IntegerField, ListField, PrimaryKeyRelatedField
 
 from task_manager.tasks.models import (
     PRIORITY_CHOICES,
     Board,
     History,
     Task,
-    Status
+    Status,
+    UserDailyStats,
 )
+from task_manager.tasks.api.conditional import ConditionalGetMixin
+from task_manager.tasks.api.rows import row_mapper
+from task_manager.tasks.api.sparse import SparseFieldsetFilter, SparseFieldsetMixin
+from task_manager.tasks.bulk import create_tasks, delete_tasks, update_tasks
+from task_manager.tasks.cache import cached_board_flow
+from task_manager.tasks.counters import user_totals
+from task_manager.tasks.export import CONTENT_TYPES, export_stream
+from task_manager.tasks.importer import (
+    FORMATS as IMPORT_FORMATS,
+    INLINE_MAX_BYTES,
+    TRELLO_MAX_BYTES,
+    ImportFormatError,
+    get_job,
+    guess_format,
+    import_file,
+    save_job,
+    save_upload,
+)
+from task_manager.tasks.pagination import (
+    HistoryPagination,
+    TaskPagination,
+    encode_cursor,
+    get_position,
+    keyset_page,
+)
+from task_manager.tasks.search import search_tasks
+from task_manager.tasks.sync import changes
+from task_manager.tasks.tasks import import_tasks_job
 
 User = get_user_model()
 
@@ -20,10 +63,10 @@ from django_filters.rest_framework import (
     DjangoFilterBackend,
     FilterSet,
     IsoDateTimeFilter,
+    ModelChoiceFilter,
 )
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.serializers import ModelSerializer, CharField
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
@@ -31,8 +74,27 @@ from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from rest_framework.response import Response
 
 
+def user_statuses(request):
+    """
+    Statuses the requesting user can filter on, evaluated per request
+    """
+    if request is None:
+        return Status.objects.none()
+    return Status.objects.filter(user=request.user, deleted=False)
+
+
+def user_boards(request):
+    """
+    Boards the requesting user can filter on, evaluated per request
+    """
+    if request is None:
+        return Board.objects.none()
+    return Board.objects.filter(user=request.user, deleted=False)
+
+
 class FilterClass(FilterSet):
     title = CharFilter(lookup_expr="icontains")
+    search = CharFilter(method="filter_search", label="Search title and description")
     completed = ChoiceFilter(
         label="Completion",
         choices=(
@@ -40,10 +102,13 @@ class FilterClass(FilterSet):
             (False, "Non-completed tasks"),
         )
     )
-    status = ChoiceFilter(choices=Status.objects.filter(deleted=False).values_list("id", "title"))
+    status = ModelChoiceFilter(queryset=user_statuses)
     priority = ChoiceFilter(choices=PRIORITY_CHOICES)
     # board = ChoiceFilter(choices=Board.objects.filter(deleted=False).values_list("id", "title"))
 
+    def filter_search(self, queryset, name, value):
+        return search_tasks(queryset, value)
+
 
 # class UserSerializer(ModelSerializer):
 #     class Meta:
@@ -54,7 +119,6 @@ class FilterClass(FilterSet):
 
 class TaskSerializer(ModelSerializer):
 
-    priority = ChoiceFilter(choices=PRIORITY_CHOICES)
     board_title = CharField(source="board.title", read_only=True)
     class Meta:
         model = Task
@@ -64,7 +128,53 @@ class TaskSerializer(ModelSerializer):
             "status", "board", "board_title",  "completed"
         ]
 
-class TaskViewSet(ModelViewSet, APIView):
+
+class PreloadedPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """
+    Related field taking `queryset` as a function of the request, like the
+    filters above. Its rows are loaded with one query and every item of a
+    list serializer is resolved from them.
+    """
+
+    def get_queryset(self):
+        return self.queryset(self.context.get("request"))
+
+    def to_internal_value(self, data):
+        if not hasattr(self, "objects"):
+            self.objects = self.get_queryset().in_bulk()
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return self.objects[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class BulkTaskSerializer(TaskSerializer):
+    status = PreloadedPrimaryKeyRelatedField(queryset=user_statuses, allow_null=True, required=False)
+    board = PreloadedPrimaryKeyRelatedField(queryset=user_boards)
+
+    def validate(self, attrs):
+        status = attrs.get("status")
+        board = attrs.get("board")
+        if status is not None and board is not None and status.board_id != board.id:
+            raise ValidationError({"status": "Status does not belong to the board."})
+        return attrs
+
+
+class BulkUpdateTaskSerializer(BulkTaskSerializer):
+    id = IntegerField()
+
+    def validate(self, attrs):
+        # partial updates make every field optional, except this one
+        if "id" not in attrs:
+            raise ValidationError({"id": "This field is required."})
+        return super().validate(attrs)
+
+
+class TaskViewSet(ConditionalGetMixin, SparseFieldsetMixin, ModelViewSet, APIView):
     """
 
     All tasks operations are performed by the user who created the task.
@@ -77,8 +187,9 @@ class TaskViewSet(ModelViewSet, APIView):
 
     permission_classes = (IsAuthenticated,)
 
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, SparseFieldsetFilter)
     filterset_class = FilterClass
+    pagination_class = TaskPagination
 
     # define custom tag for swagger documentation of this viewset
     # https://www.django-rest-framework.org/api-guide/swagger/
@@ -86,9 +197,10 @@ class TaskViewSet(ModelViewSet, APIView):
 
     def get_queryset(self):
         id = self.kwargs["board_pk"] if "board_pk" in self.kwargs else None
+        tasks = Task.objects.filter(user=self.request.user, board__deleted=False, deleted=False)
         if id:
-            return Task.objects.filter(user=self.request.user, board__deleted=False,deleted=False, board__id=id)
-        return Task.objects.filter(user=self.request.user, board__deleted=False,deleted=False)
+            tasks = tasks.filter(board__id=id)
+        return tasks.order_by("priority", "id")
 
     def perform_create(self, serializer):
         return serializer.save(user=self.request.user)
@@ -96,12 +208,65 @@ class TaskViewSet(ModelViewSet, APIView):
     def perform_destroy(self, instance):
         return instance.soft_delete()
 
+    def list(self, request, *args, **kwargs):
+        # the serializer columns are read with values(), the board title
+        # joined in the same query
+        mapper = row_mapper(self.get_serializer_class(), self.get_sparse_fields())
+        rows = mapper.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(mapper(page))
+        return Response(mapper(rows))
+
+    bulk_max_items = 500
+
+    def get_bulk_items(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            raise ValidationError({"non_field_errors": ["Expected a non-empty list of tasks."]})
+        if len(request.data) > self.bulk_max_items:
+            raise ValidationError({"non_field_errors": [f"At most {self.bulk_max_items} tasks per request."]})
+        return request.data
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Create up to 500 tasks at once. Errors are listed per task, nothing
+        is saved unless every task is valid.
+        """
+        serializer = BulkTaskSerializer(
+            data=self.get_bulk_items(request), many=True, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        tasks = create_tasks(request.user, serializer.validated_data)
+        return Response(TaskSerializer(tasks, many=True).data, status=201)
+
+    @bulk.mapping.patch
+    def bulk_update(self, request, *args, **kwargs):
+        """
+        Update up to 500 tasks at once, each item has the `id` of the task and
+        the fields to change
+        """
+        serializer = BulkUpdateTaskSerializer(
+            data=self.get_bulk_items(request), many=True, partial=True, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        tasks = update_tasks(request.user, serializer.validated_data)
+        return Response(TaskSerializer(tasks, many=True).data)
+
+    @bulk.mapping.delete
+    def bulk_destroy(self, request, *args, **kwargs):
+        """
+        Delete up to 500 tasks at once, given a list of their ids
+        """
+        ids = ListField(child=IntegerField(), min_length=1, max_length=self.bulk_max_items).run_validation(request.data)
+        return Response({"deleted": delete_tasks(request.user, ids)})
+
 
 class HistoryFilter(FilterSet):
     # Filter date and time
     change_date = IsoDateTimeFilter(label="Modified Date Time")
-    new_status = ChoiceFilter(choices=Status.objects.filter(deleted=False).values_list("id", "title"))
-    old_status = ChoiceFilter(choices=Status.objects.filter(deleted=False).values_list("id", "title"))
+    new_status = ModelChoiceFilter(queryset=user_statuses)
+    old_status = ModelChoiceFilter(queryset=user_statuses)
 
 
 class HistTaskSer(ModelSerializer):
@@ -124,14 +289,16 @@ class HistoryViewSet(ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = HistoryFilter
     serializer_class = HistorySerializer
+    pagination_class = HistoryPagination
 
     queryset = History.objects.all()
 
     def get_queryset(self):
         # allow access to only the user's history
         id = self.kwargs["task_pk"] if "task_pk" in self.kwargs else None
-        return History.objects.filter(task__user=self.request.user, task__deleted=False, task__id=id
-        ).order_by("-change_date")
+        return History.objects.filter(
+            task__user=self.request.user, task__deleted=False, task__id=id
+        ).order_by("-change_date", "-id")
 
 class BoardSerializer(ModelSerializer):
     class Meta:
@@ -142,13 +309,14 @@ class BoardSerializer(ModelSerializer):
 class BoardFilterClass(FilterSet):
     title = CharFilter(lookup_expr="icontains")
 
-class BoardViewSet(ModelViewSet):
+
+class BoardViewSet(ConditionalGetMixin, SparseFieldsetMixin, ModelViewSet):
     
         permission_classes = (IsAuthenticated,)
     
         queryset = Board.objects.all()
         serializer_class = BoardSerializer
-        filter_backends = (DjangoFilterBackend,)
+        filter_backends = (DjangoFilterBackend, SparseFieldsetFilter)
         filterset_class = BoardFilterClass
     
         def get_queryset(self):
@@ -166,14 +334,14 @@ class StatusSerializer(ModelSerializer):
     
 class StatusFilterClass(FilterSet):
     title = CharFilter(lookup_expr="icontains")
-    board = ChoiceFilter(choices=Board.objects.filter(deleted=False).values_list("id", "title"))
+    board = ModelChoiceFilter(queryset=user_boards)
 
 
-class StatusViewSet(ModelViewSet):
+class StatusViewSet(ConditionalGetMixin, SparseFieldsetMixin, ModelViewSet):
     permission_classes = (IsAuthenticated,)
     queryset = Status.objects.all()
     serializer_class = StatusSerializer
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, SparseFieldsetFilter)
     filterset_class = StatusFilterClass
 
 
@@ -198,22 +366,19 @@ class GetTasksCount(APIView):
         """
         Returns the number of tasks in each board
         """
-        total_tasks = Task.objects.filter(user=request.user, deleted=False).count()
-        incomplete = Task.objects.filter(user=request.user, completed=False, deleted=False).count()
-        completed = Task.objects.filter(user=request.user, completed=True, deleted=False).count()
-        permission_classes = (IsAuthenticated,)
+        totals = user_totals(request.user)
 
         response_json = {
             "user": request.user.name,
-            "total": total_tasks,
-            "incomplete": incomplete,
-            "completed": completed,
+            "total": totals["total"],
+            "incomplete": totals["total"] - totals["completed"],
+            "completed": totals["completed"],
         }
 
         return Response(response_json, status=200)
 
 
-class GetBoardsList(APIView):
+class GetBoardsList(ConditionalGetMixin, APIView):
     """
     Returns the list of boards
     """
@@ -234,33 +399,335 @@ class GetBoardsList(APIView):
         return Response(response_json, status=200)
 
 
-class GetStatusesList(APIView):
+class GetStatusesList(ConditionalGetMixin, APIView):
     """
     Returns status and corresponding tasks
+
+    Every column holds at most `limit` tasks along with a `next` cursor.
+    Pass `status` and `cursor` to fetch the next page of a single column.
     """
     permission_classes = (IsAuthenticated,)
 
+    page_size = 50
+    max_page_size = 200
+    ordering = ("priority", "id")
+    task_fields = ("id", "title", "status", "description", "priority", "completed", "date_created")
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get("limit", self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(limit, self.max_page_size))
+
     def get(self, request, board_pk,format=None):
         """
         Returns status and corresponding tasks
         """
         tasks = Task.objects.filter(user=request.user, board__id=board_pk, deleted=False)
-        
-        res = []
+        limit = self.get_limit(request)
+
+        if "status" in request.query_params:
+            return self.get_column(request, tasks, limit)
+
+        columns = {}
+        for status in Status.objects.filter(board__id=board_pk, deleted=False).values("id", "title"):
+            columns[status["id"]] = {
+                "id": status["id"],
+                "count": 0,
+                "title": status["title"],
+                "tasks": [],
+                "next": None,
+            }
+
+        tasks = tasks.filter(status__in=list(columns))
+        counts = tasks.values("status").annotate(count=Count("id")).order_by()
+        for row in counts:
+            columns[row["status"]]["count"] = row["count"]
+
+        for task in self.column_heads(tasks, limit + 1):
+            column = columns[task["status"]]
+            if len(column["tasks"]) < limit:
+                column["tasks"].append(task)
+            else:
+                column["next"] = encode_cursor(get_position(column["tasks"][-1], self.ordering))
+
+        response_json = {
+            "results": list(columns.values()),
+        }
+
+        return Response(response_json, status=200)
 
-        for status in Status.objects.filter(board__id=board_pk, deleted=False):
-            res.append({
-                "id": status.id,
-                "count": tasks.filter(status=status).count(),
-                "title": status.title,
-                "tasks": tasks.filter(status=status).values("id", "title", "status", "description", "priority", "completed", "date_created"),
-            })
+    def column_heads(self, tasks, limit):
+        """
+        Returns the first `limit` tasks of every status in one query. The
+        tasks are numbered per status in a subquery, Django cannot filter on
+        a window function directly.
+        """
+        ranked = tasks.annotate(
+            column_position=Window(
+                RowNumber(),
+                partition_by=[F("status")],
+                order_by=[F(name[1:]).desc() if name.startswith("-") else F(name).asc() for name in self.ordering],
+            )
+        ).values("id", "column_position")
+        sql, params = ranked.query.sql_with_params()
+        heads = RawSQL(f"SELECT id FROM ({sql}) ranked WHERE column_position <= %s", (*params, limit))
+        return tasks.filter(id__in=heads).order_by("status", *self.ordering).values(*self.task_fields)
+
+    def get_column(self, request, tasks, limit):
+        """
+        Returns the next page of tasks of a single status
+        """
+        try:
+            status_id = int(request.query_params["status"])
+        except ValueError:
+            raise ValidationError({"status": "A valid integer is required."})
+
+        tasks = tasks.filter(status__id=status_id, status__deleted=False).values(*self.task_fields)
+        page, next_cursor, previous_cursor = keyset_page(
+            tasks, self.ordering, request.query_params.get("cursor"), limit
+        )
 
         response_json = {
-            "results": res,
+            "id": status_id,
+            "tasks": page,
+            "next": next_cursor,
+            "previous": previous_cursor,
         }
 
         return Response(response_json, status=200)
 
 
+class GetDailyStats(APIView):
+    """
+    Returns the daily task stats of the user between `start` and `end`
+    (YYYY-MM-DD, both included), by default the last 30 days
+    """
+    permission_classes = (IsAuthenticated,)
+
+    default_days = 30
+    max_days = 366
+    fields = ("date", "created", "completed", "cancelled", "transitions", "open_high", "open_medium", "open_low")
+
+    def get_date(self, request, name, default):
+        value = request.query_params.get(name)
+        if value is None:
+            return default
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({name: "Enter a date in YYYY-MM-DD format."})
+        return day
+
+    def get(self, request, format=None):
+        """
+        Returns the daily task stats of the user
+        """
+        end = self.get_date(request, "end", timezone.localdate() - timedelta(days=1))
+        start = self.get_date(request, "start", end - timedelta(days=self.default_days - 1))
+        if start > end or (end - start).days >= self.max_days:
+            raise ValidationError({"start": f"Enter a range of 1 to {self.max_days} days."})
+
+        rows = UserDailyStats.objects.filter(user=request.user, date__range=(start, end)).order_by("date")
+
+        response_json = {
+            "start": start,
+            "end": end,
+            "results": list(rows.values(*self.fields)),
+        }
+
+        return Response(response_json, status=200)
+
+
+class GetBoardFlow(APIView):
+    """
+    Returns the cycle time, weekly throughput and cumulative flow of a board
+    over the last `days` days, 90 by default
+    """
+    permission_classes = (IsAuthenticated,)
+
+    default_days = 90
+    max_days = 730
+
+    def get(self, request, board_pk, format=None):
+        """
+        Returns the flow metrics of a board
+        """
+        board = get_object_or_404(Board, id=board_pk, user=request.user, deleted=False)
+        try:
+            days = int(request.query_params.get("days", self.default_days))
+        except ValueError:
+            raise ValidationError({"days": "A valid integer is required."})
+        if not 1 <= days <= self.max_days:
+            raise ValidationError({"days": f"Enter a number of days from 1 to {self.max_days}."})
+
+        response_json = {
+            "board": board.id,
+            "days": days,
+            **cached_board_flow(board, days),
+        }
+
+        return Response(response_json, status=200)
+
+
+class GetChanges(APIView):
+    """
+    Returns the boards, statuses and tasks changed since `cursor`
+
+    Without a cursor every live row is returned. Pass the returned `cursor`
+    on the next call to get only what changed since, soft deleted rows are
+    listed by id under `deleted_boards`, `deleted_statuses` and
+    `deleted_tasks`. While `more` is true there are further pages to fetch.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    page_size = 500
+    max_page_size = 1000
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get("limit", self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(limit, self.max_page_size))
+
+    def get(self, request, format=None):
+        """
+        Returns the boards, statuses and tasks changed since `cursor`
+        """
+        response_json = changes(request.user, request.query_params.get("cursor"), self.get_limit(request))
+
+        return Response(response_json, status=200)
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """
+    Always picks the first renderer, for views whose successful responses
+    are not rendered by DRF
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class GetExport(APIView):
+    """
+    Streams all tasks or all status changes of the user as NDJSON or CSV,
+    optionally only those of `board` and gzipped with `gzip=1`
+    """
+    permission_classes = (IsAuthenticated,)
+    # clients may ask for text/csv, which no renderer produces
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, kind, file_format, format=None):
+        """
+        Streams all tasks or all status changes of the user
+        """
+        board = None
+        if "board" in request.query_params:
+            try:
+                board_id = int(request.query_params["board"])
+            except ValueError:
+                raise ValidationError({"board": "A valid integer is required."})
+            board = get_object_or_404(Board, id=board_id, user=request.user, deleted=False)
+        compress = request.query_params.get("gzip") in ("1", "true")
+
+        filename = f"{kind}.{file_format}"
+        content_type = CONTENT_TYPES[file_format]
+        if compress:
+            filename += ".gz"
+            content_type = "application/gzip"
+
+        export = StreamingHttpResponse(
+            export_stream(request.user, kind, file_format, board, compress), content_type=content_type
+        )
+        export["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return export
+
+
+def public_job(job):
+    """
+    The state of an import job as shown to its owner
+    """
+    return {key: value for key, value in job.items() if key != "user"}
+
+
+class ImportTasks(APIView):
+    """
+    Imports tasks from an uploaded `file`: CSV or NDJSON with title,
+    description, priority, completed, board and status columns, or the JSON
+    export of a Trello board. Boards and statuses are matched by title and
+    created when missing, rows without a board go to `board`.
+
+    The format is taken from `format` (csv, ndjson or trello) or the file
+    extension. Small files are imported right away and the result returned
+    with 201, larger ones are imported in the background: the 202 response
+    holds the job to poll at `api/import/<id>/`. Trello exports are limited
+    to TRELLO_MAX_BYTES.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, format=None):
+        """
+        Imports the tasks of an uploaded file
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": "No file was submitted."})
+        file_format = request.data.get("format") or guess_format(upload.name)
+        if file_format not in IMPORT_FORMATS:
+            raise ValidationError({"format": f"Choose one of {', '.join(IMPORT_FORMATS)}."})
+        board = None
+        if request.data.get("board"):
+            try:
+                board_id = int(request.data["board"])
+            except ValueError:
+                raise ValidationError({"board": "A valid integer is required."})
+            board = get_object_or_404(Board, id=board_id, user=request.user, deleted=False)
+        # the other formats are streamed, a Trello export is parsed whole
+        if file_format == "trello" and upload.size > TRELLO_MAX_BYTES:
+            raise ValidationError({"file": f"A Trello export can be at most {TRELLO_MAX_BYTES // (1024 * 1024)} MB."})
+
+        if upload.size <= INLINE_MAX_BYTES:
+            try:
+                result = import_file(request.user, upload, file_format, board=board)
+            except ImportFormatError as error:
+                raise ValidationError({"file": str(error)})
+            return Response({"state": "done", **result}, status=201)
+
+        job_id = uuid4().hex
+        save_upload(job_id, upload)
+        job = save_job({
+            "id": job_id,
+            "user": request.user.pk,
+            "state": "queued",
+            "format": file_format,
+            "board": board.id if board else None,
+        })
+        # the worker reads the upload once the request has committed it
+        transaction.on_commit(lambda: import_tasks_job.delay(job_id))
+        return Response(public_job(job), status=202)
+
+
+class GetImportJob(APIView):
+    """
+    Returns the state of an import job: queued, running, done or failed,
+    with the rows read and the tasks created so far
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, job_id, format=None):
+        """
+        Returns the state of an import job
+        """
+        job = get_job(job_id)
+        if job is None or job["user"] != request.user.pk:
+            raise Http404
 
+        return Response(public_job(job), status=200)
@@ -1,7 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'task_manager.tasks'
     verbose_name = 'Tasks'
+
+    def ready(self):
+        from task_manager.tasks.search import install_sqlite_search
+        from task_manager.tasks.sync import install_sqlite_sync
+
+        post_migrate.connect(install_sqlite_search, sender=self)
+        post_migrate.connect(install_sqlite_sync, sender=self)
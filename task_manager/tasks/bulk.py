@@ -0,0 +1,113 @@
+"""
+Bulk writes of tasks.
+
+A whole batch is written with one INSERT (or one UPDATE) of the task rows,
+one INSERT of the History rows of its status changes and one counter update
+per affected column, instead of a save(), signals and a transaction per
+task.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from task_manager.tasks.cache import bump_versions
+from task_manager.tasks.counters import apply_deltas, counter_state, state_deltas, task_deltas
+from task_manager.tasks.models import History, Task
+
+BATCH_SIZE = 500
+
+
+def merge_deltas(total, deltas):
+    for key, (count, completed) in deltas.items():
+        total[key][0] += count
+        total[key][1] += completed
+
+
+def create_tasks(user, items):
+    """
+    Create a task of `user` from each validated item. Returns the saved tasks.
+    """
+    tasks = [Task(user=user, **item) for item in items]
+    now = timezone.now()
+    for task in tasks:
+        task.stamp_completed_at(now)
+    with transaction.atomic():
+        Task.objects.bulk_create(tasks, batch_size=BATCH_SIZE)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # look the ids up by the external ids set in Python
+            external_ids = [task.external_id for task in tasks]
+            ids = dict(Task.objects.filter(external_id__in=external_ids).values_list("external_id", "id"))
+            for task in tasks:
+                task.id = ids[task.external_id]
+        apply_deltas(task_deltas(tasks))
+    return tasks
+
+
+def update_tasks(user, items):
+    """
+    Apply each validated item, with the `id` of a task of `user` and the
+    fields to change. Raises a ValidationError listing the errors per item
+    if any item refers to a missing task or to a status of another board.
+    Returns the updated tasks.
+    """
+    with transaction.atomic():
+        tasks = Task.objects.select_for_update(of=("self",)).select_related("board", "status").filter(
+            user=user, deleted=False, id__in=[item["id"] for item in items]
+        ).in_bulk()
+
+        errors = []
+        for item in items:
+            task = tasks.get(item["id"])
+            board = item.get("board", task.board if task else None)
+            status = item.get("status", task.status if task else None)
+            if task is None:
+                errors.append({"id": ["Not found."]})
+            elif status is not None and status.board_id != board.id:
+                errors.append({"status": ["Status does not belong to the board."]})
+            else:
+                errors.append({})
+        if any(errors):
+            raise ValidationError(errors)
+
+        now = timezone.now()
+        fields = {"updated_at"}
+        history = []
+        deltas = defaultdict(lambda: [0, 0])
+        updated = []
+        for item in items:
+            task = tasks[item["id"]]
+            old_state, old_status_id = counter_state(task), task.status_id
+            for name, value in item.items():
+                if name != "id":
+                    setattr(task, name, value)
+                    fields.add(name)
+            task.updated_at = now
+            task.stamp_completed_at(now)
+            if old_status_id is not None and task.status_id is not None and task.status_id != old_status_id:
+                history.append(History(task=task, old_status_id=old_status_id, new_status_id=task.status_id))
+            merge_deltas(deltas, state_deltas(old_state, counter_state(task)))
+            updated.append(task)
+
+        if "completed" in fields:
+            fields.add("completed_at")
+        Task.objects.bulk_update(updated, sorted(fields), batch_size=BATCH_SIZE)
+        History.objects.bulk_create(history, batch_size=BATCH_SIZE)
+        apply_deltas(deltas)
+        bump_versions([user.pk])
+    return updated
+
+
+def delete_tasks(user, ids):
+    """
+    Soft delete the tasks of `user` with the given ids. Raises a
+    ValidationError listing the errors per id if any task is missing.
+    Returns the number of deleted tasks.
+    """
+    with transaction.atomic():
+        tasks = Task.objects.filter(user=user, deleted=False, id__in=ids)
+        found = set(tasks.values_list("id", flat=True))
+        if len(found) < len(set(ids)):
+            raise ValidationError([{} if task_id in found else {"id": ["Not found."]} for task_id in ids])
+        return tasks.soft_delete()
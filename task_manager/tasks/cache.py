@@ -0,0 +1,88 @@
+"""
+Versioned per-user cache entries.
+
+Every user has a version stamp that is replaced whenever their tasks change.
+Cached values are keyed by that stamp, so a write makes all of them miss at
+once without having to know or delete the individual keys.
+
+The stamps expire after VERSION_TIMEOUT. A bump lost to a cache error after
+the commit leaves stale entries, and validators answering 304 for stale
+data, for that long at most; an expired stamp is replaced by a newer one.
+"""
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+COUNTS_TIMEOUT = 60 * 60
+FLOW_TIMEOUT = 60 * 60
+VERSION_TIMEOUT = 5 * 60
+
+logger = logging.getLogger(__name__)
+
+
+def version_key(user_id):
+    return f"tasks:version:{user_id}"
+
+
+def get_version(user_id):
+    """
+    Returns the current version stamp of a user's tasks
+    """
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), VERSION_TIMEOUT)
+        version = cache.get(key, time.time_ns())
+    return version
+
+
+def bump_versions(user_ids):
+    """
+    Invalidate everything cached for the given users once the current
+    transaction commits
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    def bump():
+        version = time.time_ns()
+        try:
+            cache.set_many({version_key(user_id): version for user_id in user_ids}, VERSION_TIMEOUT)
+        except Exception:
+            # the transaction has committed, the old stamps expire on their own
+            logger.warning("Could not bump the cache versions of users %s", sorted(user_ids), exc_info=True)
+
+    transaction.on_commit(bump)
+
+
+def cached_user_totals(user):
+    """
+    `user_totals` of a user, cached until their tasks change
+    """
+    from task_manager.tasks.counters import user_totals
+
+    key = f"tasks:counts:{user.pk}:{get_version(user.pk)}"
+    totals = cache.get(key)
+    if totals is None:
+        totals = user_totals(user)
+        cache.set(key, totals, COUNTS_TIMEOUT)
+    return totals
+
+
+def cached_board_flow(board, days):
+    """
+    `board_flow` of a board, cached until the tasks of its owner change or
+    the day ends
+    """
+    from task_manager.tasks.analytics import board_flow
+
+    key = f"tasks:flow:{board.pk}:{days}:{timezone.now().date()}:{get_version(board.user_id)}"
+    flow = cache.get(key)
+    if flow is None:
+        flow = board_flow(board, days)
+        cache.set(key, flow, FLOW_TIMEOUT)
+    return flow
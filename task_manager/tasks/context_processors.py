@@ -1,17 +1,22 @@
+from django.utils.functional import SimpleLazyObject
+
+from task_manager.tasks.cache import cached_user_totals
+
+
 def task_count(request):
-    from task_manager.tasks.models import Task
-    if request.user.is_authenticated:
-        return {
-            'total_tasks': Task.objects.filter(
-                user=request.user, deleted=False).count(),
-            'completed_tasks': Task.objects.filter(
-                user=request.user, deleted=False, completed=True).count()
-        }
-    else:
-        return {
-            'total_tasks': 0,
-            'completed_tasks': 0
-        }
+    """
+    Task totals of the user, only looked up when a template renders them
+    """
+    def get_totals():
+        if request.user.is_authenticated:
+            return cached_user_totals(request.user)
+        return {'total': 0, 'completed': 0}
+
+    totals = SimpleLazyObject(get_totals)
+    return {
+        'total_tasks': SimpleLazyObject(lambda: totals['total']),
+        'completed_tasks': SimpleLazyObject(lambda: totals['completed'])
+    }
 
 
 def icon(request):
@@ -0,0 +1,185 @@
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from task_manager.tasks.cache import bump_versions
+from task_manager.tasks.models import StatusDailyChange, Task, TaskCounter
+
+
+def counter_state(task):
+    """
+    Returns the fields of a task that decide which counter it belongs to
+    """
+    return (task.user_id, task.board_id, task.status_id, task.completed, task.deleted)
+
+
+def previous_counter_state(task):
+    """
+    Returns the counter fields of a task as they were loaded from the database
+    """
+    return tuple(
+        task.tracker.previous(field)
+        for field in ("user_id", "board_id", "status_id", "completed", "deleted")
+    )
+
+
+def state_deltas(old, new):
+    """
+    Returns the counter changes needed to move a task from `old` to `new` state
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+        user_id, board_id, status_id, completed, deleted = state
+        if deleted:
+            continue
+        delta = deltas[(user_id, board_id, status_id)]
+        delta[0] += sign
+        delta[1] += sign if completed else 0
+    return deltas
+
+
+def task_deltas(tasks, sign=1):
+    """
+    Returns the counter changes for adding (or removing) a list of tasks
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for task in tasks:
+        for key, (total, completed) in state_deltas(None, counter_state(task)).items():
+            deltas[key][0] += sign * total
+            deltas[key][1] += sign * completed
+    return deltas
+
+
+def queryset_deltas(queryset, sign=1):
+    """
+    Returns the counter changes for adding (or removing) the tasks of a queryset
+    with a single grouped query
+    """
+    rows = queryset.filter(deleted=False).order_by().values("user", "board", "status").annotate(
+        total=Count("id"), completed=Count("id", filter=Q(completed=True))
+    )
+    return {
+        (row["user"], row["board"], row["status"]): [sign * row["total"], sign * row["completed"]]
+        for row in rows
+    }
+
+
+def apply_deltas(deltas):
+    """
+    Add the given {(user_id, board_id, status_id): [total, completed]} changes
+    to the counters, and the total changes to today's StatusDailyChange rows
+    """
+    bump_versions(user_id for (user_id, _, _), (total, completed) in deltas.items() if total or completed)
+    changes = defaultdict(int)
+    for (user_id, board_id, status_id), (total, completed) in deltas.items():
+        if not total and not completed:
+            continue
+        if status_id is not None:
+            changes[(board_id, status_id)] += total
+        key = {"user_id": user_id, "board_id": board_id, "status_id": status_id}
+        counters = TaskCounter.objects.filter(**key)
+        if counters.update(total=F("total") + total, completed=F("completed") + completed):
+            continue
+        try:
+            with transaction.atomic():
+                TaskCounter.objects.create(total=total, completed=completed, **key)
+        except IntegrityError:
+            # created by a concurrent transaction in the meantime
+            counters.update(total=F("total") + total, completed=F("completed") + completed)
+    # UTC day, like the flow analytics
+    add_status_changes(changes, timezone.now().date())
+
+
+def add_status_changes(changes, day):
+    """
+    Add the given {(board_id, status_id): change} changes to the
+    StatusDailyChange rows of `day`, with one upsert on PostgreSQL and SQLite
+    and two queries elsewhere, however many there are
+    """
+    changes = {key: change for key, change in changes.items() if change}
+    if not changes:
+        return
+    db = connections[DEFAULT_DB_ALIAS]
+    if db.vendor in ("postgresql", "sqlite"):
+        ops = db.ops
+        table = ops.quote_name(StatusDailyChange._meta.db_table)
+        fields = [StatusDailyChange._meta.get_field(name) for name in ("board", "status", "date", "change")]
+        columns = [ops.quote_name(field.column) for field in fields]
+        change = columns[-1]
+        placeholders = [["%s"] * len(fields)] * len(changes)
+        rows = [(board_id, status_id, day, value) for (board_id, status_id), value in changes.items()]
+        with db.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) {ops.bulk_insert_sql(fields, placeholders)} "
+                f"ON CONFLICT ({', '.join(columns[:-1])}) "
+                f"DO UPDATE SET {change} = {table}.{change} + EXCLUDED.{change}",
+                [field.get_db_prep_save(value, connection=db) for row in rows for field, value in zip(fields, row)],
+            )
+        return
+
+    StatusDailyChange.objects.bulk_create(
+        [StatusDailyChange(board_id=board_id, status_id=status_id, date=day) for board_id, status_id in changes],
+        ignore_conflicts=True,
+    )
+    rows = Q()
+    values = []
+    for (board_id, status_id), change in changes.items():
+        rows |= Q(board_id=board_id, status_id=status_id)
+        values.append(When(board_id=board_id, status_id=status_id, then=Value(change)))
+    StatusDailyChange.objects.filter(rows, date=day).update(
+        change=F("change") + Case(*values, output_field=IntegerField())
+    )
+
+
+def user_totals(user):
+    """
+    Returns the number of total and completed tasks of a user
+    """
+    totals = TaskCounter.objects.filter(user=user).aggregate(total=Sum("total"), completed=Sum("completed"))
+    return {
+        "total": totals["total"] or 0,
+        "completed": totals["completed"] or 0,
+    }
+
+
+def status_key(title):
+    """
+    Normalize a status title, "In Progress" -> "in_progress"
+    """
+    return "_".join((title or "").lower().split())
+
+
+def user_status_totals(user):
+    """
+    Returns the number of tasks of a user per normalized status title
+    """
+    rows = TaskCounter.objects.filter(user=user).values("status__title").annotate(count=Sum("total"))
+    totals = defaultdict(int)
+    for row in rows:
+        totals[status_key(row["status__title"])] += row["count"]
+    return totals
+
+
+def rebuild_counters(users=None):
+    """
+    Recompute the counters from the task table. Returns the number of rows written.
+    """
+    tasks = Task.objects.all()
+    counters = TaskCounter.objects.all()
+    if users is not None:
+        tasks = tasks.filter(user__in=users)
+        counters = counters.filter(user__in=users)
+
+    with transaction.atomic():
+        counters.delete()
+        rows = [
+            TaskCounter(user_id=user_id, board_id=board_id, status_id=status_id, total=total, completed=completed)
+            for (user_id, board_id, status_id), (total, completed) in queryset_deltas(tasks).items()
+        ]
+        TaskCounter.objects.bulk_create(rows, batch_size=1000)
+        bump_versions(row.user_id for row in rows)
+    return len(rows)
@@ -0,0 +1,184 @@
+"""
+Daily digest emails.
+
+The data for a whole batch of users comes from six grouped queries, which
+are split per user in Python. The listed changes and overdue tasks are
+limited to MAX_ITEMS per user in SQL and counted separately. Every digest is
+rendered from the same two compiled templates.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Count, F, Sum, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.template.loader import get_template
+from django.utils import timezone
+
+from task_manager.tasks.counters import status_key
+from task_manager.tasks.models import EmailOutbox, History, Task, TaskCounter, UserDailyStats
+
+SUBJECT = "Task Manager Report"
+TEXT_TEMPLATE = "emails/daily_digest.txt"
+HTML_TEMPLATE = "emails/daily_digest.html"
+
+# Items listed per section, the rest is only counted
+MAX_ITEMS = 10
+
+
+@lru_cache(maxsize=None)
+def compiled_template(name):
+    return get_template(name)
+
+
+def overdue_age():
+    return timedelta(days=getattr(settings, "TASK_OVERDUE_DAYS", 3))
+
+
+def board_breakdowns(user_ids):
+    """
+    Returns {user_id: [{"title", "statuses": [(status, count)], "total"}]}
+    """
+    rows = (
+        TaskCounter.objects.filter(user__in=user_ids, board__deleted=False)
+        .values("user", "board", "board__title", "status__title")
+        .annotate(count=Sum("total"))
+        .order_by("user", "board__title", "board", "status__title")
+    )
+    boards = defaultdict(dict)
+    for row in rows:
+        if not row["count"]:
+            continue
+        board = boards[row["user"]].setdefault(
+            row["board"], {"title": row["board__title"], "statuses": [], "total": 0}
+        )
+        board["statuses"].append((row["status__title"] or "No status", row["count"]))
+        board["total"] += row["count"]
+    return {user_id: list(user_boards.values()) for user_id, user_boards in boards.items()}
+
+
+def first_per_user(rows, user_field, ordering, limit):
+    """
+    Returns the first `limit` of `rows` of every user in `ordering`, grouped
+    by user. The rows are numbered per user in a subquery, as the kanban
+    columns of GetStatusesList are.
+    """
+    ranked = rows.annotate(
+        user_position=Window(
+            RowNumber(),
+            partition_by=[F(user_field)],
+            order_by=[F(name[1:]).desc() if name.startswith("-") else F(name).asc() for name in ordering],
+        )
+    ).values("id", "user_position")
+    sql, params = ranked.query.sql_with_params()
+    heads = RawSQL(f"SELECT id FROM ({sql}) ranked WHERE user_position <= %s", (*params, limit))
+    return rows.filter(id__in=heads).order_by(user_field, *ordering)
+
+
+def count_per_user(rows, user_field):
+    """
+    Returns {user_id: number of rows}
+    """
+    return dict(rows.order_by().values_list(user_field).annotate(count=Count("id")))
+
+
+def recent_changes(user_ids, since, limit=MAX_ITEMS):
+    """
+    Returns {user_id: [{"task", "old_status", "new_status", "change_date"}]}
+    of the `limit` newest changes of every user, and {user_id: count} of all
+    of them
+    """
+    history = History.objects.filter(task__user__in=user_ids, task__deleted=False, change_date__gte=since)
+    rows = first_per_user(history, "task__user", ("-change_date", "-id"), limit).values_list(
+        "task__user", "task__title", "old_status__title", "new_status__title", "change_date"
+    )
+    changes = defaultdict(list)
+    for user_id, task, old_status, new_status, change_date in rows:
+        changes[user_id].append({
+            "task": task, "old_status": old_status, "new_status": new_status, "change_date": change_date,
+        })
+    return changes, count_per_user(history, "task__user")
+
+
+def overdue_tasks(user_ids, now, limit=MAX_ITEMS):
+    """
+    Returns {user_id: [{"title", "board", "date_created"}]} of the `limit`
+    oldest open high priority tasks older than TASK_OVERDUE_DAYS of every
+    user, and {user_id: count} of all of them
+    """
+    tasks = Task.objects.filter(
+        user__in=user_ids,
+        priority="high",
+        completed=False,
+        deleted=False,
+        board__deleted=False,
+        date_created__lte=now - overdue_age(),
+    )
+    rows = first_per_user(tasks, "user", ("date_created", "id"), limit).values_list(
+        "user", "title", "board__title", "date_created"
+    )
+    overdue = defaultdict(list)
+    for user_id, title, board, date_created in rows:
+        overdue[user_id].append({"title": title, "board": board, "date_created": date_created})
+    return overdue, count_per_user(tasks, "user")
+
+
+def yesterday_stats(user_ids, now):
+    """
+    Returns {user_id: UserDailyStats} of the day before `now`, for the users
+    that had any activity on it
+    """
+    day = timezone.localdate(now) - timedelta(days=1)
+    return {stats.user_id: stats for stats in UserDailyStats.objects.filter(user__in=user_ids, date=day)}
+
+
+def digest_contexts(users, now):
+    """
+    Returns the template context of every (user id, username) in `users`
+    """
+    user_ids = [user_id for user_id, _ in users]
+    boards = board_breakdowns(user_ids)
+    changes, changes_counts = recent_changes(user_ids, now - timedelta(days=1))
+    overdue, overdue_counts = overdue_tasks(user_ids, now)
+    yesterday = yesterday_stats(user_ids, now)
+
+    contexts = {}
+    for user_id, username in users:
+        totals = defaultdict(int)
+        for board in boards.get(user_id, ()):
+            for status, count in board["statuses"]:
+                totals[status_key(status)] += count
+        contexts[user_id] = {
+            "username": username,
+            "totals": totals,
+            "boards": boards.get(user_id, []),
+            "changes": changes.get(user_id, []),
+            "changes_count": changes_counts.get(user_id, 0),
+            "overdue": overdue.get(user_id, []),
+            "overdue_count": overdue_counts.get(user_id, 0),
+            "overdue_days": overdue_age().days,
+            "yesterday": yesterday.get(user_id),
+        }
+    return contexts
+
+
+def render_digest(context):
+    """
+    Returns the (text, html) bodies of one digest
+    """
+    return compiled_template(TEXT_TEMPLATE).render(context), compiled_template(HTML_TEMPLATE).render(context)
+
+
+def build_digests(users, now):
+    """
+    Returns unsaved outbox messages with the digest of every
+    (user id, username, email) in `users`
+    """
+    contexts = digest_contexts([(user_id, username) for user_id, username, _ in users], now)
+    messages = []
+    for user_id, _, email in users:
+        text, html = render_digest(contexts[user_id])
+        messages.append(EmailOutbox(to=email, subject=SUBJECT, body=text, html_body=html))
+    return messages
@@ -0,0 +1,113 @@
+"""
+Streaming exports of the tasks and the status history of a user.
+
+Rows come from a server-side cursor (`iterator(chunk_size=...)`) and are
+encoded chunk by chunk into NDJSON or CSV, optionally gzipped, so the
+memory used stays the same whatever the number of rows.
+"""
+import csv
+import io
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from task_manager.tasks.models import History, Task
+
+CHUNK_SIZE = 2000
+
+EXPORTS = {
+    "tasks": (
+        lambda user: Task.objects.filter(user=user, deleted=False),
+        (
+            "id", "external_id", "title", "priority", "description", "completed",
+            "status", "status__title", "board", "board__title", "date_created", "updated_at",
+        ),
+    ),
+    "history": (
+        lambda user: History.objects.filter(task__user=user, task__deleted=False),
+        (
+            "id", "task", "task__title", "old_status", "old_status__title",
+            "new_status", "new_status__title", "change_date",
+        ),
+    ),
+}
+BOARD_FIELDS = {"tasks": "board", "history": "task__board"}
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def export_rows(user, kind, board=None):
+    """
+    Returns the field names and an iterator over the rows of an export
+    """
+    queryset, fields = EXPORTS[kind]
+    rows = queryset(user)
+    if board is not None:
+        rows = rows.filter(**{BOARD_FIELDS[kind]: board})
+    return fields, rows.order_by("id").values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def chunked(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ndjson_chunks(fields, rows):
+    """
+    Yields the rows as JSON objects, one per line, a chunk of lines at a time
+    """
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for chunk in chunked(rows):
+        yield "".join(encoder.encode(dict(zip(fields, row))) + "\n" for row in chunk).encode()
+
+
+def csv_chunks(fields, rows):
+    """
+    Yields a header line and the rows as CSV, a chunk of lines at a time
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for chunk in chunked(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+FORMATS = {
+    "ndjson": ndjson_chunks,
+    "csv": csv_chunks,
+}
+
+
+def gzip_chunks(chunks):
+    """
+    Compress a stream of byte strings into one gzip file
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(user, kind, file_format, board=None, compress=False):
+    """
+    Returns an iterator over the bytes of an export
+    """
+    fields, rows = export_rows(user, kind, board)
+    chunks = FORMATS[file_format](fields, rows)
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,425 @@
+"""
+Imports of tasks from CSV, NDJSON and Trello board exports.
+
+Uploads are parsed row by row, board and status titles are resolved through
+a map of the user's boards and statuses loaded once (missing ones are
+created on the way), and the tasks are inserted a chunk at a time with
+multi-row INSERTs, each chunk in its own transaction along with its
+counters.
+Invalid rows are skipped and reported, they do not abort the import.
+
+A CSV or NDJSON file exported by `task_manager.tasks.export` can be
+imported back as is.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from task_manager.tasks.counters import apply_deltas
+from task_manager.tasks.models import PRIORITY_CODES, Board, ImportUpload, Status, Task
+
+CHUNK_SIZE = 2000
+
+# Uploads larger than this are imported by `import_tasks_job`
+INLINE_MAX_BYTES = 1024 * 1024
+
+# A Trello export is one JSON document parsed as a whole, larger ones are
+# refused
+TRELLO_MAX_BYTES = 20 * 1024 * 1024
+
+# Bytes of an upload stored per ImportUpload row
+UPLOAD_PART_BYTES = 1024 * 1024
+
+# How long the state of an import job stays readable
+JOB_TIMEOUT = 24 * 60 * 60
+
+# Row errors kept in the result, the count covers all of them
+MAX_ERRORS = 100
+
+DEFAULT_PRIORITY = "medium"
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+TITLE_LENGTH = Task._meta.get_field("title").max_length
+DESCRIPTION_LENGTH = Task._meta.get_field("description").max_length
+
+# the columns of an export carry ids, their titles come next to them
+BOARD_COLUMNS = ("board__title", "board")
+STATUS_COLUMNS = ("status__title", "status")
+
+
+class ImportFormatError(ValueError):
+    """
+    The upload cannot be read in the given format
+    """
+
+
+def text_stream(fileobj):
+    """
+    Decode a binary file as UTF-8, with or without a byte order mark
+    """
+    return io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+
+
+def parse_csv(fileobj):
+    """
+    Yields the line number and the fields of each row of a CSV file with a
+    header line
+    """
+    reader = csv.DictReader(text_stream(fileobj))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def parse_ndjson(fileobj):
+    """
+    Yields the line number and the fields of each line of an NDJSON file,
+    lines that are not JSON objects are returned as errors
+    """
+    for line_num, line in enumerate(text_stream(fileobj), 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        if not isinstance(row, dict):
+            yield line_num, {"_error": "Invalid JSON object."}
+        else:
+            yield line_num, row
+
+
+def parse_trello(fileobj):
+    """
+    Yields the position and the fields of each open card of a Trello board
+    export, with the board name as board, its list as status, `dueComplete`
+    as completed and a low, medium or high label as priority
+    """
+    content = fileobj.read(TRELLO_MAX_BYTES + 1)
+    if len(content) > TRELLO_MAX_BYTES:
+        raise ImportFormatError(f"A Trello export can be at most {TRELLO_MAX_BYTES // (1024 * 1024)} MB.")
+    try:
+        # detects the encoding and skips a byte order mark
+        board = json.loads(content)
+    except ValueError:
+        raise ImportFormatError("Invalid JSON document.")
+    if not isinstance(board, dict) or not isinstance(board.get("cards"), list):
+        raise ImportFormatError("Not a Trello board export.")
+
+    lists = {
+        trello_list["id"]: trello_list.get("name", "")
+        for trello_list in board.get("lists", [])
+        if not trello_list.get("closed")
+    }
+    for position, card in enumerate(board["cards"], 1):
+        if card.get("closed") or card.get("idList") not in lists:
+            continue
+        labels = [(label.get("name") or "").lower() for label in card.get("labels", [])]
+        yield position, {
+            "title": card.get("name", ""),
+            "description": card.get("desc", ""),
+            "priority": next((label for label in labels if label in PRIORITY_CODES), DEFAULT_PRIORITY),
+            "completed": bool(card.get("dueComplete")),
+            "board": board.get("name", ""),
+            "status": lists[card["idList"]],
+        }
+
+
+FORMATS = {
+    "csv": parse_csv,
+    "ndjson": parse_ndjson,
+    "trello": parse_trello,
+}
+
+EXTENSIONS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".json": "trello",
+}
+
+
+def guess_format(filename):
+    """
+    Returns the import format of a file name, None if the extension is unknown
+    """
+    for extension, file_format in EXTENSIONS.items():
+        if filename.lower().endswith(extension):
+            return file_format
+    return None
+
+
+def first_value(row, columns):
+    """
+    Returns the first non-blank value of `columns` in a row, as a string
+    """
+    for column in columns:
+        value = row.get(column)
+        if value is not None and str(value).strip():
+            return str(value).strip()
+    return ""
+
+
+def clean_row(row):
+    """
+    Returns the task fields of a parsed row, with the board and status
+    titles, and a dict of the errors per field
+    """
+    if "_error" in row:
+        return None, {"row": row["_error"]}
+
+    errors = {}
+    title = str(row.get("title") or "").strip()
+    if not title:
+        errors["title"] = "This field is required."
+    elif len(title) > TITLE_LENGTH:
+        errors["title"] = f"Ensure this field has no more than {TITLE_LENGTH} characters."
+
+    description = str(row.get("description") or "")
+    if len(description) > DESCRIPTION_LENGTH:
+        errors["description"] = f"Ensure this field has no more than {DESCRIPTION_LENGTH} characters."
+
+    priority = str(row.get("priority") or DEFAULT_PRIORITY).strip().lower()
+    if priority not in PRIORITY_CODES:
+        errors["priority"] = f'"{priority}" is not a valid choice.'
+
+    completed = row.get("completed")
+    if not isinstance(completed, bool):
+        completed = str(completed or "").strip().lower() in TRUE_VALUES
+
+    fields = {
+        "title": title,
+        "description": description,
+        "priority": priority,
+        "completed": completed,
+        "board": first_value(row, BOARD_COLUMNS),
+        "status": first_value(row, STATUS_COLUMNS),
+    }
+    return fields, errors
+
+
+class TitleMap:
+    """
+    The ids of the boards and statuses of a user by title, loaded with one
+    query each. Titles that are not found are created as new boards and
+    statuses. When titles repeat the oldest row wins.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.boards = {}
+        for board_id, title in Board.objects.filter(user=user, deleted=False).order_by("id").values_list("id", "title"):
+            self.boards.setdefault(title, board_id)
+        self.statuses = {}
+        statuses = Status.objects.filter(user=user, deleted=False, board__deleted=False).order_by("id")
+        for status_id, board_id, title in statuses.values_list("id", "board_id", "title"):
+            self.statuses.setdefault((board_id, title), status_id)
+        self.created = {"boards": 0, "statuses": 0}
+
+    def board(self, title):
+        if title not in self.boards:
+            self.boards[title] = Board.objects.create(user=self.user, title=title[:TITLE_LENGTH]).id
+            self.created["boards"] += 1
+        return self.boards[title]
+
+    def status(self, board_id, title):
+        key = (board_id, title)
+        if key not in self.statuses:
+            self.statuses[key] = Status.objects.create(
+                user=self.user, board_id=board_id, title=title[:TITLE_LENGTH]
+            ).id
+            self.created["statuses"] += 1
+        return self.statuses[key]
+
+
+def insert_rows(model, fields, rows):
+    """
+    Insert rows of values in `fields` order into the table of `model`, with
+    as many rows per INSERT as the backend allows.
+
+    This is what `bulk_create` runs once it has read the values back from the
+    model instances. Without the instances, and the field tracker attached
+    to every attribute of a task, the import runs several times faster.
+    """
+    # the wrapper itself, `connection` looks it up again on every access
+    db = connections[DEFAULT_DB_ALIAS]
+    ops = db.ops
+    table = ops.quote_name(model._meta.db_table)
+    columns = ", ".join(ops.quote_name(field.column) for field in fields)
+    prepare = [field.get_db_prep_save for field in fields]
+    batch_size = max(ops.bulk_batch_size(fields, rows), 1)
+    with db.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            placeholders = [["%s"] * len(fields)] * len(batch)
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) {ops.bulk_insert_sql(fields, placeholders)}",
+                [prep(value, connection=db) for row in batch for prep, value in zip(prepare, row)],
+            )
+
+
+INSERT_FIELDS = [
+    Task._meta.get_field(name)
+    for name in (
+        "external_id", "title", "priority", "description", "completed", "completed_at",
+        "date_created", "updated_at", "sync_version", "deleted", "user", "board", "status",
+    )
+]
+
+
+def insert_chunk(user, titles, board, chunk):
+    """
+    Insert the tasks of a chunk of cleaned rows, with the boards and
+    statuses they need, and count them, in one transaction stamped with the
+    time it starts
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    values = []
+    with transaction.atomic():
+        now = timezone.now()
+        for fields in chunk:
+            board_id = titles.board(fields["board"]) if fields["board"] else board.id
+            status_id = titles.status(board_id, fields["status"]) if fields["status"] else None
+            values.append((
+                uuid4(), fields["title"], fields["priority"], fields["description"], fields["completed"],
+                now if fields["completed"] else None, now, now, 0, False, user.pk, board_id, status_id,
+            ))
+            delta = deltas[(user.pk, board_id, status_id)]
+            delta[0] += 1
+            delta[1] += fields["completed"]
+        insert_rows(Task, INSERT_FIELDS, values)
+        apply_deltas(deltas)
+
+
+def import_tasks(user, rows, board=None, progress=None):
+    """
+    Create a task of `user` from each (position, fields) row of a parser.
+    Rows without a board title go to `board`. `progress` is called with the
+    result so far after every chunk.
+
+    Every chunk commits on its own, unless the caller holds a transaction:
+    an import that fails part way keeps the chunks before, which the result
+    passed to `progress` counts.
+
+    Returns the number of rows read, of tasks, boards and statuses created,
+    and the first MAX_ERRORS row errors with their count.
+    """
+    result = {"rows": 0, "created": 0, "boards_created": 0, "statuses_created": 0, "errors": [], "error_count": 0}
+    titles = TitleMap(user)
+    chunk = []
+    for position, row in rows:
+        result["rows"] += 1
+        fields, errors = clean_row(row)
+        if not errors and not fields["board"] and board is None:
+            errors["board"] = "This field is required."
+        if errors:
+            result["error_count"] += 1
+            if len(result["errors"]) < MAX_ERRORS:
+                result["errors"].append({"row": position, "errors": errors})
+            continue
+
+        chunk.append(fields)
+        if len(chunk) == CHUNK_SIZE:
+            insert_chunk(user, titles, board, chunk)
+            result["created"] += len(chunk)
+            result["boards_created"] = titles.created["boards"]
+            result["statuses_created"] = titles.created["statuses"]
+            chunk = []
+            if progress is not None:
+                progress(result)
+    if chunk:
+        insert_chunk(user, titles, board, chunk)
+        result["created"] += len(chunk)
+
+    result["boards_created"] = titles.created["boards"]
+    result["statuses_created"] = titles.created["statuses"]
+    if progress is not None:
+        progress(result)
+    return result
+
+
+def import_file(user, fileobj, file_format, board=None, progress=None):
+    """
+    Import the tasks of a CSV, NDJSON or Trello file opened in binary mode.
+    Raises ImportFormatError if the file cannot be read, the chunks committed
+    before the error stay imported.
+    """
+    try:
+        return import_tasks(user, FORMATS[file_format](fileobj), board=board, progress=progress)
+    except (csv.Error, UnicodeDecodeError) as error:
+        raise ImportFormatError(f"Invalid {file_format} file: {error}")
+
+
+def save_upload(job_id, upload):
+    """
+    Store an uploaded file for the import job `job_id`, UPLOAD_PART_BYTES
+    per row. The worker may run on another machine than the web process,
+    the database is the storage both of them read.
+    """
+    # the chunks() of an upload held in memory are the whole file
+    upload.seek(0)
+    for part, data in enumerate(iter(lambda: upload.read(UPLOAD_PART_BYTES), b"")):
+        ImportUpload.objects.create(job_id=job_id, part=part, data=data)
+
+
+def delete_upload(job_id):
+    ImportUpload.objects.filter(job_id=job_id).delete()
+
+
+class StoredUpload(io.RawIOBase):
+    """
+    Reads back the file stored by `save_upload`, loading one part at a time
+    """
+
+    def __init__(self, job_id):
+        self.parts = ImportUpload.objects.filter(job_id=job_id).values_list("data", flat=True)
+        self.next_part = 0
+        self.data = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.data:
+            data = self.parts.filter(part=self.next_part).first()
+            if data is None:
+                return 0
+            self.data = memoryview(bytes(data))
+            self.next_part += 1
+        size = min(len(buffer), len(self.data))
+        buffer[:size] = self.data[:size]
+        self.data = self.data[size:]
+        return size
+
+
+def open_upload(job_id):
+    """
+    Returns the file stored by `save_upload` as a binary file
+    """
+    return io.BufferedReader(StoredUpload(job_id))
+
+
+def job_key(job_id):
+    return f"tasks:import:{job_id}"
+
+
+def get_job(job_id):
+    """
+    Returns the state of an import job, None once it has expired
+    """
+    return cache.get(job_key(job_id))
+
+
+def save_job(job, **changes):
+    """
+    Update and store the state of an import job. The state lives in the
+    cache, which the worker running the job shares with the web process.
+    """
+    job.update(changes)
+    cache.set(job_key(job["id"]), job, JOB_TIMEOUT)
+    return job
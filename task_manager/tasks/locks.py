@@ -0,0 +1,102 @@
+"""
+Locks that keep a periodic task from running in parallel with itself.
+
+`TASK_LOCK_BACKEND` picks the implementation, "redis" for a lock shared by
+every worker host, "file" for an flock on the local machine.
+"""
+import fcntl
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+from task_manager.tasks import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def redis_lock(name, timeout):
+    from django_redis import get_redis_connection
+    from redis.exceptions import LockError
+
+    lock = get_redis_connection("default").lock(f"tasks:lock:{name}", timeout=timeout)
+    acquired = lock.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except LockError:
+                # expired while the task was still running
+                logger.warning("Lock %s expired before it was released", name)
+
+
+@contextmanager
+def file_lock(name, timeout):
+    # The OS releases an flock when its process dies, `timeout` is not needed
+    path = os.path.join(getattr(settings, "TASK_LOCK_DIR", None) or tempfile.gettempdir(), f"tasks-{name}.lock")
+    with open(path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+LOCK_BACKENDS = {
+    "redis": redis_lock,
+    "file": file_lock,
+}
+
+
+def task_lock(name, timeout):
+    """
+    Context manager trying to take the lock `name` without waiting, yields
+    whether it was acquired. `timeout` is the time after which a lock left
+    behind by a crashed worker expires.
+    """
+    return LOCK_BACKENDS[getattr(settings, "TASK_LOCK_BACKEND", "file")](name, timeout)
+
+
+def exclusive(interval, timeout=None, on_skip=None):
+    """
+    Decorator for a periodic task scheduled every `interval` seconds. A run
+    that starts while the previous one still holds the lock is skipped, and
+    `on_skip` is called with its arguments if given.
+    Records `<task>.duration` and counts `<task>.skipped` and `<task>.overrun`
+    (runs longer than `interval`).
+    """
+    def decorator(func):
+        name = func.__name__
+        lock_timeout = timeout or settings.CELERY_TASK_TIME_LIMIT
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with task_lock(name, lock_timeout) as acquired:
+                if not acquired:
+                    metrics.incr(f"{name}.skipped")
+                    logger.warning("Skipping %s, the previous run is still in progress", name)
+                    if on_skip is not None:
+                        on_skip(*args, **kwargs)
+                    return None
+                started = time.monotonic()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    duration = time.monotonic() - started
+                    metrics.gauge(f"{name}.duration", duration)
+                    if duration > interval:
+                        metrics.incr(f"{name}.overrun")
+                        logger.warning("%s took %.1fs, longer than its %ss interval", name, duration, interval)
+        return wrapper
+    return decorator
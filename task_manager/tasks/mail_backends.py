@@ -0,0 +1,39 @@
+"""
+Email backends for tests and benchmarks.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+
+
+class SinkEmailBackend(BaseEmailBackend):
+    """
+    Stand-in for an SMTP server that accepts and discards every message.
+
+    `latency` (seconds per message) and `failure_rate` (0 to 1) default to
+    the EMAIL_SINK_LATENCY and EMAIL_SINK_FAILURE_RATE settings and mimic a
+    slow or flaky server. `sent` counts the messages accepted by all
+    instances.
+    """
+    sent = 0
+
+    def __init__(self, latency=None, failure_rate=None, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = getattr(settings, "EMAIL_SINK_LATENCY", 0) if latency is None else latency
+        self.failure_rate = getattr(settings, "EMAIL_SINK_FAILURE_RATE", 0) if failure_rate is None else failure_rate
+
+    def send_messages(self, email_messages):
+        count = 0
+        for message in email_messages:
+            if self.latency:
+                time.sleep(self.latency)
+            if random.random() < self.failure_rate:
+                if self.fail_silently:
+                    continue
+                raise ConnectionError("Sink rejected the message")
+            message.message()
+            count += 1
+        SinkEmailBackend.sent += count
+        return count
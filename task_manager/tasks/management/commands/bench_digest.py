@@ -0,0 +1,96 @@
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from task_manager.tasks import digest
+
+User = get_user_model()
+
+USERNAME_PREFIX = "bench-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the cost of building the daily digest. Renders synthetic digests, "
+        "or with --from-db loads the data of the users seeded by bench_task_indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000, help="Number of digests to build")
+        parser.add_argument("--boards", type=int, default=5, help="Boards per synthetic user")
+        parser.add_argument("--changes", type=int, default=8, help="Changed tasks per synthetic user")
+        parser.add_argument("--from-db", action="store_true", help="Load the data of the seeded bench users")
+        parser.add_argument("--batch-size", type=int, default=500, help="Users per data batch with --from-db")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        load_seconds = 0
+        queries = 0
+        if options["from_db"]:
+            users = list(
+                User.objects.filter(username__startswith=USERNAME_PREFIX).order_by("id").values_list("id", "username")
+            )[:options["users"]]
+            if not users:
+                self.stderr.write("No seeded users, run bench_task_indexes --keep first")
+                return
+            contexts = {}
+            for start in range(0, len(users), options["batch_size"]):
+                batch = users[start:start + options["batch_size"]]
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as captured:
+                    contexts.update(digest.digest_contexts(batch, now))
+                load_seconds += time.perf_counter() - started
+                queries += len(captured)
+            contexts = list(contexts.values())
+        else:
+            contexts = [self.synthetic_context(i, now, options) for i in range(options["users"])]
+
+        started = time.perf_counter()
+        size = 0
+        for context in contexts:
+            text, html = digest.render_digest(context)
+            size += len(text) + len(html)
+        render_seconds = time.perf_counter() - started
+
+        count = len(contexts)
+        per_10k = 10_000 / count
+        if options["from_db"]:
+            self.stdout.write(
+                f"data:   {load_seconds:.2f}s in {queries} queries ({load_seconds * per_10k:.2f}s per 10k users)"
+            )
+        self.stdout.write(
+            f"render: {render_seconds:.2f}s for {count} digests ({render_seconds * per_10k:.2f}s per 10k users)"
+        )
+        self.stdout.write(f"        {render_seconds / count * 1_000_000:.0f} us and {size // count} bytes per digest")
+
+    def synthetic_context(self, i, now, options):
+        statuses = ("pending", "in_progress", "completed", "cancelled")
+        boards = []
+        totals = defaultdict(int)
+        for b in range(options["boards"]):
+            counts = [(status, random.randint(0, 20)) for status in statuses]
+            for status, count in counts:
+                totals[status] += count
+            boards.append({"title": f"Board {b}", "statuses": counts, "total": sum(count for _, count in counts)})
+        changes = [
+            {"task": f"Task {c}", "old_status": "pending", "new_status": "in_progress", "change_date": now}
+            for c in range(options["changes"])
+        ]
+        overdue = [{"title": "Overdue task", "board": "Board 0", "date_created": now - timedelta(days=7)}]
+        return {
+            "username": f"user{i}",
+            "totals": totals,
+            "boards": boards,
+            "changes": changes,
+            "changes_count": len(changes),
+            "overdue": overdue,
+            "overdue_count": len(overdue),
+            "overdue_days": digest.overdue_age().days,
+        }
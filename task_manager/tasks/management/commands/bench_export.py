@@ -0,0 +1,77 @@
+import os
+import resource
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from task_manager.tasks.export import FORMATS, export_stream
+from task_manager.tasks.models import Board, Status, Task
+
+User = get_user_model()
+
+USERNAME = "bench-export"
+SEED_BATCH_SIZE = 10_000
+
+
+def rss_bytes():
+    """
+    Current resident set size, or the peak one where /proc is missing
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed tasks and stream them through the export, failing when the "
+        "resident memory grows by more than --max-rss-mb while exporting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tasks", type=int, default=1_000_000, help="Number of tasks to export")
+        parser.add_argument("--format", dest="file_format", choices=sorted(FORMATS), default="ndjson")
+        parser.add_argument("--gzip", action="store_true", help="Compress the export")
+        parser.add_argument("--max-rss-mb", type=int, default=64, help="Allowed memory growth while exporting")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded tasks for the next run")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=USERNAME).first()
+        if user is None or Task.objects.filter(user=user).count() != options["tasks"]:
+            if user is not None:
+                user.delete()
+            user = self.seed(options["tasks"])
+
+        try:
+            baseline = peak = rss_bytes()
+            size = 0
+            started = time.perf_counter()
+            for chunk in export_stream(user, "tasks", options["file_format"], compress=options["gzip"]):
+                size += len(chunk)
+                peak = max(peak, rss_bytes())
+            elapsed = time.perf_counter() - started
+        finally:
+            if not options["keep"]:
+                user.delete()
+
+        growth = (peak - baseline) / 2 ** 20
+        self.stdout.write(f"exported: {options['tasks']} tasks, {size / 2 ** 20:.1f} MiB in {elapsed:.1f}s")
+        self.stdout.write(f"rss:      {baseline / 2 ** 20:.1f} MiB before, {growth:.1f} MiB growth at peak")
+        if growth > options["max_rss_mb"]:
+            raise CommandError(f"Memory grew by {growth:.1f} MiB, more than {options['max_rss_mb']} MiB")
+        self.stdout.write(self.style.SUCCESS("Memory stayed bounded"))
+
+    def seed(self, count):
+        user = User.objects.create_user(username=USERNAME, email=f"{USERNAME}@bench.invalid")
+        board = Board.objects.create(user=user, title="Export benchmark")
+        status = Status.objects.create(user=user, board=board, title="Pending")
+        for start in range(0, count, SEED_BATCH_SIZE):
+            Task.objects.bulk_create([
+                Task(user=user, board=board, status=status, title=f"Task {i}", priority="medium",
+                     description="Exported by the benchmark")
+                for i in range(start, min(start + SEED_BATCH_SIZE, count))
+            ])
+        return user
@@ -0,0 +1,117 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from task_manager.tasks import analytics
+from task_manager.tasks.models import Board, History, Status, Task
+
+User = get_user_model()
+
+USERNAME = "bench-flow"
+STATUSES = ("Backlog", "Todo", "Doing", "Review", "Completed")
+
+
+@contextmanager
+def explicit_dates():
+    """
+    Let bulk_create keep the seeded dates instead of stamping them with now
+    """
+    fields = [History._meta.get_field("change_date"), Task._meta.get_field("date_created")]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a board with status history and measure the flow analytics of it, "
+        "split into loading the done tasks and daily changes and computing the metrics."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--history", type=int, default=500_000, help="Number of history rows to seed")
+        parser.add_argument("--days", type=int, default=90, help="Reported period")
+        parser.add_argument("--repeat", type=int, default=5, help="Measured runs, the best one is reported")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded board")
+
+    def handle(self, *args, **options):
+        User.objects.filter(username=USERNAME).delete()
+        user = User.objects.create_user(username=USERNAME, email=f"{USERNAME}@bench.invalid")
+        board = self.seed(user, options["history"])
+
+        try:
+            started = time.perf_counter()
+            rows = analytics.rebuild_status_changes([board])
+            rebuild = time.perf_counter() - started
+
+            columns = list(Status.objects.filter(board=board).order_by("id").values_list("id", flat=True))
+            now = timezone.now().timestamp()
+            since = (now // analytics.DAY - options["days"] + 1) * analytics.DAY
+            load = compute = total = float("inf")
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                done = analytics.load_done(board.id, since)
+                changes = analytics.load_changes(board.id)
+                loaded = time.perf_counter()
+                analytics.flow_metrics(done, changes, analytics.np.array(columns), since, now)
+                computed = time.perf_counter()
+                analytics.board_flow(board, options["days"])
+                finished = time.perf_counter()
+                load = min(load, loaded - started)
+                compute = min(compute, computed - loaded)
+                total = min(total, finished - computed)
+
+            self.stdout.write(f"history rows:  {History.objects.filter(task__board=board).count()}")
+            self.stdout.write(f"daily changes: {rows} rows, rebuilt in {rebuild * 1000:.0f} ms")
+            self.stdout.write(f"done tasks:    {len(done)}")
+            self.stdout.write(f"load:          {load * 1000:.0f} ms")
+            self.stdout.write(f"compute:       {compute * 1000:.0f} ms")
+            self.stdout.write(f"board_flow:    {total * 1000:.0f} ms")
+        finally:
+            if not options["keep"]:
+                user.delete()
+
+    def seed(self, user, history):
+        board = Board.objects.create(user=user, title="Flow benchmark")
+        statuses = [Status.objects.create(user=user, board=board, title=title) for title in STATUSES]
+        now = timezone.now()
+        tasks, moves = [], []
+        while len(moves) < history:
+            created = now - timedelta(days=random.uniform(0, 365))
+            steps = random.randint(1, len(statuses) - 1)
+            tasks.append(Task(
+                user=user, board=board, title=f"Task {len(tasks)}", priority="low",
+                status=statuses[steps], date_created=created,
+            ))
+            at = created
+            for step in range(steps):
+                at += timedelta(days=random.expovariate(1 / 3))
+                moves.append((len(tasks) - 1, statuses[step], statuses[step + 1], min(at, now)))
+            # the tasks that reached the last status were completed there
+            if steps == len(statuses) - 1:
+                tasks[-1].completed = True
+                tasks[-1].completed_at = min(at, now)
+
+        # bulk_create skips the daily changes, handle() rebuilds them
+        with explicit_dates():
+            Task.objects.bulk_create(tasks, batch_size=5000)
+            # not every backend returns the ids from bulk_create
+            task_ids = list(Task.objects.filter(board=board).order_by("id").values_list("id", flat=True))
+            History.objects.bulk_create(
+                [
+                    History(task_id=task_ids[task], old_status=old, new_status=new, change_date=at)
+                    for task, old, new, at in moves[:history]
+                ],
+                batch_size=5000,
+            )
+        return board
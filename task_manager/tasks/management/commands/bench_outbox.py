@@ -0,0 +1,43 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from task_manager.tasks import outbox
+from task_manager.tasks.models import EmailOutbox
+
+BENCH_DOMAIN = "bench.invalid"
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue messages in the email outbox and measure how fast they drain "
+        "into the sink backend, which discards them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=10_000, help="Number of messages to queue")
+        parser.add_argument("--batch-size", type=int, default=outbox.BATCH_SIZE)
+        parser.add_argument("--latency", type=float, default=0, help="Seconds the sink spends per message")
+        parser.add_argument("--failure-rate", type=float, default=0, help="Share of messages the sink rejects")
+
+    def handle(self, *args, **options):
+        EmailOutbox.objects.filter(to__endswith=f"@{BENCH_DOMAIN}").delete()
+        outbox.enqueue([
+            EmailOutbox(to=f"user{i}@{BENCH_DOMAIN}", subject="Benchmark", body=f"Message {i}")
+            for i in range(options["messages"])
+        ])
+
+        connection = get_connection(
+            "task_manager.tasks.mail_backends.SinkEmailBackend",
+            latency=options["latency"],
+            failure_rate=options["failure_rate"],
+        )
+        started = time.perf_counter()
+        with connection:
+            stats = outbox.drain(connection, batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"sent {stats['sent']}, failed {stats['failed']}, dead {stats['dead']} in {elapsed:.2f}s")
+        self.stdout.write(f"throughput: {stats['sent'] / elapsed:.0f} messages/s")
+        EmailOutbox.objects.filter(to__endswith=f"@{BENCH_DOMAIN}").delete()
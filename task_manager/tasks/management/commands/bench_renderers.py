@@ -0,0 +1,93 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from task_manager.tasks.api.renderers import MessagePackRenderer, ORJSONRenderer
+from task_manager.tasks.api.views import GetStatusesList, TaskViewSet
+from task_manager.tasks.models import Board, Status, Task
+
+User = get_user_model()
+
+USERNAME = "bench-renderers"
+STATUSES = ("Pending", "In progress", "Review", "Done", "Cancelled")
+
+RENDERERS = (
+    ("json (stdlib)", JSONRenderer),
+    ("orjson", ORJSONRenderer),
+    ("msgpack", MessagePackRenderer),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the kanban and task list payloads with DRF's JSON renderer, orjson "
+        "and MessagePack, and report the renders per second and throughput of each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tasks", type=int, default=5000, help="Number of tasks on the board")
+        parser.add_argument("--repeat", type=int, default=50, help="Renders per payload and renderer")
+
+    def handle(self, *args, **options):
+        user = self.seed(options["tasks"])
+        try:
+            payloads = self.payloads(user)
+        finally:
+            user.delete()
+
+        for name, data in payloads:
+            self.stdout.write(f"{name}:")
+            baseline = None
+            for renderer_name, renderer_class in RENDERERS:
+                renderer = renderer_class()
+                size = len(renderer.render(data))
+                started = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    renderer.render(data)
+                per_render = (time.perf_counter() - started) / options["repeat"]
+                baseline = baseline or per_render
+                self.stdout.write(
+                    f"  {renderer_name:<14} {size / 1024:8.1f} KiB {per_render * 1000:8.2f} ms "
+                    f"{size / per_render / 2 ** 20:8.1f} MiB/s {baseline / per_render:6.1f}x"
+                )
+
+    def seed(self, count):
+        User.objects.filter(username=USERNAME).delete()
+        user = User.objects.create_user(username=USERNAME, email=f"{USERNAME}@bench.invalid")
+        board = Board.objects.create(user=user, title="Renderer benchmark")
+        statuses = [Status.objects.create(user=user, board=board, title=title) for title in STATUSES]
+        Task.objects.bulk_create(
+            [
+                Task(
+                    user=user, board=board, status=statuses[i % len(statuses)], title=f"Task {i}",
+                    priority=("high", "medium", "low")[i % 3], completed=i % 4 == 0,
+                    description="Rendered by the benchmark, with a description of a realistic length.",
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+        return user
+
+    def payloads(self, user):
+        """
+        Returns the unrendered data of a full kanban board and of a page of
+        200 tasks, as the views produce them
+        """
+        # pagination links need a host the site accepts
+        host = next((host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"), "localhost")
+        factory = APIRequestFactory(HTTP_HOST=host)
+        board = Board.objects.get(user=user)
+
+        request = factory.get(f"/api/list/status/{board.id}/", {"limit": GetStatusesList.max_page_size})
+        force_authenticate(request, user=user)
+        kanban = GetStatusesList.as_view()(request, board_pk=board.id).data
+
+        request = factory.get("/api/tasks/")
+        force_authenticate(request, user=user)
+        tasks = TaskViewSet.as_view({"get": "list"})(request).data
+        return [("kanban", kanban), ("task list", tasks)]
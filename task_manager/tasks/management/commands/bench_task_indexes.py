@@ -0,0 +1,168 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from task_manager.tasks.counters import rebuild_counters
+from task_manager.tasks.models import PRIORITY_CHOICES, Board, History, Status, Task
+
+User = get_user_model()
+
+USERNAME_PREFIX = "bench-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed tasks and compare EXPLAIN plans and latencies of the hot task queries "
+        "without and with the task indexes. Drops and re-creates the indexes, "
+        "so only run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tasks", type=int, default=1_000_000, help="Number of tasks to seed")
+        parser.add_argument("--users", type=int, default=100, help="Number of users owning the tasks")
+        parser.add_argument("--boards", type=int, default=5, help="Boards per user")
+        parser.add_argument("--statuses", type=int, default=4, help="Statuses per board")
+        parser.add_argument("--history", type=int, default=100_000, help="Number of history rows to seed")
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per query")
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--skip-seed", action="store_true", help="Reuse previously seeded data")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded data afterwards")
+
+    def handle(self, *args, **options):
+        if not options["skip_seed"]:
+            self.seed(options)
+
+        user = User.objects.filter(username__startswith=USERNAME_PREFIX).order_by("id").first()
+        if user is None:
+            self.stderr.write("No seeded data, run without --skip-seed first")
+            return
+
+        queries = self.get_queries(user)
+        indexes = [(Task, index) for index in Task._meta.indexes]
+        indexes += [(History, index) for index in History._meta.indexes]
+
+        with connection.schema_editor() as schema_editor:
+            for model, index in indexes:
+                schema_editor.remove_index(model, index)
+        self.analyze()
+        before = self.run_queries(queries, options["repeat"])
+
+        with connection.schema_editor() as schema_editor:
+            for model, index in indexes:
+                schema_editor.add_index(model, index)
+        self.analyze()
+        after = self.run_queries(queries, options["repeat"])
+
+        for name in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f"  before: {before[name]['median']:.2f} ms (p95 {before[name]['p95']:.2f} ms)")
+            self.stdout.write(f"  after:  {after[name]['median']:.2f} ms (p95 {after[name]['p95']:.2f} ms)")
+            self.stdout.write("  plan before:")
+            self.stdout.write(self.indent(before[name]["plan"]))
+            self.stdout.write("  plan after:")
+            self.stdout.write(self.indent(after[name]["plan"]))
+
+        if not options["keep"]:
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def seed(self, options):
+        self.stdout.write(f"Seeding {options['tasks']} tasks...")
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        random.seed(42)
+        priorities = [value for value, label in PRIORITY_CHOICES]
+
+        User.objects.bulk_create(
+            [
+                User(username=f"{USERNAME_PREFIX}{i}", email=f"{USERNAME_PREFIX}{i}@example.com")
+                for i in range(options["users"])
+            ]
+        )
+        users = list(User.objects.filter(username__startswith=USERNAME_PREFIX))
+        Board.objects.bulk_create(
+            [Board(title=f"Board {i}", user=user) for user in users for i in range(options["boards"])]
+        )
+        boards = list(Board.objects.filter(user__in=users))
+        Status.objects.bulk_create(
+            [
+                Status(title=f"Status {i}", board=board, user_id=board.user_id)
+                for board in boards
+                for i in range(options["statuses"])
+            ]
+        )
+        statuses = {}
+        for status in Status.objects.filter(board__in=boards):
+            statuses.setdefault(status.board_id, []).append(status.id)
+
+        batch = []
+        for i in range(options["tasks"]):
+            board = random.choice(boards)
+            batch.append(Task(
+                title=f"Task {i}",
+                priority=random.choice(priorities),
+                completed=random.random() < 0.3,
+                deleted=random.random() < 0.1,
+                status_id=random.choice(statuses[board.id]),
+                board_id=board.id,
+                user_id=board.user_id,
+            ))
+            if len(batch) == options["batch_size"]:
+                Task.objects.bulk_create(batch)
+                batch = []
+        Task.objects.bulk_create(batch)
+
+        task_ids = list(Task.objects.filter(user__in=users).values_list("id", "status"))
+        batch = []
+        for i in range(options["history"]):
+            task_id, status_id = random.choice(task_ids)
+            batch.append(History(task_id=task_id, old_status_id=status_id, new_status_id=status_id))
+            if len(batch) == options["batch_size"]:
+                History.objects.bulk_create(batch)
+                batch = []
+        History.objects.bulk_create(batch)
+        rebuild_counters(users)
+
+    def get_queries(self, user):
+        board = Board.objects.filter(user=user).first()
+        status = Status.objects.filter(board=board).first()
+        task = History.objects.filter(task__user=user).values_list("task", flat=True).first()
+        tasks = Task.objects.filter(user=user, deleted=False)
+        history = History.objects.filter(task__user=user, task__deleted=False, task__id=task)
+        return {
+            "TaskViewSet.list": lambda: tasks.filter(board__deleted=False).order_by("priority", "id")[:200],
+            "TaskViewSet.list (board)": lambda: tasks.filter(board__deleted=False, board__id=board.id).order_by(
+                "priority", "id"
+            )[:200],
+            "GenericListView": lambda: tasks.filter(status=status, completed=False).order_by("priority")[:5],
+            "GenericAllTaskView": lambda: tasks.order_by("priority")[:5],
+            "GetStatusesList": lambda: tasks.filter(board__id=board.id, status__in=[status.id]).order_by(
+                "status", "priority", "id"
+            ),
+            "HistoryViewSet.list": lambda: history.order_by("-change_date")[:200],
+        }
+
+    def run_queries(self, queries, repeat):
+        results = {}
+        for name, build in queries.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(build())
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[name] = {
+                "median": statistics.median(timings),
+                "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+                "plan": build().explain(),
+            }
+        return results
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def indent(self, plan):
+        return "\n".join(f"    {line}" for line in plan.splitlines())
@@ -0,0 +1,57 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from task_manager.tasks.importer import FORMATS, ImportFormatError, guess_format, import_file
+from task_manager.tasks.models import Board
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Import tasks for a user from a CSV, NDJSON or Trello JSON file. Boards and "
+        "statuses are matched by title and created when missing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+        parser.add_argument("--format", dest="file_format", choices=sorted(FORMATS), help="Default: from the extension")
+        parser.add_argument("--board", type=int, help="Id of the board for rows without a board")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['username']}")
+        file_format = options["file_format"] or guess_format(options["path"])
+        if file_format is None:
+            raise CommandError("Unknown file extension, pass --format")
+        board = None
+        if options["board"]:
+            board = Board.objects.filter(id=options["board"], user=user, deleted=False).first()
+            if board is None:
+                raise CommandError(f"No board {options['board']} of {user.username}")
+
+        def progress(result):
+            self.stdout.write(f"{result['rows']} rows read, {result['created']} tasks created")
+
+        started = time.perf_counter()
+        try:
+            with open(options["path"], "rb") as upload:
+                result = import_file(user, upload, file_format, board=board, progress=progress)
+        except OSError as error:
+            raise CommandError(str(error))
+        except ImportFormatError as error:
+            raise CommandError(str(error))
+        elapsed = time.perf_counter() - started
+
+        for error in result["errors"]:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} of {result['rows']} rows in {elapsed:.1f}s, "
+            f"created {result['boards_created']} boards and {result['statuses_created']} statuses, "
+            f"skipped {result['error_count']} invalid rows"
+        ))
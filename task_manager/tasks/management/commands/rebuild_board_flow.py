@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from task_manager.tasks.analytics import rebuild_status_changes
+from task_manager.tasks.models import Board
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily status changes of the boards, read by the flow analytics, from the history table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--board",
+            action="append",
+            dest="board_ids",
+            type=int,
+            help="Only rebuild the changes of this board id (can be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        boards = None
+        if options["board_ids"]:
+            boards = Board.objects.filter(id__in=options["board_ids"])
+        rows = rebuild_status_changes(boards)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily status changes"))
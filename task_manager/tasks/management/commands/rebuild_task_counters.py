@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from task_manager.tasks.counters import rebuild_counters
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per user, board and status task counters from the task table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="usernames",
+            help="Only rebuild the counters of this username (can be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options["usernames"]:
+            users = User.objects.filter(username__in=options["usernames"])
+        rows = rebuild_counters(users)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} task counters"))
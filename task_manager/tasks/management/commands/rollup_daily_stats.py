@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from task_manager.tasks.rollups import rollup_day, rollup_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll up task activity into the daily stats table. Without options rolls up "
+        "the days since the last run, --since rewrites every day from that date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="First day to roll up, YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        if not options["since"]:
+            days = rollup_pending()
+            self.stdout.write(self.style.SUCCESS(f"Rolled up {len(days)} days"))
+            return
+
+        try:
+            day = date.fromisoformat(options["since"])
+        except ValueError:
+            raise CommandError("--since must be a date in YYYY-MM-DD format")
+        yesterday = timezone.localdate() - timedelta(days=1)
+        rows = 0
+        while day <= yesterday:
+            rows += rollup_day(day, snapshot=day == yesterday)
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} daily stats rows"))
@@ -0,0 +1,28 @@
+"""
+Counters and gauges of the background jobs.
+
+They are kept in the default cache so every worker reports to the same
+place, under `tasks:metrics:<name>`.
+"""
+from django.core.cache import cache
+
+PREFIX = "tasks:metrics:"
+
+
+def incr(name, delta=1):
+    key = PREFIX + name
+    if cache.add(key, delta, None):
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # evicted in the meantime
+        cache.set(key, delta, None)
+
+
+def gauge(name, value):
+    cache.set(PREFIX + name, value, None)
+
+
+def get(name, default=None):
+    return cache.get(PREFIX + name, default)
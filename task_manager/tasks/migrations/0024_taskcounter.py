@@ -0,0 +1,57 @@
+# Generated by Django 3.2.12 on 2026-10-18 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_counters(apps, schema_editor):
+    Task = apps.get_model("tasks", "Task")
+    TaskCounter = apps.get_model("tasks", "TaskCounter")
+    rows = Task.objects.filter(deleted=False).order_by().values("user", "board", "status").annotate(
+        total=models.Count("id"), completed=models.Count("id", filter=models.Q(completed=True))
+    )
+    TaskCounter.objects.bulk_create(
+        [
+            TaskCounter(
+                user_id=row["user"],
+                board_id=row["board"],
+                status_id=row["status"],
+                total=row["total"],
+                completed=row["completed"],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0023_alter_report_send_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tasks.board')),
+                ('status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='tasks.status')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='taskcounter',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__isnull', False)), fields=('user', 'board', 'status'), name='unique_task_counter'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskcounter',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__isnull', True)), fields=('user', 'board'), name='unique_task_counter_no_status'),
+        ),
+        migrations.RunPython(build_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.12 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0024_taskcounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='history',
+            index=models.Index(fields=['task', '-change_date'], name='history_task_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['user', 'board', 'status', 'priority', 'id'], name='task_board_column_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['user', 'status', 'priority'], name='task_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['user', 'priority', 'id'], name='task_user_priority_idx'),
+        ),
+    ]
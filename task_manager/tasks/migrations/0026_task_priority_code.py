@@ -0,0 +1,84 @@
+# Generated by Django 3.2.12 on 2026-10-18 11:58
+
+from django.db import migrations, models
+import task_manager.tasks.models
+
+PRIORITY_CODES = {
+    "high": 1,
+    "medium": 2,
+    "low": 3,
+}
+
+
+def priority_to_code(apps, schema_editor):
+    Task = apps.get_model("tasks", "Task")
+    for name, code in PRIORITY_CODES.items():
+        Task.objects.filter(priority=name).update(priority_code=code)
+    # anything else was never a valid choice
+    Task.objects.filter(priority_code__isnull=True).update(priority_code=PRIORITY_CODES["medium"])
+
+
+def code_to_priority(apps, schema_editor):
+    Task = apps.get_model("tasks", "Task")
+    for name, code in PRIORITY_CODES.items():
+        Task.objects.filter(priority_code=code).update(priority=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0025_task_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_board_column_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_user_status_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_user_priority_idx',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='priority_code',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.RunPython(priority_to_code, code_to_priority),
+        # lets the reverse migration re-add the column with an empty default
+        migrations.AlterField(
+            model_name='task',
+            name='priority',
+            field=models.CharField(blank=True, choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=100),
+        ),
+        migrations.RemoveField(
+            model_name='task',
+            name='priority',
+        ),
+        migrations.RenameField(
+            model_name='task',
+            old_name='priority_code',
+            new_name='priority',
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='priority',
+            field=task_manager.tasks.models.PriorityField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')]),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['user', 'board', 'status', 'priority', 'id'], name='task_board_column_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['user', 'status', 'priority'], name='task_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['user', 'priority', 'id'], name='task_user_priority_idx'),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 3.2.12 on 2026-10-18 12:40
+
+from django.db import migrations
+
+# The SQL of task_manager.tasks.search when this migration was written,
+# frozen here so later changes to that module do not change the migration.
+
+POSTGRES_INSTALL = [
+    "ALTER TABLE tasks_task ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION tasks_task_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tasks_task_search_vector_trigger ON tasks_task",
+    """
+    CREATE TRIGGER tasks_task_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON tasks_task
+    FOR EACH ROW EXECUTE PROCEDURE tasks_task_search_vector_update()
+    """,
+    """
+    UPDATE tasks_task SET search_vector =
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    """,
+    "CREATE INDEX IF NOT EXISTS task_search_vector_idx ON tasks_task USING gin (search_vector)",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS tasks_task_search_vector_trigger ON tasks_task",
+    "DROP FUNCTION IF EXISTS tasks_task_search_vector_update()",
+    "DROP INDEX IF EXISTS task_search_vector_idx",
+    "ALTER TABLE tasks_task DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_task_fts
+    USING fts5(title, description, content='tasks_task', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_insert AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_delete AFTER DELETE ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_update AFTER UPDATE OF title, description ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO tasks_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO tasks_task_fts(tasks_task_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS tasks_task_fts_insert",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_delete",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_update",
+    "DROP TABLE IF EXISTS tasks_task_fts",
+]
+
+STATEMENTS = {
+    "postgresql": (POSTGRES_INSTALL, POSTGRES_UNINSTALL),
+    "sqlite": (SQLITE_INSTALL, SQLITE_UNINSTALL),
+}
+
+
+def run(schema_editor, index):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements is None:
+        return
+    for statement in statements[index]:
+        schema_editor.execute(statement, params=None)
+
+
+def install_search(apps, schema_editor):
+    run(schema_editor, 0)
+
+
+def uninstall_search(apps, schema_editor):
+    run(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0026_task_priority_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0027_task_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('consent', True)), fields=['send_time'], name='report_due_idx'),
+        ),
+    ]
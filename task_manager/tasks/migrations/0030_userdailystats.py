@@ -0,0 +1,43 @@
+# Generated by Django 3.2.12 on 2026-10-18 20:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0029_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('created', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('transitions', models.IntegerField(default=0)),
+                ('open_high', models.IntegerField(blank=True, null=True)),
+                ('open_medium', models.IntegerField(blank=True, null=True)),
+                ('open_low', models.IntegerField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='userdailystats',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_user_daily_stats'),
+        ),
+        migrations.AddIndex(
+            model_name='history',
+            index=models.Index(fields=['change_date'], name='history_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['date_created'], name='task_created_idx'),
+        ),
+    ]
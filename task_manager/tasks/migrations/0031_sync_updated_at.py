@@ -0,0 +1,38 @@
+# Generated by Django 3.2.12 on 2026-10-18 21:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def backfill_updated_at(apps, schema_editor):
+    Task = apps.get_model("tasks", "Task")
+    Task.objects.update(updated_at=models.F("date_created"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0030_userdailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='board',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='board_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='status',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='status_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='task_sync_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.2.12 on 2026-10-18 22:10
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def backfill_status_changes(apps, schema_editor):
+    """
+    Every live task enters its first status on the day it was created and
+    moves with its transitions, as task_manager.tasks.analytics counted them
+    when this migration was written
+    """
+    History = apps.get_model("tasks", "History")
+    StatusDailyChange = apps.get_model("tasks", "StatusDailyChange")
+    Task = apps.get_model("tasks", "Task")
+
+    changes = defaultdict(int)
+    first_status = History.objects.filter(task=OuterRef("pk")).order_by("change_date", "id").values("old_status")[:1]
+    created = Task.objects.filter(deleted=False).annotate(
+        first_status=Coalesce(Subquery(first_status), "status", output_field=models.IntegerField()),
+        day=TruncDate("date_created", tzinfo=timezone.utc),
+    )
+    for row in created.order_by().values("board", "first_status", "day").annotate(count=Count("id")):
+        if row["first_status"] is not None:
+            changes[(row["board"], row["first_status"], row["day"])] += row["count"]
+    moves = History.objects.filter(task__deleted=False).annotate(day=TruncDate("change_date", tzinfo=timezone.utc))
+    for row in moves.order_by().values("task__board", "old_status", "new_status", "day").annotate(count=Count("id")):
+        changes[(row["task__board"], row["new_status"], row["day"])] += row["count"]
+        changes[(row["task__board"], row["old_status"], row["day"])] -= row["count"]
+
+    StatusDailyChange.objects.bulk_create(
+        [
+            StatusDailyChange(board_id=board_id, status_id=status_id, date=day, change=change)
+            for (board_id, status_id, day), change in changes.items()
+            if change
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0031_sync_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusDailyChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('change', models.IntegerField(default=0)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tasks.board')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tasks.status')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='statusdailychange',
+            constraint=models.UniqueConstraint(fields=('board', 'status', 'date'), name='unique_status_daily_change'),
+        ),
+        migrations.AddIndex(
+            model_name='history',
+            index=models.Index(fields=['new_status', 'change_date', 'task'], name='history_status_date_idx'),
+        ),
+        migrations.RunPython(backfill_status_changes, migrations.RunPython.noop),
+    ]
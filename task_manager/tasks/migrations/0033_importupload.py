@@ -0,0 +1,26 @@
+# Generated by Django 3.2.12 on 2026-10-18 22:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0032_statusdailychange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(max_length=32)),
+                ('part', models.IntegerField()),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='importupload',
+            constraint=models.UniqueConstraint(fields=('job_id', 'part'), name='unique_import_upload_part'),
+        ),
+    ]
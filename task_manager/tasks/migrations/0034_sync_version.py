@@ -0,0 +1,172 @@
+# Generated by Django 3.2.12 on 2026-10-18 22:30
+
+from django.db import migrations, models
+
+# The SQL of task_manager.tasks.sync when this migration was written,
+# frozen here so later changes to that module do not change the migration.
+
+POSTGRES_INSTALL = [
+    """
+    CREATE OR REPLACE FUNCTION tasks_sync_version_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.sync_version := txid_current();
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tasks_board_sync_version_trigger ON tasks_board",
+    """
+    CREATE TRIGGER tasks_board_sync_version_trigger
+    BEFORE INSERT OR UPDATE ON tasks_board
+    FOR EACH ROW EXECUTE PROCEDURE tasks_sync_version_update()
+    """,
+    "DROP TRIGGER IF EXISTS tasks_status_sync_version_trigger ON tasks_status",
+    """
+    CREATE TRIGGER tasks_status_sync_version_trigger
+    BEFORE INSERT OR UPDATE ON tasks_status
+    FOR EACH ROW EXECUTE PROCEDURE tasks_sync_version_update()
+    """,
+    "DROP TRIGGER IF EXISTS tasks_task_sync_version_trigger ON tasks_task",
+    """
+    CREATE TRIGGER tasks_task_sync_version_trigger
+    BEFORE INSERT OR UPDATE ON tasks_task
+    FOR EACH ROW EXECUTE PROCEDURE tasks_sync_version_update()
+    """,
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS tasks_board_sync_version_trigger ON tasks_board",
+    "DROP TRIGGER IF EXISTS tasks_status_sync_version_trigger ON tasks_status",
+    "DROP TRIGGER IF EXISTS tasks_task_sync_version_trigger ON tasks_task",
+    "DROP FUNCTION IF EXISTS tasks_sync_version_update()",
+]
+
+SQLITE_INSTALL = [
+    "CREATE TABLE IF NOT EXISTS tasks_sync_clock (value integer NOT NULL)",
+    """
+    INSERT INTO tasks_sync_clock (value)
+    SELECT max(
+        (SELECT coalesce(max(sync_version), 0) FROM tasks_board),
+        (SELECT coalesce(max(sync_version), 0) FROM tasks_status),
+        (SELECT coalesce(max(sync_version), 0) FROM tasks_task)
+    )
+    WHERE NOT EXISTS (SELECT 1 FROM tasks_sync_clock)
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_board_sync_insert AFTER INSERT ON tasks_board BEGIN
+        UPDATE tasks_sync_clock SET value = value + 1;
+        UPDATE tasks_board SET sync_version = (SELECT value FROM tasks_sync_clock) WHERE id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_board_sync_update AFTER UPDATE ON tasks_board BEGIN
+        UPDATE tasks_sync_clock SET value = value + 1;
+        UPDATE tasks_board SET sync_version = (SELECT value FROM tasks_sync_clock) WHERE id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_status_sync_insert AFTER INSERT ON tasks_status BEGIN
+        UPDATE tasks_sync_clock SET value = value + 1;
+        UPDATE tasks_status SET sync_version = (SELECT value FROM tasks_sync_clock) WHERE id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_status_sync_update AFTER UPDATE ON tasks_status BEGIN
+        UPDATE tasks_sync_clock SET value = value + 1;
+        UPDATE tasks_status SET sync_version = (SELECT value FROM tasks_sync_clock) WHERE id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_task_sync_insert AFTER INSERT ON tasks_task BEGIN
+        UPDATE tasks_sync_clock SET value = value + 1;
+        UPDATE tasks_task SET sync_version = (SELECT value FROM tasks_sync_clock) WHERE id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_task_sync_update AFTER UPDATE ON tasks_task BEGIN
+        UPDATE tasks_sync_clock SET value = value + 1;
+        UPDATE tasks_task SET sync_version = (SELECT value FROM tasks_sync_clock) WHERE id = new.id;
+    END
+    """,
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS tasks_board_sync_insert",
+    "DROP TRIGGER IF EXISTS tasks_board_sync_update",
+    "DROP TRIGGER IF EXISTS tasks_status_sync_insert",
+    "DROP TRIGGER IF EXISTS tasks_status_sync_update",
+    "DROP TRIGGER IF EXISTS tasks_task_sync_insert",
+    "DROP TRIGGER IF EXISTS tasks_task_sync_update",
+    "DROP TABLE IF EXISTS tasks_sync_clock",
+]
+
+STATEMENTS = {
+    "postgresql": (POSTGRES_INSTALL, POSTGRES_UNINSTALL),
+    "sqlite": (SQLITE_INSTALL, SQLITE_UNINSTALL),
+}
+
+
+def run(schema_editor, index):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements is None:
+        return
+    for statement in statements[index]:
+        schema_editor.execute(statement, params=None)
+
+
+def install_sync(apps, schema_editor):
+    run(schema_editor, 0)
+
+
+def uninstall_sync(apps, schema_editor):
+    run(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0033_importupload'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='board',
+            name='board_sync_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='status',
+            name='status_sync_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_sync_idx',
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='sync_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='status',
+            name='sync_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='sync_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='board',
+            index=models.Index(fields=['user', 'sync_version', 'id'], name='board_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='status',
+            index=models.Index(fields=['user', 'sync_version', 'id'], name='status_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'sync_version', 'id'], name='task_sync_idx'),
+        ),
+        migrations.RunPython(install_sync, uninstall_sync),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.12 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+
+def backfill_completed_at(apps, schema_editor):
+    # the completion time was not recorded, the last write is the closest
+    Task = apps.get_model("tasks", "Task")
+    Task.objects.filter(completed=True).update(completed_at=models.F("updated_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0034_sync_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['completed_at'], name='task_completed_idx'),
+        ),
+    ]
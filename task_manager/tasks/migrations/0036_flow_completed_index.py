@@ -0,0 +1,21 @@
+# Generated by Django 3.2.12 on 2026-10-18 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0035_task_completed_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='history',
+            name='history_status_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', True), ('deleted', False)), fields=['board', 'completed_at'], name='task_board_completed_idx'),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from asyncio import tasks
-from django.db import models
+from django.core import exceptions
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from model_utils import FieldTracker
 
 User = get_user_model()
 
@@ -24,6 +27,47 @@ PRIORITY_CHOICES = (
     ("high", "High"),
 )
 
+# Priorities are stored as small integers, ordered so that
+# order_by("priority") lists the most urgent tasks first
+PRIORITY_CODES = {
+    "high": 1,
+    "medium": 2,
+    "low": 3,
+}
+PRIORITY_NAMES = {code: name for name, code in PRIORITY_CODES.items()}
+
+
+class PriorityField(models.Field):
+    """
+    Stores the names of PRIORITY_CHOICES as small integer codes
+    """
+    description = "Task priority"
+
+    def get_internal_type(self):
+        return "PositiveSmallIntegerField"
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return PRIORITY_NAMES.get(value, value)
+
+    def to_python(self, value):
+        if value is None or value in PRIORITY_CODES:
+            return value
+        if isinstance(value, int) and value in PRIORITY_NAMES:
+            return PRIORITY_NAMES[value]
+        raise exceptions.ValidationError(
+            self.error_messages["invalid_choice"],
+            code="invalid_choice",
+            params={"value": value},
+        )
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None or isinstance(value, int):
+            return value
+        return PRIORITY_CODES[self.to_python(value)]
+
 class History(models.Model):
 
     task = models.ForeignKey("Task", on_delete=models.CASCADE)
@@ -31,6 +75,14 @@ class History(models.Model):
     new_status = models.ForeignKey("Status", on_delete=models.CASCADE, related_name="new_status")
     change_date = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # HistoryViewSet: task history, newest first
+            models.Index(fields=["task", "-change_date"], name="history_task_date_idx"),
+            # daily stats rollup
+            models.Index(fields=["change_date"], name="history_date_idx"),
+        ]
+
     def __str__(self):
         return self.task.title
 
@@ -41,39 +93,127 @@ class Status(models.Model):
     deleted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # change feed position, written by the triggers of task_manager.tasks.sync
+    sync_version = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # change feed, deleted rows included as tombstones
+            models.Index(fields=["user", "sync_version", "id"], name="status_sync_idx"),
+        ]
 
     def delete(self, *args, **kwargs):
         self.deleted = True
-        self.save()
+        self.save(update_fields=["deleted", "updated_at"])
 
     def __str__(self):
         return self.title
 
 
+class TaskQuerySet(models.QuerySet):
+
+    def soft_delete(self):
+        """
+        Soft delete every task of the queryset and update the counters
+        """
+        from task_manager.tasks.counters import apply_deltas, queryset_deltas
+
+        with transaction.atomic():
+            live = self.filter(deleted=False)
+            deltas = queryset_deltas(live, sign=-1)
+            count = live.update(deleted=True, updated_at=timezone.now())
+            apply_deltas(deltas)
+        return count
+
+
 class Task(models.Model):
     external_id = models.UUIDField(
         default=uuid4, unique=True, db_index=True, editable=False
     )
     title = models.CharField(max_length=100)
-    priority = models.CharField(max_length=100, choices=PRIORITY_CHOICES)
+    priority = PriorityField(choices=PRIORITY_CHOICES)
     description = models.TextField(max_length=500, blank=True)
     completed = models.BooleanField(default=False)
+    # when `completed` was last set, None while it is not
+    completed_at = models.DateTimeField(null=True, blank=True)
     date_created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # change feed position, written by the triggers of task_manager.tasks.sync
+    sync_version = models.BigIntegerField(default=0, editable=False)
     deleted = models.BooleanField(default=False)
     status = models.ForeignKey(Status, on_delete=models.CASCADE, null=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     board = models.ForeignKey("Board", on_delete=models.CASCADE)
 
+    objects = TaskQuerySet.as_manager()
+    tracker = FieldTracker()
+
+    class Meta:
+        # every listing only reads live tasks, so the indexes skip deleted rows
+        indexes = [
+            # TaskViewSet per board and the kanban columns of GetStatusesList
+            models.Index(
+                fields=["user", "board", "status", "priority", "id"],
+                condition=models.Q(deleted=False),
+                name="task_board_column_idx",
+            ),
+            # status lists of the web views, ordered by priority
+            models.Index(
+                fields=["user", "status", "priority"],
+                condition=models.Q(deleted=False),
+                name="task_user_status_idx",
+            ),
+            # all tasks of a user (TaskViewSet, GenericAllTaskView), ordered by priority
+            models.Index(
+                fields=["user", "priority", "id"],
+                condition=models.Q(deleted=False),
+                name="task_user_priority_idx",
+            ),
+            # daily stats rollup
+            models.Index(fields=["date_created"], name="task_created_idx"),
+            models.Index(fields=["completed_at"], name="task_completed_idx"),
+            # flow analytics: the tasks of a board completed within the period
+            models.Index(
+                fields=["board", "completed_at"],
+                condition=models.Q(completed=True, deleted=False),
+                name="task_board_completed_idx",
+            ),
+            # change feed, deleted rows included as tombstones
+            models.Index(fields=["user", "sync_version", "id"], name="task_sync_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
+    def stamp_completed_at(self, now):
+        """
+        Set `completed_at` to `now` when the completed flag has been set
+        since the task was loaded, clear it when the flag has been cleared
+        """
+        if self.tracker.has_changed("completed"):
+            self.completed_at = now if self.completed else None
+
+    def save(self, *args, **kwargs):
+        self.stamp_completed_at(timezone.now())
+        # write only the columns that changed since the task was loaded
+        if not args and not self._state.adding and not kwargs.get("force_insert"):
+            if kwargs.get("update_fields") is None:
+                kwargs["update_fields"] = list(self.tracker.changed())
+            if "completed" in kwargs["update_fields"] and "completed_at" not in kwargs["update_fields"]:
+                kwargs["update_fields"] = [*kwargs["update_fields"], "completed_at"]
+            # auto_now is only written along with the other columns
+            if kwargs["update_fields"] and "updated_at" not in kwargs["update_fields"]:
+                kwargs["update_fields"] = [*kwargs["update_fields"], "updated_at"]
+        # keep the counters in the same transaction as the task row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def soft_delete(self):
         self.deleted = True
-        self.save()
+        self.save(update_fields=["deleted"])
 
     def delete(self):
-        self.deleted = True
-        self.save()
+        self.soft_delete()
 
 
 class Board(models.Model):
@@ -83,6 +223,14 @@ class Board(models.Model):
     deleted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # change feed position, written by the triggers of task_manager.tasks.sync
+    sync_version = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # change feed, deleted rows included as tombstones
+            models.Index(fields=["user", "sync_version", "id"], name="board_sync_idx"),
+        ]
 
     # def soft_delete(self):
     #     self.deleted = True
@@ -90,12 +238,104 @@ class Board(models.Model):
 
     def delete(self):
         self.deleted = True
-        self.save()
+        self.save(update_fields=["deleted", "updated_at"])
 
     def __str__(self):
         return self.title
 
 
+class TaskCounter(models.Model):
+    """
+    Number of non-deleted tasks per user, board and status
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    board = models.ForeignKey(Board, on_delete=models.CASCADE)
+    status = models.ForeignKey(Status, on_delete=models.CASCADE, null=True, blank=True)
+    total = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "board", "status"],
+                condition=models.Q(status__isnull=False),
+                name="unique_task_counter",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "board"],
+                condition=models.Q(status__isnull=True),
+                name="unique_task_counter_no_status",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.board} - {self.status}"
+
+
+class StatusDailyChange(models.Model):
+    """
+    Net change of the number of non-deleted tasks of a board in a status on
+    one UTC day, written along with the counters. Summed up to a day they
+    give the cumulative flow of the board on that day.
+    """
+    board = models.ForeignKey(Board, on_delete=models.CASCADE)
+    status = models.ForeignKey(Status, on_delete=models.CASCADE)
+    date = models.DateField()
+    change = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["board", "status", "date"], name="unique_status_daily_change"),
+        ]
+
+    def __str__(self):
+        return f"{self.board} - {self.status} - {self.date}"
+
+
+class UserDailyStats(models.Model):
+    """
+    Task activity of a user on one day, written by the nightly rollup.
+    The open_* counts are a snapshot taken by the rollup and are null for
+    days rolled up later than the day after.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    created = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    transitions = models.IntegerField(default=0)
+    open_high = models.IntegerField(null=True, blank=True)
+    open_medium = models.IntegerField(null=True, blank=True)
+    open_low = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "date"], name="unique_user_daily_stats"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.date}"
+
+
+class ImportUpload(models.Model):
+    """
+    A part of the file of an import job. Uploads are kept in the database,
+    which the worker running the job shares with the web process, and
+    removed once the job has read them.
+    """
+    job_id = models.CharField(max_length=32)
+    part = models.IntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["job_id", "part"], name="unique_import_upload_part"),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} - {self.part}"
+
+
 class Report(models.Model):
     user = models.ForeignKey(
         User,
@@ -111,17 +351,94 @@ class Report(models.Model):
         blank=True,
     )
 
+    class Meta:
+        indexes = [
+            # the reports the scheduler looks at
+            models.Index(fields=["send_time"], name="report_due_idx", condition=models.Q(consent=True)),
+        ]
+
     def __str__(self) -> str:
         return self.user.username
 
 
+class EmailOutbox(models.Model):
+    """
+    An email waiting to be sent. Rows are written in the same transaction as
+    the change that produces them and sent later by `drain_outbox`.
+    """
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (DEAD, "Dead"),
+    )
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the messages the sender picks up
+            models.Index(
+                fields=["next_attempt_at"], name="outbox_pending_idx", condition=models.Q(status="pending")
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.to} - {self.subject} ({self.status})"
+
+
 # pre_save to store old_status
 @receiver(signals.pre_save, sender=Task)
 def task_pre_save(sender, instance, **kwargs):
-    if instance.pk:
-        old_status = sender.objects.get(pk=instance.pk).status
-        if old_status != instance.status:
-            history = History.objects.create(
-                task=instance, new_status=instance.status, old_status=old_status
-            )
-            history.save()
+    if instance._state.adding or not instance.tracker.has_changed("status_id"):
+        return
+    old_status_id = instance.tracker.previous("status_id")
+    if old_status_id is not None and instance.status_id is not None:
+        History.objects.create(
+            task=instance, new_status_id=instance.status_id, old_status_id=old_status_id
+        )
+
+
+# post_save to move the task between counters
+@receiver(signals.post_save, sender=Task)
+def task_post_save(sender, instance, created, raw=False, **kwargs):
+    from task_manager.tasks.cache import bump_versions
+    from task_manager.tasks.counters import apply_deltas, counter_state, previous_counter_state, state_deltas
+
+    if raw:
+        return
+    old = None if created else previous_counter_state(instance)
+    apply_deltas(state_deltas(old, counter_state(instance)))
+    bump_versions([instance.user_id])
+
+
+# post_save to expire the cached and conditional responses of the owner
+@receiver(signals.post_save, sender=Board)
+@receiver(signals.post_save, sender=Status)
+def board_post_save(sender, instance, raw=False, **kwargs):
+    from task_manager.tasks.cache import bump_versions
+
+    if raw:
+        return
+    bump_versions([instance.user_id or instance.board.user_id])
+
+
+# post_save to wake the report scheduler when the report is due
+@receiver(signals.post_save, sender=Report)
+def report_post_save(sender, instance, raw=False, **kwargs):
+    from task_manager.tasks.tasks import schedule_report
+
+    if raw or not instance.consent:
+        return
+    transaction.on_commit(lambda: schedule_report(instance.send_time))
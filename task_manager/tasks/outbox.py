@@ -0,0 +1,132 @@
+"""
+Transactional email outbox.
+
+`enqueue()` writes messages in the caller's transaction, so they exist
+exactly when the change producing them commits. `drain()` leases due
+messages in batches, sends them over one connection and retries failures
+with exponential backoff until they are dead-lettered.
+"""
+import logging
+import random
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.utils import timezone
+
+from task_manager.tasks.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+FROM_EMAIL = "tasks@gdctasks.com"
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+# A leased message is retried if its sender dies without reporting back
+LEASE = timedelta(minutes=5)
+
+
+def enqueue(messages):
+    """
+    Save unsaved EmailOutbox instances
+    """
+    return EmailOutbox.objects.bulk_create(messages, batch_size=BATCH_SIZE)
+
+
+def backoff(attempts):
+    """
+    Delay before the next attempt after `attempts` failed ones, doubling from
+    BACKOFF_BASE up to BACKOFF_MAX plus up to 10% jitter
+    """
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * (1 + random.random() / 10)
+
+
+def lease(batch_size, now):
+    """
+    Returns up to `batch_size` due messages, leased to the caller for LEASE.
+    Rows leased by a concurrent sender are skipped.
+    """
+    with transaction.atomic():
+        batch = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailOutbox.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        EmailOutbox.objects.filter(id__in=[message.id for message in batch]).update(next_attempt_at=now + LEASE)
+    return batch
+
+
+def to_email_message(message):
+    email = EmailMultiAlternatives(message.subject, message.body, FROM_EMAIL, [message.to])
+    if message.html_body:
+        email.attach_alternative(message.html_body, "text/html")
+    return email
+
+
+def reconnect(connection):
+    """
+    Drop a connection that may be broken after an error and open a new one
+    """
+    for method in (connection.close, connection.open):
+        try:
+            method()
+        except Exception:
+            logger.exception("Could not reset the mail connection")
+
+
+def send_batch(batch, connection, now):
+    """
+    Send a leased batch over `connection` and record the outcome of every
+    message. Returns the number of (sent, failed, dead) messages.
+    """
+    sent = failed = dead = 0
+    for message in batch:
+        message.attempts += 1
+        try:
+            connection.send_messages([to_email_message(message)])
+        except Exception as error:
+            message.last_error = f"{type(error).__name__}: {error}"
+            if message.attempts >= MAX_ATTEMPTS:
+                message.status = EmailOutbox.DEAD
+                dead += 1
+                logger.error("Giving up on email %s to %s: %s", message.id, message.to, message.last_error)
+            else:
+                message.next_attempt_at = now + backoff(message.attempts)
+                failed += 1
+            reconnect(connection)
+        else:
+            message.status = EmailOutbox.SENT
+            message.sent_at = timezone.now()
+            message.last_error = ""
+            sent += 1
+    EmailOutbox.objects.bulk_update(batch, ["status", "attempts", "next_attempt_at", "last_error", "sent_at"])
+    return sent, failed, dead
+
+
+def drain(connection, batch_size=BATCH_SIZE, deadline=None):
+    """
+    Send due messages batch by batch until none are left or the monotonic
+    `deadline` has passed. Returns the counts of sent, failed and dead
+    messages, whether due messages may be left (`more`) and the earliest
+    retry time of the failed ones (`retry_at`).
+    """
+    stats = {"sent": 0, "failed": 0, "dead": 0, "more": False, "retry_at": None}
+    while True:
+        if deadline is not None and time.monotonic() >= deadline:
+            stats["more"] = True
+            break
+        now = timezone.now()
+        batch = lease(batch_size, now)
+        if not batch:
+            break
+        sent, failed, dead = send_batch(batch, connection, now)
+        stats["sent"] += sent
+        stats["failed"] += failed
+        stats["dead"] += dead
+        retries = [message.next_attempt_at for message in batch if message.status == EmailOutbox.PENDING]
+        if retries:
+            stats["retry_at"] = min(retries + ([stats["retry_at"]] if stats["retry_at"] else []))
+    return stats
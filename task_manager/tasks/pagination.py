@@ -0,0 +1,243 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+# 64 bit integer columns, the widest of the ordering fields
+MIN_INTEGER, MAX_INTEGER = -2 ** 63, 2 ** 63 - 1
+
+
+def encode_cursor(position, reverse=False):
+    """
+    Encode a keyset position (a list of column values) into an opaque token.
+    A `reverse` cursor points at the rows before `position`.
+    """
+    data = {"p": position, "r": 1} if reverse else position
+    data = json.dumps(data, default=str, separators=(",", ":"))
+    return urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Decode a token produced by `encode_cursor`, returns (position, reverse)
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(urlsafe_b64decode(padded.encode()).decode())
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        raise ValidationError({"cursor": "Invalid cursor."})
+    reverse = False
+    if isinstance(data, dict):
+        data, reverse = data.get("p"), bool(data.get("r"))
+    if not isinstance(data, list):
+        raise ValidationError({"cursor": "Invalid cursor."})
+    return data, reverse
+
+
+def reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith("-") else f"-{field}" for field in ordering)
+
+
+def ordering_field(queryset, name):
+    """
+    Returns the model field or annotation output field `name` of a queryset
+    """
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    return queryset.model._meta.get_field(name)
+
+
+def clean_position_value(queryset, name, value):
+    """
+    Convert a value of a decoded position with the field it was read from.
+    Cursors come from clients, a value the field does not accept is an
+    invalid cursor rather than a database error.
+    """
+    if value is None:
+        raise ValidationError({"cursor": "Invalid cursor."})
+    try:
+        value = ordering_field(queryset, name).clean(value, None)
+    except (DjangoValidationError, TypeError, ValueError):
+        raise ValidationError({"cursor": "Invalid cursor."})
+    # larger integers overflow the database driver
+    if isinstance(value, int) and not MIN_INTEGER <= value <= MAX_INTEGER:
+        raise ValidationError({"cursor": "Invalid cursor."})
+    return value
+
+
+def keyset_filter(queryset, ordering, position):
+    """
+    Restrict `queryset` to the rows that come after `position` in `ordering`.
+
+    `ordering` is a sequence of field names as passed to `order_by()`, e.g.
+    ("priority", "id") or ("-change_date", "-id"). The last field must be
+    unique so that every row has exactly one position.
+    """
+    if not isinstance(position, list) or len(position) != len(ordering):
+        raise ValidationError({"cursor": "Invalid cursor."})
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, position):
+        name = field.lstrip("-")
+        value = clean_position_value(queryset, name, value)
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return queryset.filter(condition)
+
+
+def get_position(row, ordering):
+    """
+    Returns the keyset position of a model instance or a `values()` row
+    """
+    names = [field.lstrip("-") for field in ordering]
+    if isinstance(row, dict):
+        return [row[name] for name in names]
+    return [getattr(row, name) for name in names]
+
+
+def keyset_page(queryset, ordering, token, page_size):
+    """
+    Returns one page of `queryset` in `ordering` starting at the cursor `token`,
+    as (rows, next_token, previous_token). Runs a single query, without
+    COUNT(*) or OFFSET.
+    """
+    position, reverse = decode_cursor(token) if token else (None, False)
+    if reverse:
+        ordering = reverse_ordering(ordering)
+
+    queryset = queryset.order_by(*ordering)
+    if position is not None:
+        queryset = keyset_filter(queryset, ordering, position)
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if reverse:
+        rows.reverse()
+        ordering = reverse_ordering(ordering)
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    next_token = previous_token = None
+    if rows and has_next:
+        next_token = encode_cursor(get_position(rows[-1], ordering))
+    if rows and has_previous:
+        previous_token = encode_cursor(get_position(rows[0], ordering), reverse=True)
+    return rows, next_token, previous_token
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique `ordering`
+    """
+    page_size = api_settings.PAGE_SIZE
+    ordering = ("id",)
+    cursor_query_param = "cursor"
+
+    def get_ordering(self, request):
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        rows, self.next_token, self.previous_token = keyset_page(
+            queryset, self.get_ordering(request), request.query_params.get(self.cursor_query_param), self.page_size
+        )
+        return rows
+
+    def get_link(self, token):
+        if token is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_link(self.next_token)),
+            ("previous", self.get_link(self.previous_token)),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+
+class TaskKeysetPagination(KeysetPagination):
+    ordering = ("priority", "id")
+    search_ordering = ("-search_rank", "id")
+
+    def get_ordering(self, request):
+        if request.query_params.get("search"):
+            return self.search_ordering
+        return self.ordering
+
+
+class HistoryKeysetPagination(KeysetPagination):
+    ordering = ("-change_date", "-id")
+
+
+class OptionalKeysetPagination(PageNumberPagination):
+    """
+    Page number pagination, switching to `keyset_class` for requests with
+    `?pagination=cursor` (or a `cursor`), which skips the COUNT(*) and OFFSET
+    """
+    keyset_class = KeysetPagination
+    mode_query_param = "pagination"
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.keyset_class() if self.use_keyset(request) else None
+        if self.keyset is not None:
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Set to `cursor` for cursor pagination without a total count.",
+                "schema": {"type": "string", "enum": ["cursor"]},
+            },
+            {
+                "name": self.keyset_class.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+        ]
+
+
+class TaskPagination(OptionalKeysetPagination):
+    keyset_class = TaskKeysetPagination
+
+
+class HistoryPagination(OptionalKeysetPagination):
+    keyset_class = HistoryKeysetPagination
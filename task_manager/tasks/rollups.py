@@ -0,0 +1,83 @@
+"""
+Nightly rollup of task activity into one UserDailyStats row per user and
+day, so reports and charts read a handful of rows instead of the task and
+history tables.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from task_manager.tasks.models import History, Task, UserDailyStats
+
+# Days rollup_pending goes back at most, older gaps need the
+# rollup_daily_stats command with --since
+MAX_CATCH_UP_DAYS = 31
+
+
+def day_bounds(day):
+    """
+    Returns the aware [start, end) datetimes of `day` in the current time zone
+    """
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def rollup_day(day, snapshot=False):
+    """
+    (Re)write the stats of `day` from four grouped queries. With `snapshot`
+    the open task counts are taken from the current state of the tasks.
+    Returns the number of rows written.
+    """
+    start, end = day_bounds(day)
+    stats = defaultdict(dict)
+
+    created = Task.objects.filter(date_created__gte=start, date_created__lt=end).order_by().values("user")
+    for row in created.annotate(created=Count("id")):
+        stats[row["user"]]["created"] = row["created"]
+
+    # the completed flag, like the open counts, whatever the status
+    completed = Task.objects.filter(completed_at__gte=start, completed_at__lt=end).order_by().values("user")
+    for row in completed.annotate(completed=Count("id")):
+        stats[row["user"]]["completed"] = row["completed"]
+
+    changes = History.objects.filter(change_date__gte=start, change_date__lt=end).order_by().values("task__user")
+    for row in changes.annotate(
+        transitions=Count("id"),
+        cancelled=Count("id", filter=Q(new_status__title__iexact="cancelled")),
+    ):
+        user_stats = stats[row["task__user"]]
+        user_stats["transitions"] = row["transitions"]
+        user_stats["cancelled"] = row["cancelled"]
+
+    if snapshot:
+        open_tasks = Task.objects.filter(deleted=False, completed=False).order_by().values("user", "priority")
+        for row in open_tasks.annotate(count=Count("id")):
+            stats[row["user"]][f"open_{row['priority']}"] = row["count"]
+        for user_stats in stats.values():
+            for priority in ("high", "medium", "low"):
+                user_stats.setdefault(f"open_{priority}", 0)
+
+    with transaction.atomic():
+        UserDailyStats.objects.filter(date=day).delete()
+        UserDailyStats.objects.bulk_create(
+            [UserDailyStats(user_id=user_id, date=day, **values) for user_id, values in stats.items()],
+            batch_size=1000,
+        )
+    return len(stats)
+
+
+def rollup_pending(today=None):
+    """
+    Roll up every day after the last rolled up one, until yesterday. Only
+    yesterday gets the open task snapshot. Returns the days rolled up.
+    """
+    yesterday = (today or timezone.localdate()) - timedelta(days=1)
+    last = UserDailyStats.objects.aggregate(last=Max("date"))["last"]
+    first = max(last + timedelta(days=1), yesterday - timedelta(days=MAX_CATCH_UP_DAYS - 1)) if last else yesterday
+    days = [first + timedelta(days=i) for i in range((yesterday - first).days + 1)]
+    for day in days:
+        rollup_day(day, snapshot=day == yesterday)
+    return days
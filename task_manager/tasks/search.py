@@ -0,0 +1,250 @@
+"""
+Full-text search over task titles and descriptions.
+
+On PostgreSQL every task row carries a weighted `search_vector` tsvector
+column with a GIN index, on SQLite an FTS5 table mirrors the tasks. Both are
+kept in sync by database triggers, so bulk writes are covered as well. The
+column and the FTS5 table are not part of the Task model, they are created
+by `install()`. Other databases fall back to `icontains`.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.expressions import RawSQL
+
+from task_manager.tasks.models import Task
+
+TABLE = Task._meta.db_table
+FTS_TABLE = f"{TABLE}_fts"
+SEARCH_CONFIG = "english"
+SEARCH_MIGRATION = "0027_task_search"
+
+POSTGRES_INSTALL = [
+    f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    f"""
+    CREATE OR REPLACE FUNCTION {TABLE}_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"DROP TRIGGER IF EXISTS {TABLE}_search_vector_trigger ON {TABLE}",
+    f"""
+    CREATE TRIGGER {TABLE}_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON {TABLE}
+    FOR EACH ROW EXECUTE PROCEDURE {TABLE}_search_vector_update()
+    """,
+    f"""
+    UPDATE {TABLE} SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')
+    """,
+    f"CREATE INDEX IF NOT EXISTS task_search_vector_idx ON {TABLE} USING gin (search_vector)",
+]
+
+POSTGRES_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_search_vector_trigger ON {TABLE}",
+    f"DROP FUNCTION IF EXISTS {TABLE}_search_vector_update()",
+    "DROP INDEX IF EXISTS task_search_vector_idx",
+    f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_insert": f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"{FTS_TABLE}_delete": f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"{FTS_TABLE}_update": f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF title, description ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+}
+
+SQLITE_INSTALL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+    USING fts5(title, description, content='{TABLE}', content_rowid='id')
+    """,
+    *SQLITE_TRIGGERS.values(),
+]
+
+SQLITE_UNINSTALL = [
+    *(f"DROP TRIGGER IF EXISTS {name}" for name in SQLITE_TRIGGERS),
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+# connection alias -> backend, filled on first use
+_backends = {}
+
+
+def sqlite_triggers_installed(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [TABLE]
+        )
+        names = {row[0] for row in cursor.fetchall()}
+    return names >= set(SQLITE_TRIGGERS)
+
+
+def install(connection):
+    """
+    Create the search column/table, its triggers and index, and index the
+    existing tasks. Safe to run more than once.
+    """
+    if connection.vendor == "postgresql":
+        statements = POSTGRES_INSTALL
+    elif connection.vendor == "sqlite":
+        if sqlite_triggers_installed(connection):
+            return
+        statements = SQLITE_INSTALL + [f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"]
+    else:
+        return
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    _backends.pop(connection.alias, None)
+
+
+def uninstall(connection):
+    if connection.vendor == "postgresql":
+        statements = POSTGRES_UNINSTALL
+    elif connection.vendor == "sqlite":
+        statements = SQLITE_UNINSTALL
+    else:
+        return
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    _backends.pop(connection.alias, None)
+
+
+def install_sqlite_search(sender, using, **kwargs):
+    """
+    post_migrate receiver. SQLite drops the triggers whenever a migration
+    rebuilds the task table, this puts them back unless the search migration
+    has been unapplied.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite" or TABLE not in connection.introspection.table_names():
+        return
+    applied = {name for app, name in MigrationRecorder(connection).applied_migrations() if app == "tasks"}
+    if applied and SEARCH_MIGRATION not in applied:
+        return
+    install(connection)
+
+
+def terms(query):
+    return re.findall(r"\w+", query.lower())
+
+
+class SearchBackend:
+    """
+    Substring match on the title and description, for databases without a
+    search index. Every match gets the same rank.
+    """
+
+    def is_available(self, connection):
+        return True
+
+    def no_match(self, queryset):
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def search(self, queryset, query):
+        words = terms(query)
+        if not words:
+            return self.no_match(queryset)
+        condition = Q()
+        for word in words:
+            condition &= Q(title__icontains=word) | Q(description__icontains=word)
+        return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Ranked match against the `search_vector` column, title words weigh more
+    than description words. The last word also matches as a prefix.
+    """
+
+    def is_available(self, connection):
+        with connection.cursor() as cursor:
+            columns = connection.introspection.get_table_description(cursor, TABLE)
+        return any(column.name == "search_vector" for column in columns)
+
+    def search(self, queryset, query):
+        words = terms(query)
+        if not words:
+            return self.no_match(queryset)
+        tsquery = " & ".join(words) + ":*"
+        match = RawSQL(
+            f"{TABLE}.search_vector @@ to_tsquery('{SEARCH_CONFIG}', %s)", [tsquery], output_field=BooleanField()
+        )
+        rank = RawSQL(
+            f"ts_rank({TABLE}.search_vector, to_tsquery('{SEARCH_CONFIG}', %s))", [tsquery], output_field=FloatField()
+        )
+        return queryset.filter(match).annotate(search_rank=rank)
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    Ranked match against the FTS5 table with bm25, title words weigh more
+    than description words. The last word also matches as a prefix.
+    """
+
+    def is_available(self, connection):
+        return sqlite_triggers_installed(connection)
+
+    def search(self, queryset, query):
+        words = terms(query)
+        if not words:
+            return self.no_match(queryset)
+        match_query = " ".join(f'"{word}"' for word in words) + "*"
+        match = RawSQL(
+            f"{TABLE}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+            [match_query],
+            output_field=BooleanField(),
+        )
+        # bm25() is lower for better matches
+        rank = RawSQL(
+            f"(SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {TABLE}.id)",
+            [match_query],
+            output_field=FloatField(),
+        )
+        return queryset.filter(match).annotate(search_rank=rank)
+
+
+BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+
+
+def get_backend(using="default"):
+    if using not in _backends:
+        connection = connections[using]
+        backend = BACKENDS.get(connection.vendor, SearchBackend)()
+        _backends[using] = backend if backend.is_available(connection) else SearchBackend()
+    return _backends[using]
+
+
+def search_tasks(queryset, query):
+    """
+    Filter a task queryset to the tasks matching `query`, best matches first.
+    The rank is available as `search_rank` on every task.
+    """
+    return get_backend(queryset.db).search(queryset, query).order_by("-search_rank", "id")
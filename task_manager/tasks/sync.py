@@ -0,0 +1,225 @@
+"""
+Change feed of the boards, statuses and tasks of a user.
+
+Every table is read in (sync_version, id) order from its own position, and
+the three positions travel together in one opaque cursor. Soft deleted rows
+are returned as tombstones, except on the first sync where there is nothing
+to remove yet.
+
+`sync_version` follows the order in which writes commit, not the clock: it
+is written by database triggers on every insert and update, created by
+`install()`. On PostgreSQL it is the id of the writing transaction, and only
+the rows of transactions older than every transaction still running are
+returned, so a transaction that commits late holds the feed back instead of
+landing behind the cursors that moved past it. SQLite runs one write
+transaction at a time, a counter bumped by the triggers is in commit order
+already. Other databases are not supported.
+"""
+from django.db import NotSupportedError, connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from rest_framework.exceptions import ValidationError
+
+from task_manager.tasks.models import Board, Status, Task
+from task_manager.tasks.pagination import decode_cursor, encode_cursor, get_position, keyset_filter
+
+SYNC_MIGRATION = "0034_sync_version"
+
+ORDERING = ("sync_version", "id")
+
+FEEDS = (
+    ("boards", Board, ("id", "title", "description", "created_at", "updated_at")),
+    ("statuses", Status, ("id", "title", "board", "created_at", "updated_at")),
+    (
+        "tasks",
+        Task,
+        (
+            "id", "external_id", "title", "priority", "description", "completed",
+            "status", "board", "date_created", "updated_at",
+        ),
+    ),
+)
+
+TABLES = [model._meta.db_table for _, model, _ in FEEDS]
+CLOCK_TABLE = "tasks_sync_clock"
+
+POSTGRES_INSTALL = [
+    """
+    CREATE OR REPLACE FUNCTION tasks_sync_version_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.sync_version := txid_current();
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    *(
+        statement
+        for table in TABLES
+        for statement in (
+            f"DROP TRIGGER IF EXISTS {table}_sync_version_trigger ON {table}",
+            f"""
+            CREATE TRIGGER {table}_sync_version_trigger
+            BEFORE INSERT OR UPDATE ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE tasks_sync_version_update()
+            """,
+        )
+    ),
+]
+
+POSTGRES_UNINSTALL = [
+    *(f"DROP TRIGGER IF EXISTS {table}_sync_version_trigger ON {table}" for table in TABLES),
+    "DROP FUNCTION IF EXISTS tasks_sync_version_update()",
+]
+
+# AFTER triggers that write the row again, SQLite does not run triggers
+# from the statements of a trigger (recursive_triggers is off)
+SQLITE_TRIGGERS = {
+    f"{table}_sync_{event}": f"""
+    CREATE TRIGGER IF NOT EXISTS {table}_sync_{event} AFTER {event.upper()} ON {table} BEGIN
+        UPDATE {CLOCK_TABLE} SET value = value + 1;
+        UPDATE {table} SET sync_version = (SELECT value FROM {CLOCK_TABLE}) WHERE id = new.id;
+    END
+    """
+    for table in TABLES
+    for event in ("insert", "update")
+}
+
+SQLITE_INSTALL = [
+    f"CREATE TABLE IF NOT EXISTS {CLOCK_TABLE} (value integer NOT NULL)",
+    # a clock created again starts after the versions already written
+    f"""
+    INSERT INTO {CLOCK_TABLE} (value)
+    SELECT max({", ".join(f"(SELECT coalesce(max(sync_version), 0) FROM {table})" for table in TABLES)})
+    WHERE NOT EXISTS (SELECT 1 FROM {CLOCK_TABLE})
+    """,
+    *SQLITE_TRIGGERS.values(),
+]
+
+SQLITE_UNINSTALL = [
+    *(f"DROP TRIGGER IF EXISTS {name}" for name in SQLITE_TRIGGERS),
+    f"DROP TABLE IF EXISTS {CLOCK_TABLE}",
+]
+
+
+def sqlite_triggers_installed(connection):
+    with connection.cursor() as cursor:
+        placeholders = ", ".join(["%s"] * len(TABLES))
+        cursor.execute(
+            f"SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({placeholders})", TABLES
+        )
+        names = {row[0] for row in cursor.fetchall()}
+    return names >= set(SQLITE_TRIGGERS)
+
+
+def install(connection):
+    """
+    Create the triggers writing `sync_version`, and the clock on SQLite.
+    Safe to run more than once.
+    """
+    if connection.vendor == "postgresql":
+        statements = POSTGRES_INSTALL
+    elif connection.vendor == "sqlite":
+        if sqlite_triggers_installed(connection):
+            return
+        statements = SQLITE_INSTALL
+    else:
+        return
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def uninstall(connection):
+    if connection.vendor == "postgresql":
+        statements = POSTGRES_UNINSTALL
+    elif connection.vendor == "sqlite":
+        statements = SQLITE_UNINSTALL
+    else:
+        return
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install_sqlite_sync(sender, using, **kwargs):
+    """
+    post_migrate receiver. SQLite drops the triggers whenever a migration
+    rebuilds one of the tables, this puts them back unless the sync
+    migration has been unapplied.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite" or not set(TABLES) <= set(connection.introspection.table_names()):
+        return
+    applied = {name for app, name in MigrationRecorder(connection).applied_migrations() if app == "tasks"}
+    if applied and SYNC_MIGRATION not in applied:
+        return
+    install(connection)
+
+
+def horizon(connection):
+    """
+    Returns the sync_version below which every write has committed or
+    rolled back
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # the oldest transaction still running
+            cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        elif connection.vendor == "sqlite":
+            cursor.execute(f"SELECT value + 1 FROM {CLOCK_TABLE}")
+        else:
+            raise NotSupportedError(f"The change feed does not support {connection.vendor}.")
+        return cursor.fetchone()[0]
+
+
+def decode_positions(token):
+    """
+    Returns the position of every feed in a cursor, None for feeds that have
+    not been read yet
+    """
+    if not token:
+        return [None] * len(FEEDS)
+    positions, _ = decode_cursor(token)
+    if len(positions) != len(FEEDS):
+        raise ValidationError({"cursor": "Invalid cursor."})
+    return positions
+
+
+def changes(user, token, limit):
+    """
+    Returns the rows of `user` changed after the cursor `token`, at most
+    `limit` per table, with the cursor to continue from and whether more
+    changes are waiting
+    """
+    positions = decode_positions(token)
+    committed = horizon(connection)
+    response = {}
+    more = False
+
+    for index, (name, model, fields) in enumerate(FEEDS):
+        rows = model.objects.filter(user=user, sync_version__lt=committed).order_by(*ORDERING)
+        if positions[index] is None:
+            rows = rows.filter(deleted=False)
+        else:
+            rows = keyset_filter(rows, ORDERING, positions[index])
+        rows = list(rows.values("deleted", "sync_version", *fields)[:limit + 1])
+        if len(rows) > limit:
+            more = True
+            rows = rows[:limit]
+            positions[index] = get_position(rows[-1], ORDERING)
+        else:
+            # everything before `committed` has been read, including the
+            # tombstones a first sync leaves out
+            positions[index] = [committed, 0]
+        changed, deleted = [], []
+        for row in rows:
+            del row["sync_version"]
+            if row.pop("deleted"):
+                deleted.append(row["id"])
+            else:
+                changed.append(row)
+        response[name] = changed
+        response[f"deleted_{name}"] = deleted
+
+    response["cursor"] = encode_cursor(positions)
+    response["more"] = more
+    return response
@@ -1,49 +1,267 @@
+import logging
+import time
+from datetime import datetime, timedelta
 
-from datetime import datetime, time, timedelta
-from pytz import timezone
-from django.core.mail import send_mail
-from task_manager.tasks.models import Task, Report
-from celery.decorators import periodic_task
-
-# from config import celery_app as app
-
-
-def send_email_report(report) -> None:
-    user = report.user
-    task = Task.objects.filter(user=user, deleted=False)
-    print(f"Sending email reminder to {user.username}\n")
-    pending_tasks = task.filter(status="pending").count()
-    completed_tasks = task.filter(status="completed").count()
-    in_progress_tasks = task.filter(status="in_progress").count()
-    cancelled_tasks = task.filter(status="cancelled").count()
-    email_content = f"""
-        Hi {user.username},
-        \n\nYou have {pending_tasks} pending tasks,
-        {completed_tasks} completed tasks,
-        {in_progress_tasks} in progress tasks,
-        {cancelled_tasks} cancelled tasks.
-        \n\nRegards,\nTask Manager
-    """
-    send_mail(
-        "Task Manager Report",
-        (email_content),
-        "tasks@gdctasks.com",
-        [user.email],
-        fail_silently=False,  # Throw exception if email fails to send
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from config import celery_app
+from task_manager.tasks import digest, importer, metrics, outbox, rollups
+from task_manager.tasks.locks import exclusive
+from task_manager.tasks.models import Board, Report
+
+logger = logging.getLogger(__name__)
+
+# Reports per send_report_batch task
+REPORT_BATCH_SIZE = 500
+
+# Longest expected periodic_emailer run, in seconds
+EMAILER_INTERVAL = 60
+
+# Seconds after which a periodic_emailer run skipped because the previous
+# run held the lock tries again
+EMAILER_RETRY_SECONDS = 10
+
+# How far ahead schedule_reports queues wake-ups, longer than its 10 minute
+# interval in CELERY_BEAT_SCHEDULE so consecutive sweeps overlap
+REPORT_SWEEP_HORIZON = timedelta(minutes=15)
+
+# Seconds one drain_outbox run sends for before handing over to a new run,
+# below CELERY_TASK_SOFT_TIME_LIMIT
+OUTBOX_DRAIN_SECONDS = 45
+
+# Seconds an import_tasks_job may run, well above the ~10s of 100k tasks
+IMPORT_SECONDS = 10 * 60
+
+
+def due_report_batches(now, batch_size=REPORT_BATCH_SIZE):
+    """
+    Yields the ids of the due reports in batches, walking the id index
+    instead of holding a cursor open
+    """
+    reports = Report.objects.filter(send_time__lte=now, consent=True).order_by("id").values_list("id", flat=True)
+    last_id = 0
+    while True:
+        batch = list(reports.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def claim_reports(report_ids, now):
+    """
+    Lock the given reports that are still due, skipping rows another worker
+    holds, and move them on by one day. Returns the claimed reports as
+    (user id, username, email).
+
+    Must run in a transaction. Once it commits the claimed day is no longer
+    due, so a retried or overlapping run cannot send it again. A report more
+    than a day behind stays due for its next missed day.
+    """
+    claimed = list(
+        Report.objects.select_for_update(skip_locked=True, of=("self",))
+        .filter(id__in=report_ids, send_time__lte=now, consent=True)
+        .order_by("id")
+        .values_list("id", "user_id", "user__username", "user__email")
     )
-    # increment by a day
-    report.send_time += timedelta(days=1)
-    report.save()
-    print("Email sent to {}".format(user.email))
+    Report.objects.filter(id__in=[row[0] for row in claimed]).update(send_time=F("send_time") + timedelta(days=1))
+    return [row[1:] for row in claimed]
+
+
+@celery_app.task()
+def send_report_batch(report_ids, now):
+    """
+    Claim one batch of reports and put them in the outbox, in one
+    transaction. `now` is the ISO timestamp the batch was found due at.
+    """
+    with transaction.atomic():
+        claimed = claim_reports(report_ids, parse_datetime(now))
+        if claimed:
+            outbox.enqueue(digest.build_digests(claimed, timezone.now()))
+    if claimed:
+        drain_outbox.delay()
+    return len(claimed)
+
+
+@celery_app.task()
+def drain_outbox(backend=None):
+    """
+    Send the due outbox messages over one connection. Records the
+    `outbox.sent`, `outbox.failed` and `outbox.dead` counters and the
+    `outbox.throughput` in messages per second.
+    """
+    started = time.monotonic()
+    with get_connection(backend, fail_silently=False) as connection:
+        stats = outbox.drain(connection, deadline=started + OUTBOX_DRAIN_SECONDS)
+    elapsed = time.monotonic() - started
+
+    for name in ("sent", "failed", "dead"):
+        if stats[name]:
+            metrics.incr(f"outbox.{name}", stats[name])
+    if stats["sent"]:
+        metrics.gauge("outbox.throughput", stats["sent"] / elapsed)
+    logger.info("Outbox drained: %s sent, %s failed, %s dead", stats["sent"], stats["failed"], stats["dead"])
+
+    if stats["more"]:
+        drain_outbox.delay(backend)
+    elif stats["retry_at"]:
+        # one retry run per minute, covering every message due within it
+        retry_at = stats["retry_at"].replace(second=0, microsecond=0) + timedelta(minutes=1)
+        key = f"tasks:outbox-retry:{retry_at.isoformat()}"
+        if first_claim(key, int((retry_at - timezone.now()).total_seconds()) + 60):
+            drain_outbox.apply_async((backend,), eta=retry_at)
+    return stats["sent"]
+
+
+def first_claim(key, timeout):
+    """
+    Set `key` in the cache unless it is there already. Returns False only
+    when the key is known to exist: when the cache fails, raising or, with
+    IGNORE_EXCEPTIONS, returning None, the caller goes ahead, as a duplicate
+    run finds nothing to do while a dropped one leaves work waiting.
+    """
+    try:
+        added = cache.add(key, 1, timeout)
+    except Exception:
+        logger.warning("Could not claim %s in the cache", key, exc_info=True)
+        return True
+    if added is None:
+        logger.warning("Could not claim %s in the cache", key)
+    return added is not False
 
 
-@periodic_task(run_every=timedelta(minutes=1))
+def schedule_wakeup(wake, now):
+    """
+    Queue a periodic_emailer run at `wake`, once per distinct time
+    """
+    key = f"tasks:report-wakeup:{wake.isoformat()}"
+    if not first_claim(key, int((wake - now).total_seconds()) + 60):
+        return False
+    periodic_emailer.apply_async(eta=wake)
+    return True
+
+
+def schedule_report(send_time):
+    """
+    Wake the emailer when a report is due at `send_time`. Times beyond the
+    sweep horizon are left to a later `schedule_reports` run.
+    """
+    if isinstance(send_time, str):
+        send_time = parse_datetime(send_time)
+    if timezone.is_naive(send_time):
+        send_time = timezone.make_aware(send_time, timezone.utc)
+    now = timezone.now()
+    if send_time <= now:
+        periodic_emailer.delay()
+    elif send_time <= now + REPORT_SWEEP_HORIZON:
+        schedule_wakeup(send_time, now)
+
+
+@celery_app.task()
+def schedule_reports():
+    """
+    Queue a wake-up for each minute with reports due within the horizon, and
+    an immediate run when reports are overdue. Catches wake-ups lost with the
+    broker or never queued because the report was saved too far ahead.
+    """
+    now = timezone.now()
+    reports = Report.objects.filter(consent=True, send_time__lte=now + REPORT_SWEEP_HORIZON)
+    wakeups = reports.annotate(minute=TruncMinute("send_time")).order_by().values("minute").annotate(
+        wake=Max("send_time")
+    ).values_list("wake", flat=True)
+    scheduled = 0
+    overdue = False
+    for wake in wakeups:
+        if wake <= now:
+            overdue = True
+        elif schedule_wakeup(wake, now):
+            scheduled += 1
+    if overdue:
+        periodic_emailer.delay()
+    return scheduled
+
+
+def retry_emailer():
+    """
+    Queue the periodic_emailer run of a skipped one. The running sweep may
+    have started before the reports the skipped run woke up for were due,
+    and their wake-up minute cannot be queued again. Skips within the same
+    EMAILER_RETRY_SECONDS slot share one retry.
+    """
+    slot = (int(timezone.now().timestamp()) // EMAILER_RETRY_SECONDS + 1) * EMAILER_RETRY_SECONDS
+    retry_at = datetime.fromtimestamp(slot, tz=timezone.utc)
+    key = f"tasks:emailer-retry:{retry_at.isoformat()}"
+    if first_claim(key, EMAILER_RETRY_SECONDS + 60):
+        periodic_emailer.apply_async(eta=retry_at)
+
+
+@celery_app.task()
+@exclusive(interval=EMAILER_INTERVAL, on_skip=retry_emailer)
 def periodic_emailer():
-    currentTime = datetime.now(timezone('UTC'))
-    print("Checking time for user daily report......")
-    reports = Report.objects.filter(
-        send_time__lte=currentTime,
-        consent=True
-    )
-    for rpt in reports:
-        send_email_report(rpt)
+    """
+    Split the due reports into batches and queue one `send_report_batch` per
+    batch, they are routed to the email queue and run in parallel.
+    Records how late the oldest due report is as `periodic_emailer.lag`.
+    """
+    now = timezone.now()
+    oldest = Report.objects.filter(send_time__lte=now, consent=True).aggregate(oldest=Min("send_time"))["oldest"]
+    metrics.gauge("periodic_emailer.lag", (now - oldest).total_seconds() if oldest else 0)
+    batches = 0
+    for batch in due_report_batches(now):
+        send_report_batch.delay(batch, now.isoformat())
+        batches += 1
+    logger.info("Queued %s daily report batches", batches)
+    return batches
+
+
+@celery_app.task()
+def rollup_daily_stats():
+    """
+    Write the UserDailyStats of the days that are not rolled up yet
+    """
+    days = rollups.rollup_pending()
+    logger.info("Rolled up daily stats of %s", ", ".join(str(day) for day in days) or "no days")
+    return len(days)
+
+
+@celery_app.task(soft_time_limit=IMPORT_SECONDS, time_limit=IMPORT_SECONDS + 60)
+def import_tasks_job(job_id):
+    """
+    Import the uploaded file of an import job, recording the rows read so
+    far in the job state after every chunk. The upload is removed once done.
+    """
+    job = importer.get_job(job_id)
+    if job is None:
+        logger.warning("Import job %s expired before it ran", job_id)
+        importer.delete_upload(job_id)
+        return None
+    save_job = importer.save_job
+    save_job(job, state="running")
+
+    def progress(result):
+        save_job(job, **result)
+
+    try:
+        user = get_user_model().objects.get(id=job["user"])
+        board = Board.objects.get(id=job["board"]) if job["board"] else None
+        with importer.open_upload(job_id) as upload:
+            result = importer.import_file(user, upload, job["format"], board=board, progress=progress)
+    except importer.ImportFormatError as error:
+        save_job(job, state="failed", detail=str(error))
+        return None
+    except Exception:
+        save_job(job, state="failed", detail="The import failed.")
+        raise
+    finally:
+        importer.delete_upload(job_id)
+
+    save_job(job, state="done", **result)
+    logger.info("Import job %s created %s tasks from %s rows", job_id, result["created"], result["rows"])
+    return result["created"]
@@ -1,8 +1,39 @@
 from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 
-from task_manager.tasks.models import Task
+import csv
+import gzip
+import io
+import json
+import uuid
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import msgpack
+
+from task_manager.tasks.analytics import rebuild_status_changes
+from task_manager.tasks.api.renderers import ORJSONRenderer
+from task_manager.tasks.api.views import TaskSerializer
+from task_manager.tasks.cache import VERSION_TIMEOUT
+from task_manager.tasks.models import (
+    Board, History, ImportUpload, Status, Task, TaskCounter, UserDailyStats,
+)
+from task_manager.tasks.pagination import TaskKeysetPagination, encode_cursor
+from task_manager.tasks.rollups import rollup_day, rollup_pending
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy
+from drf_spectacular.generators import SchemaGenerator
+from datetime import timedelta
+import time
 
 User = get_user_model()
 
@@ -128,12 +159,1006 @@ class TestHistoryAPI(APITestCase):
         self.assertEqual(response.json()[2]['old_status'], "pending")
         self.assertEqual(response.json()[2]['new_status'], "in_progress")
 
-        
 
+class TestKanbanAPI(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        return super().setUp()
 
+    def add_column(self, title, tasks):
+        status_obj = Status.objects.create(title=title, board=self.board, user=self.user)
+        for i in range(tasks):
+            Task.objects.create(
+                title=f"{title} {i}", priority="low", status=status_obj, board=self.board, user=self.user
+            )
+        return status_obj
 
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.request.get(f"/api/list/status/{self.board.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
 
-        
+    def test_constant_queries(self):
+        self.add_column("pending", 2)
+        queries = self.count_queries()
+        for i in range(5):
+            self.add_column(f"column {i}", 3)
+        self.assertEqual(queries, self.count_queries())
+
+    def test_column_heads(self):
+        pending = self.add_column("pending", 0)
+        done = self.add_column("done", 2)
+        for priority in ["low", "high", "medium", "high"]:
+            Task.objects.create(title=priority, priority=priority, status=pending, board=self.board, user=self.user)
+        Task.objects.create(
+            title="deleted", priority="high", status=pending, board=self.board, user=self.user, deleted=True
+        )
+
+        response = self.request.get(f"/api/list/status/{self.board.id}/?limit=2")
+        results = {column["id"]: column for column in response.json()["results"]}
+        expected = Task.objects.filter(status=pending, deleted=False).order_by("priority", "id")[:2]
+        self.assertEqual([task["id"] for task in results[pending.id]["tasks"]], [task.id for task in expected])
+        self.assertEqual(results[pending.id]["count"], 4)
+        self.assertIsNotNone(results[pending.id]["next"])
+        self.assertEqual(len(results[done.id]["tasks"]), 2)
+        self.assertEqual(results[done.id]["count"], 2)
+        self.assertIsNone(results[done.id]["next"])
+
+    def test_column_pagination(self):
+        column = self.add_column("pending", 5)
+
+        response = self.request.get(f"/api/list/status/{self.board.id}/?limit=2")
+        result = response.json()["results"][0]
+        self.assertEqual(result["count"], 5)
+        self.assertEqual(len(result["tasks"]), 2)
+        self.assertIsNotNone(result["next"])
+
+        seen = [task["id"] for task in result["tasks"]]
+        cursor = result["next"]
+        while cursor:
+            response = self.request.get(
+                f"/api/list/status/{self.board.id}/", {"status": column.id, "cursor": cursor, "limit": 2}
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [task["id"] for task in response.json()["tasks"]]
+            cursor = response.json()["next"]
+
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(len(seen), 5)
+
+        response = self.request.get(f"/api/list/status/{self.board.id}/", {"status": column.id, "cursor": "junk"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestTaskCounters(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.pending = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        self.done = Status.objects.create(title="Done", board=self.board, user=self.user)
+        return super().setUp()
+
+    def assertCounts(self, total, completed):
+        response = self.request.get("/api/count/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["total"], total)
+        self.assertEqual(response.json()["completed"], completed)
+        self.assertEqual(response.json()["incomplete"], total - completed)
+
+    def test_counters_follow_writes(self):
+        task1 = Task.objects.create(
+            title="Task1", priority="low", status=self.pending, board=self.board, user=self.user
+        )
+        task2 = Task.objects.create(
+            title="Task2", priority="low", status=self.pending, board=self.board, user=self.user
+        )
+        self.assertCounts(2, 0)
+
+        task1.status = self.done
+        task1.completed = True
+        task1.save()
+        self.assertCounts(2, 1)
+        self.assertEqual(TaskCounter.objects.get(status=self.done).total, 1)
+        self.assertEqual(TaskCounter.objects.get(status=self.pending).total, 1)
+
+        task2.soft_delete()
+        self.assertCounts(1, 1)
+
+        Task.objects.filter(user=self.user).soft_delete()
+        self.assertCounts(0, 0)
+
+    def test_rebuild_command(self):
+        Task.objects.create(title="Task1", priority="low", status=self.pending, board=self.board, user=self.user)
+        Task.objects.create(
+            title="Task2", priority="low", completed=True, status=self.done, board=self.board, user=self.user
+        )
+        TaskCounter.objects.all().update(total=42)
+
+        call_command("rebuild_task_counters", stdout=StringIO())
+        self.assertCounts(2, 1)
+
+
+class TestTaskTracking(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.pending = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        self.done = Status.objects.create(title="Done", board=self.board, user=self.user)
+        self.task = Task.objects.create(
+            title="Task1", priority="low", status=self.pending, board=self.board, user=self.user
+        )
+        return super().setUp()
+
+    def test_status_change_without_select(self):
+        self.task.status = self.done
+        with CaptureQueriesContext(connection) as context:
+            self.task.save()
+        statements = [query["sql"] for query in context.captured_queries]
+        self.assertFalse([sql for sql in statements if sql.startswith('SELECT "tasks_task"')])
+
+        update = [sql for sql in statements if sql.startswith('UPDATE "tasks_task"')][0]
+        self.assertIn('"status_id"', update)
+        self.assertNotIn('"title"', update)
+
+        history = History.objects.get(task=self.task)
+        self.assertEqual(history.old_status, self.pending)
+        self.assertEqual(history.new_status, self.done)
+
+    def test_soft_delete_writes_one_column(self):
+        with CaptureQueriesContext(connection) as context:
+            self.task.soft_delete()
+        update = [query["sql"] for query in context.captured_queries if query["sql"].startswith('UPDATE "tasks_task"')]
+        self.assertEqual(len(update), 1)
+        self.assertNotIn('"title"', update[0])
+        self.assertFalse(History.objects.exists())
+        self.assertTrue(Task.objects.get(pk=self.task.pk).deleted)
+
+
+class TestTaskPriority(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        return super().setUp()
+
+    def test_priority_representation(self):
+        for priority in ("low", "high", "medium"):
+            Task.objects.create(title=f"{priority} task", priority=priority, board=self.board, user=self.user)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT priority FROM tasks_task ORDER BY priority")
+            self.assertEqual([row[0] for row in cursor.fetchall()], [1, 2, 3])
+
+        ordered = Task.objects.filter(user=self.user).order_by("priority").values_list("priority", flat=True)
+        self.assertEqual(list(ordered), ["high", "medium", "low"])
+        self.assertEqual(Task.objects.filter(priority="medium").count(), 1)
+
+        response = self.request.post(
+            "/api/tasks/", data={"title": "new task", "priority": "high", "board": self.board.id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["priority"], "high")
+
+        response = self.request.post(
+            "/api/tasks/", data={"title": "bad task", "priority": "urgent", "board": self.board.id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.request.get("/api/tasks/", {"priority": "low"})
+        self.assertEqual([task["priority"] for task in response.json()["results"]], ["low"])
+
+
+@mock.patch.object(TaskKeysetPagination, "page_size", 2)
+class TestKeysetPagination(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        for i, priority in enumerate(["low", "high", "medium", "high", "low"]):
+            Task.objects.create(title=f"Task{i}", priority=priority, board=self.board, user=self.user)
+        return super().setUp()
+
+    def test_cursor_pages(self):
+        expected = list(Task.objects.order_by("priority", "id").values_list("id", flat=True))
+
+        response = self.request.get("/api/tasks/", {"pagination": "cursor"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.json())
+        self.assertIsNone(response.json()["previous"])
+
+        pages = [response.json()]
+        while pages[-1]["next"]:
+            pages.append(self.request.get(pages[-1]["next"]).json())
+        seen = [task["id"] for page in pages for task in page["results"]]
+        self.assertEqual(seen, expected)
+
+        # and back again
+        previous = self.request.get(pages[-1]["previous"]).json()
+        self.assertEqual(previous["results"], pages[-2]["results"])
+
+        # page numbers stay the default
+        response = self.request.get("/api/tasks/")
+        self.assertEqual(response.json()["count"], 5)
+
+    def test_forged_cursors(self):
+        task = Task.objects.filter(user=self.user).first()
+        column = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        forged = [["urgent", 1], [1, "x"], [None, None], [[1], {}], ["low", 10 ** 30]]
+        for position in forged:
+            cursor = encode_cursor(position)
+            for url, params in [
+                ("/api/tasks/", {"cursor": cursor}),
+                ("/api/tasks/", {"cursor": cursor, "search": "Task"}),
+                (f"/api/boards/{self.board.id}/tasks/{task.id}/history/", {"cursor": cursor}),
+                (f"/api/list/status/{self.board.id}/", {"status": column.id, "cursor": cursor}),
+                ("/api/sync/", {"cursor": encode_cursor([position] * 3)}),
+            ]:
+                with self.subTest(url=url, position=position, search="search" in params):
+                    response = self.request.get(url, params)
+                    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                    self.assertEqual(response.json(), {"cursor": "Invalid cursor."})
+
+
+class TestTaskSearch(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.in_title = Task.objects.create(
+            title="Invoice the client", description="", priority="medium", board=self.board, user=self.user
+        )
+        self.in_description = Task.objects.create(
+            title="Follow up", description="Send the invoice again", priority="medium", board=self.board, user=self.user
+        )
+        Task.objects.create(title="Water plants", description="", priority="medium", board=self.board, user=self.user)
+        return super().setUp()
+
+    def search(self, query, **params):
+        response = self.request.get("/api/tasks/", {"search": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [task["id"] for task in response.json()["results"]]
+
+    def test_ranked_results(self):
+        self.assertEqual(self.search("invoice"), [self.in_title.id, self.in_description.id])
+        self.assertEqual(self.search("invoice", pagination="cursor"), [self.in_title.id, self.in_description.id])
+        self.assertEqual(self.search("invo"), [self.in_title.id, self.in_description.id])
+        self.assertEqual(self.search("!!"), [])
+
+    def test_index_follows_writes(self):
+        self.in_title.title = "Pay rent"
+        self.in_title.save()
+        self.assertEqual(self.search("invoice"), [self.in_description.id])
+
+        Task.objects.filter(id=self.in_description.id).update(description="Nothing to see")
+        self.assertEqual(self.search("invoice"), [])
+        self.assertEqual(self.search("rent"), [self.in_title.id])
+
+
+class TestFilterChoices(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.other = User.objects.create_user(username="other", email="other@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.other_board = Board.objects.create(title="Other", user=self.other)
+        self.other_status = Status.objects.create(title="Theirs", board=self.other_board, user=self.other)
+        return super().setUp()
+
+    def test_status_choices_follow_the_user(self):
+        # created after the filter classes were defined
+        status_ = Status.objects.create(title="Mine", board=self.board, user=self.user)
+        task = Task.objects.create(title="Task", priority="low", status=status_, board=self.board, user=self.user)
+
+        response = self.request.get("/api/tasks/", {"status": status_.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["id"] for row in response.json()["results"]], [task.id])
+
+        response = self.request.get("/api/tasks/", {"status": self.other_status.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.request.get(f"/api/boards/{self.board.id}/status/", {"board": self.other_board.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestDailyStats(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.pending = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        self.done = Status.objects.create(title="Completed", board=self.board, user=self.user)
+        return super().setUp()
+
+    def test_rollup_and_series(self):
+        today = timezone.localdate()
+        task = Task.objects.create(
+            title="Task1", priority="high", status=self.pending, board=self.board, user=self.user
+        )
+        Task.objects.create(title="Task2", priority="low", status=self.pending, board=self.board, user=self.user)
+        task.status = self.done
+        task.completed = True
+        task.save()
+
+        self.assertEqual(rollup_day(today, snapshot=True), 1)
+        # rerunning a day replaces its rows
+        self.assertEqual(rollup_day(today, snapshot=True), 1)
+
+        response = self.request.get("/api/stats/daily/", {"start": today, "end": today})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"], [{
+            "date": str(today), "created": 2, "completed": 1, "cancelled": 0, "transitions": 1,
+            "open_high": 0, "open_medium": 0, "open_low": 1,
+        }])
+
+    def test_completed_from_flag(self):
+        today = timezone.localdate()
+        flagged, moved = [
+            Task.objects.create(title=title, priority="low", status=self.pending, board=self.board, user=self.user)
+            for title in ("Flagged", "Moved")
+        ]
+        # as CompleteTaskView does, without a status change
+        flagged.completed = True
+        flagged.save(update_fields=["completed"])
+        moved.status = self.done
+        moved.save()
+
+        rollup_day(today, snapshot=True)
+        stats = UserDailyStats.objects.get(user=self.user, date=today)
+        self.assertEqual((stats.completed, stats.transitions, stats.open_low), (1, 1, 1))
+
+        flagged.refresh_from_db()
+        flagged.completed = False
+        flagged.save()
+        self.assertIsNone(Task.objects.get(pk=flagged.pk).completed_at)
+
+    def test_rollup_pending_catches_up(self):
+        today = timezone.localdate()
+        Task.objects.create(title="Task1", priority="low", status=self.pending, board=self.board, user=self.user)
+        UserDailyStats.objects.create(user=self.user, date=today - timedelta(days=4))
+        self.assertEqual(rollup_pending(today), [today - timedelta(days=i) for i in (3, 2, 1)])
+        self.assertEqual(rollup_pending(today), [])
+
+    def test_invalid_range(self):
+        response = self.request.get("/api/stats/daily/", {"start": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.request.get("/api/stats/daily/", {"start": "2020-01-01", "end": "2022-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.request.get("/api/stats/daily/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"], [])
+
+
+class TestBoardFlow(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.pending = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        self.doing = Status.objects.create(title="Doing", board=self.board, user=self.user)
+        self.done = Status.objects.create(title="Completed", board=self.board, user=self.user)
+        return super().setUp()
+
+    def move(self, task, status_, days_ago):
+        task.status = status_
+        task.save()
+        History.objects.filter(task=task, new_status=status_).update(
+            change_date=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def complete(self, task, days_ago):
+        task.completed = True
+        task.save()
+        Task.objects.filter(id=task.id).update(completed_at=timezone.now() - timedelta(days=days_ago))
+
+    def test_flow_metrics(self):
+        tasks = [
+            Task.objects.create(title=f"Task{i}", priority="low", status=self.pending, board=self.board, user=self.user)
+            for i in range(3)
+        ]
+        Task.objects.filter(id__in=[task.id for task in tasks]).update(date_created=timezone.now() - timedelta(days=10))
+        self.move(tasks[0], self.doing, 6)
+        self.move(tasks[0], self.done, 2)
+        self.complete(tasks[0], 2)
+        self.move(tasks[1], self.doing, 1)
+        # the dates were rewritten behind the daily changes
+        rebuild_status_changes()
+
+        response = self.request.get(f"/api/stats/flow/{self.board.id}/", {"days": 14})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+
+        self.assertEqual(data["cycle_time"]["count"], 1)
+        self.assertEqual(data["cycle_time"]["percentiles"]["p50"], 4)
+        self.assertEqual(data["lead_time"]["percentiles"]["p50"], 8)
+        self.assertEqual(sum(week["count"] for week in data["throughput"]), 1)
+
+        flow = data["cumulative_flow"]
+        self.assertEqual(len(flow["days"]), 14)
+        counts = {column["title"]: column["counts"] for column in flow["statuses"]}
+        self.assertEqual([counts[title][-1] for title in ("Pending", "Doing", "Completed")], [1, 1, 1])
+        # ten days ago all three tasks were created as pending
+        self.assertEqual([counts[title][-11] for title in ("Pending", "Doing", "Completed")], [3, 0, 0])
+        self.assertEqual([counts[title][0] for title in ("Pending", "Doing", "Completed")], [0, 0, 0])
+
+    def test_changes_of_today(self):
+        cache.clear()
+        tasks = [
+            Task.objects.create(title=f"Task{i}", priority="low", status=self.pending, board=self.board, user=self.user)
+            for i in range(3)
+        ]
+        self.move(tasks[0], self.done, 0)
+        self.complete(tasks[0], 0)
+        Task.objects.filter(id=tasks[1].id).soft_delete()
+
+        # the board, its statuses, the done tasks and the daily changes
+        with self.assertNumQueries(6):
+            response = self.request.get(f"/api/stats/flow/{self.board.id}/")
+        data = response.json()
+        counts = {column["title"]: column["counts"] for column in data["cumulative_flow"]["statuses"]}
+        self.assertEqual([counts[title][-1] for title in ("Pending", "Doing", "Completed")], [1, 0, 1])
+        self.assertEqual([counts[title][-2] for title in ("Pending", "Doing", "Completed")], [0, 0, 0])
+        self.assertEqual(data["cycle_time"]["count"], 1)
+
+    def test_cached_until_tasks_change(self):
+        task = Task.objects.create(title="Task", priority="low", status=self.pending, board=self.board, user=self.user)
+        self.request.get(f"/api/stats/flow/{self.board.id}/")
+        with self.assertNumQueries(3):
+            response = self.request.get(f"/api/stats/flow/{self.board.id}/")
+        self.assertEqual(response.json()["cumulative_flow"]["statuses"][0]["counts"][-1], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.move(task, self.done, 0)
+            self.complete(task, 0)
+        response = self.request.get(f"/api/stats/flow/{self.board.id}/")
+        self.assertEqual(response.json()["cycle_time"]["count"], 1)
+
+    def test_done_from_completed_flag(self):
+        cache.clear()
+        tasks = [
+            Task.objects.create(title=f"Task{i}", priority="low", status=self.pending, board=self.board, user=self.user)
+            for i in range(3)
+        ]
+        Task.objects.filter(id__in=[task.id for task in tasks]).update(date_created=timezone.now() - timedelta(days=5))
+        # in the done column but not completed
+        self.move(tasks[0], self.done, 3)
+        # completed in a column of any name
+        self.move(tasks[1], self.doing, 3)
+        self.complete(tasks[1], 1)
+        # completed without ever moving, it has no cycle time
+        self.complete(tasks[2], 1)
+
+        data = self.request.get(f"/api/stats/flow/{self.board.id}/").json()
+        self.assertEqual(sum(week["count"] for week in data["throughput"]), 2)
+        self.assertEqual(data["lead_time"]["count"], 2)
+        self.assertEqual(data["lead_time"]["percentiles"]["p50"], 4)
+        self.assertEqual(data["cycle_time"]["count"], 1)
+        self.assertEqual(data["cycle_time"]["percentiles"]["p50"], 2)
 
+    def test_other_users_board(self):
+        other = User.objects.create_user(username="other", email="other@test.in",  password="api_test")
+        board = Board.objects.create(title="Theirs", user=other)
+        response = self.request.get(f"/api/stats/flow/{board.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.request.get(f"/api/stats/flow/{self.board.id}/", {"days": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestChangeFeed(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.pending = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        self.tasks = [
+            Task.objects.create(title=f"Task{i}", priority="low", status=self.pending, board=self.board, user=self.user)
+            for i in range(3)
+        ]
+        return super().setUp()
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params["cursor"] = cursor
+        response = self.request.get("/api/sync/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_changes_and_tombstones(self):
+        self.tasks[2].soft_delete()
+        data = self.sync()
+        self.assertEqual([row["id"] for row in data["boards"]], [self.board.id])
+        self.assertEqual([row["id"] for row in data["statuses"]], [self.pending.id])
+        self.assertEqual([row["title"] for row in data["tasks"]], ["Task0", "Task1"])
+        # nothing to remove on the first sync
+        self.assertEqual(data["deleted_tasks"], [])
+        self.assertFalse(data["more"])
+
+        task = Task.objects.get(pk=self.tasks[0].pk)
+        task.title = "Renamed"
+        task.save()
+        self.tasks[1].soft_delete()
+        data = self.sync(data["cursor"])
+        self.assertEqual([row["title"] for row in data["tasks"]], ["Renamed"])
+        self.assertEqual(data["deleted_tasks"], [self.tasks[1].id])
+        self.assertEqual(data["boards"], [])
+
+        self.board.delete()
+        data = self.sync(data["cursor"])
+        self.assertEqual(data["tasks"], [])
+        self.assertEqual(data["deleted_boards"], [self.board.id])
+
+        data = self.sync(data["cursor"])
+        self.assertEqual((data["boards"], data["deleted_boards"], data["tasks"]), ([], [], []))
+
+    def test_pages(self):
+        data = self.sync(limit=2)
+        self.assertEqual(len(data["tasks"]), 2)
+        self.assertTrue(data["more"])
+        data = self.sync(data["cursor"], limit=2)
+        self.assertEqual([row["id"] for row in data["tasks"]], [self.tasks[2].id])
+        self.assertFalse(data["more"])
+
+    def test_commit_order(self):
+        data = self.sync()
+        # written with an old timestamp, as a transaction committing late would
+        Task.objects.filter(pk=self.tasks[0].pk).update(title="Late", updated_at=timezone.now() - timedelta(hours=1))
+        data = self.sync(data["cursor"])
+        self.assertEqual([row["title"] for row in data["tasks"]], ["Late"])
+
+    def test_running_transactions_hold_back(self):
+        versions = dict(Task.objects.values_list("id", "sync_version"))
+        # the transaction that wrote the second task is still running
+        with mock.patch("task_manager.tasks.sync.horizon", return_value=versions[self.tasks[1].id]):
+            data = self.sync()
+        self.assertEqual([row["id"] for row in data["tasks"]], [self.tasks[0].id])
+        data = self.sync(data["cursor"])
+        self.assertEqual([row["id"] for row in data["tasks"]], [task.id for task in self.tasks[1:]])
+
+        response = self.request.get("/api/sync/", {"cursor": "bad"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestConditionalGet(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.pending = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        self.task = Task.objects.create(
+            title="Task", priority="low", status=self.pending, board=self.board, user=self.user
+        )
+        return super().setUp()
+
+    def test_not_modified_until_written(self):
+        for url in ("/api/tasks/", "/api/boards/", f"/api/list/status/{self.board.id}/", "/api/list/boards/"):
+            response = self.request.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response["ETag"]
+
+            # only the savepoint of the request transaction
+            with self.assertNumQueries(2):
+                response = self.request.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response.content, b"")
+
+            response = self.request.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            response = self.request.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() - 60))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = self.request.get("/api/tasks/")["ETag"]
+        self.assertNotEqual(self.request.get("/api/tasks/", {"priority": "low"})["ETag"], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.title = "Renamed"
+            self.task.save()
+        response = self.request.get("/api/tasks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pending.title = "Todo"
+            self.pending.save()
+        response = self.request.get("/api/tasks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_lost_bump_expires(self):
+        etag = self.request.get("/api/tasks/")["ETag"]
+        with mock.patch.object(cache, "set_many", side_effect=ConnectionError), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.task.title = "Renamed"
+            self.task.save()
+        response = self.request.get("/api/tasks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # until the stamp expires
+        with mock.patch("time.time", return_value=time.time() + VERSION_TIMEOUT + 1):
+            response = self.request.get("/api/tasks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["title"], "Renamed")
+
+
+class TestBulkTasks(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.pending = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        self.done = Status.objects.create(title="Done", board=self.board, user=self.user)
+        other = User.objects.create_user(username="other", email="other@test.in",  password="api_test")
+        self.other_board = Board.objects.create(title="Theirs", user=other)
+        return super().setUp()
+
+    def create(self, count):
+        items = [
+            {"title": f"Task{i}", "priority": "low", "board": self.board.id, "status": self.pending.id}
+            for i in range(count)
+        ]
+        return self.request.post("/api/tasks/bulk/", items, format="json")
+
+    def test_create_update_delete(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.create(50)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertLess(len(context), 15)
+        ids = [row["id"] for row in response.json()]
+        self.assertEqual(len(set(ids)), 50)
+        self.assertEqual(TaskCounter.objects.get(status=self.pending).total, 50)
+
+        items = [{"id": task_id, "status": self.done.id, "completed": True} for task_id in ids[:30]]
+        with CaptureQueriesContext(connection) as context:
+            response = self.request.patch("/api/tasks/bulk/", items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(len(context), 15)
+        self.assertEqual(History.objects.filter(new_status=self.done).count(), 30)
+        self.assertEqual(TaskCounter.objects.get(status=self.done).completed, 30)
+        self.assertEqual(TaskCounter.objects.get(status=self.pending).total, 20)
+        self.assertEqual(Task.objects.filter(status=self.done, completed=True).count(), 30)
+        self.assertEqual(Task.objects.filter(completed_at__isnull=False).count(), 30)
+
+        response = self.request.delete("/api/tasks/bulk/", ids[:10], format="json")
+        self.assertEqual(response.json(), {"deleted": 10})
+        self.assertEqual(TaskCounter.objects.get(status=self.done).total, 20)
+
+    def test_per_item_errors(self):
+        items = [
+            {"title": "Fine", "priority": "low", "board": self.board.id},
+            {"title": "Theirs", "priority": "low", "board": self.other_board.id},
+            {"priority": "low", "board": self.board.id},
+        ]
+        response = self.request.post("/api/tasks/bulk/", items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn("board", errors[1])
+        self.assertIn("title", errors[2])
+        self.assertFalse(Task.objects.exists())
+
+        task_id = self.create(1).json()[0]["id"]
+        other_status = Status.objects.create(title="Elsewhere", board=self.other_board, user=self.user)
+        items = [
+            {"id": task_id, "status": other_status.id},
+            {"id": task_id + 100, "title": "Missing"},
+            {"title": "No id"},
+        ]
+        response = self.request.patch("/api/tasks/bulk/", items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.json()), 3)
+        self.assertIn("id", response.json()[2])
+
+        items = [{"id": task_id, "status": other_status.id}, {"id": task_id + 100, "title": "Missing"}]
+        response = self.request.patch("/api/tasks/bulk/", items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(), [{"status": ["Status does not belong to the board."]}, {"id": ["Not found."]}]
+        )
+
+        response = self.request.delete("/api/tasks/bulk/", [task_id, task_id + 100], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Task.objects.filter(id=task_id, deleted=False).exists())
+
+
+class TestExport(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.other_board = Board.objects.create(title="Other", user=self.user)
+        self.pending = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        self.done = Status.objects.create(title="Done", board=self.board, user=self.user)
+        for i in range(5):
+            Task.objects.create(
+                title=f"Task, {i}", priority="high", status=self.pending, board=self.board, user=self.user
+            )
+        Task.objects.create(title="Elsewhere", priority="low", board=self.other_board, user=self.user)
+        task = Task.objects.filter(board=self.board).first()
+        task.status = self.done
+        task.save()
+        return super().setUp()
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content)
+
+    def test_ndjson(self):
+        response = self.request.get("/api/export/tasks.ndjson", {"board": self.board.id})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in self.read(response).decode().splitlines()]
+        self.assertEqual([row["title"] for row in rows], [f"Task, {i}" for i in range(5)])
+        self.assertEqual(rows[0]["priority"], "high")
+        self.assertEqual(rows[0]["status__title"], "Done")
+
+        response = self.request.get("/api/export/history.ndjson")
+        rows = [json.loads(line) for line in self.read(response).decode().splitlines()]
+        self.assertEqual([(row["old_status__title"], row["new_status__title"]) for row in rows], [("Pending", "Done")])
+
+    def test_csv_gzip(self):
+        response = self.request.get("/api/export/tasks.csv", {"gzip": 1}, HTTP_ACCEPT="text/csv")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="tasks.csv.gz"')
+        rows = list(csv.reader(io.StringIO(gzip.decompress(self.read(response)).decode())))
+        self.assertEqual(rows[0][:3], ["id", "external_id", "title"])
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[1][2], "Task, 0")
+
+    def test_other_users_board(self):
+        other = User.objects.create_user(username="other", email="other@test.in",  password="api_test")
+        board = Board.objects.create(title="Theirs", user=other)
+        response = self.request.get("/api/export/tasks.csv", {"board": board.id})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestImport(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.pending = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        return super().setUp()
+
+    def upload(self, name, content, **data):
+        return self.request.post("/api/import/", {"file": SimpleUploadedFile(name, content.encode()), **data})
+
+    def test_csv(self):
+        content = (
+            "title,priority,completed,board,status\n"
+            "One,high,false,Board,Pending\n"
+            "Two,low,true,Board,Done\n"
+            "Three,,,New board,\n"
+            ",high,false,Board,Pending\n"
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload("tasks.csv", content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["rows"], 4)
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual((response.data["boards_created"], response.data["statuses_created"]), (1, 1))
+        self.assertEqual(response.data["errors"], [{"row": 5, "errors": {"title": "This field is required."}}])
+        # one INSERT for the tasks whatever their number
+        self.assertEqual(sum(query["sql"].startswith('INSERT INTO "tasks_task"') for query in queries), 1)
+
+        one, two, three = Task.objects.filter(user=self.user).order_by("id")
+        self.assertEqual((one.status, one.priority, one.completed), (self.pending, "high", False))
+        self.assertEqual((two.status.title, two.board, two.completed), ("Done", self.board, True))
+        self.assertEqual((three.board.title, three.status, three.priority), ("New board", None, "medium"))
+        self.assertEqual(self.request.get("/api/count/").json()["completed"], 1)
+
+    def test_export_round_trip(self):
+        Task.objects.create(title="Exported", priority="low", status=self.pending, board=self.board, user=self.user)
+        exported = b"".join(self.request.get("/api/export/tasks.ndjson").streaming_content).decode()
+        response = self.upload("tasks.ndjson", exported + "not json\n")
+        self.assertEqual((response.data["created"], response.data["error_count"]), (1, 1))
+        self.assertEqual(response.data["statuses_created"], 0)
+        self.assertEqual(Task.objects.filter(title="Exported", status=self.pending, priority="low").count(), 2)
+
+    def test_trello(self):
+        trello = {
+            "name": "Roadmap",
+            "lists": [{"id": "l1", "name": "Doing"}, {"id": "l2", "name": "Old", "closed": True}],
+            "cards": [
+                {"name": "Ship", "desc": "Soon", "idList": "l1", "dueComplete": True, "labels": [{"name": "High"}]},
+                {"name": "Archived", "idList": "l1", "closed": True},
+                {"name": "Forgotten", "idList": "l2"},
+            ],
+        }
+        response = self.upload("board.json", json.dumps(trello))
+        self.assertEqual(response.data["created"], 1)
+        task = Task.objects.get(title="Ship")
+        self.assertEqual((task.board.title, task.status.title), ("Roadmap", "Doing"))
+        self.assertEqual((task.priority, task.completed, task.description), ("high", True, "Soon"))
+
+        response = self.upload("board.json", "{")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_trello_size_limit(self):
+        content = json.dumps({"name": "Roadmap", "lists": [], "cards": []})
+        with mock.patch("task_manager.tasks.api.views.TRELLO_MAX_BYTES", len(content) - 1):
+            response = self.upload("board.json", content)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # and again while parsing
+        with mock.patch("task_manager.tasks.importer.TRELLO_MAX_BYTES", len(content) - 1):
+            response = self.upload("board.json", content)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.upload("board.json", "\ufeff" + content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_default_board(self):
+        response = self.upload("tasks.txt", "title\nLoose\n", format="csv")
+        self.assertEqual(response.data["errors"][0]["errors"], {"board": "This field is required."})
+        response = self.upload("tasks.txt", "title\nLoose\n", format="csv", board=self.board.id)
+        self.assertEqual(Task.objects.get(title="Loose").board, self.board)
+
+    def test_background_job(self):
+        content = "title,board\n" + "".join(f"Task {i},Board\n" for i in range(5))
+        with mock.patch("task_manager.tasks.api.views.INLINE_MAX_BYTES", 0), \
+                mock.patch("task_manager.tasks.importer.UPLOAD_PART_BYTES", 16), \
+                mock.patch("task_manager.tasks.importer.CHUNK_SIZE", 2):
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.upload("tasks.csv", content)
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            # the upload is in the database when the job is queued
+            self.assertEqual(ImportUpload.objects.count(), 5)
+            for callback in callbacks:
+                callback()
+        self.assertFalse(ImportUpload.objects.exists())
+        job = self.request.get(f"/api/import/{response.data['id']}/")
+        self.assertEqual((job.data["state"], job.data["rows"], job.data["created"]), ("done", 5, 5))
+        self.assertEqual(Task.objects.filter(board=self.board).count(), 5)
+        # every chunk is stamped when it commits, for the sync feed
+        stamps = Task.objects.filter(board=self.board).values_list("updated_at", flat=True)
+        self.assertEqual(len(set(stamps)), 3)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username="other", email="other@test.in"))
+        response = other.get(f"/api/import/{response.data['id']}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestTaskListRows(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.status = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        other_board = Board.objects.create(title="Other", user=self.user)
+        for i in range(200):
+            Task.objects.create(
+                title=f"Task {i}", priority=["low", "medium", "high"][i % 3], completed=i % 2 == 0,
+                status=self.status if i % 4 else None, board=self.board if i % 5 else other_board, user=self.user,
+            )
+        return super().setUp()
+
+    def test_same_output_as_serializer(self):
+        tasks = Task.objects.filter(user=self.user).order_by("priority", "id")
+        expected = json.loads(json.dumps(TaskSerializer(tasks, many=True).data))
+        response = self.request.get("/api/tasks/")
+        self.assertEqual(response.json()["results"], expected)
+
+        response = self.request.get(f"/api/boards/{self.board.id}/tasks/", {"pagination": "cursor"})
+        self.assertEqual(response.json()["results"], [task for task in expected if task["board"] == self.board.id])
+
+    def test_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.request.get("/api/tasks/", {"pagination": "cursor"})
+        self.assertEqual(len(response.json()["results"]), 200)
+        self.assertEqual(len([query for query in queries if "tasks_task" in query["sql"]]), 1)
+
+    def test_search_cursor(self):
+        response = self.request.get("/api/tasks/", {"pagination": "cursor", "search": "Task"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 200)
+
+
+class TestSparseFieldsets(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", description="Long text", user=self.user)
+        self.status = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        self.task = Task.objects.create(
+            title="Task", description="Long text", priority="high", status=self.status, board=self.board, user=self.user
+        )
+        return super().setUp()
+
+    def get(self, url, fields):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.request.get(url, {"fields": fields})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json(), " ".join(query["sql"] for query in queries)
+
+    def test_tasks(self):
+        data, sql = self.get("/api/tasks/", "id,title,status")
+        self.assertEqual(data["results"], [{"id": self.task.id, "title": "Task", "status": self.status.id}])
+        self.assertNotIn('"description"', sql)
+
+        data, sql = self.get(f"/api/boards/{self.board.id}/tasks/{self.task.id}/", "title,board_title")
+        self.assertEqual(data, {"title": "Task", "board_title": "Board"})
+        self.assertNotIn('"description"', sql)
+
+    def test_boards_and_statuses(self):
+        data, sql = self.get("/api/boards/", "title")
+        self.assertEqual(data["results"], [{"title": "Board"}])
+        self.assertNotIn('"description"', sql)
+
+        data, _ = self.get(f"/api/boards/{self.board.id}/status/", "title")
+        self.assertEqual(data["results"], [{"title": "Pending"}])
+
+    def test_unknown_field(self):
+        response = self.request.get("/api/tasks/", {"fields": "title,secret"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("secret", response.json()["fields"])
+
+    def test_writes_return_every_field(self):
+        response = self.request.patch(f"/api/tasks/{self.task.id}/?fields=title", {"completed": True})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("description", response.json())
+
+    def test_schema(self):
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        parameters = [parameter["name"] for parameter in schema["paths"]["/api/tasks/"]["get"]["parameters"]]
+        self.assertIn("fields", parameters)
+
+
+class TestRenderers(APITestCase):
+    def setUp(self) -> None:
+        self.request = APIClient()
+        self.user = User.objects.create_user(username="apitest", email="api@test.in",  password="api_test")
+        self.request.force_authenticate(user=self.user)
+        self.board = Board.objects.create(title="Board", user=self.user)
+        self.status = Status.objects.create(title="Pending", board=self.board, user=self.user)
+        Task.objects.create(title="Tâche", priority="high", status=self.status, board=self.board, user=self.user)
+        return super().setUp()
+
+    def test_same_json_as_drf(self):
+        data = {
+            "date": timezone.now(),
+            "decimal": Decimal("1.50"),
+            "uuid": uuid.uuid4(),
+            "boards": Board.objects.values("id", "title"),
+            "lazy": gettext_lazy("Pending"),
+            "line": "a b",
+            1: None,
+        }
+        rendered = ORJSONRenderer().render(data)
+        self.assertEqual(rendered, JSONRenderer().render(data))
+        self.assertTrue(json.loads(rendered)["date"].endswith("Z"))
+
+    def test_views(self):
+        for url in ("/api/list/boards/", f"/api/list/status/{self.board.id}/", "/api/tasks/"):
+            response = self.request.get(url)
+            self.assertEqual(response["Content-Type"], "application/json")
+            packed = self.request.get(url, HTTP_ACCEPT="application/msgpack")
+            self.assertEqual(packed["Content-Type"], "application/msgpack")
+            self.assertEqual(msgpack.unpackb(packed.content), response.json())
+
+    def test_parsers(self):
+        response = self.request.post(
+            "/api/boards/", msgpack.packb({"title": "Packed"}), content_type="application/msgpack",
+            HTTP_ACCEPT="application/msgpack",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(msgpack.unpackb(response.content)["title"], "Packed")
 
+        response = self.request.post("/api/boards/", '{"title": "Json"}', content_type="application/json")
+        self.assertEqual(response.json()["title"], "Json")
 
+        response = self.request.post("/api/boards/", '{"title": ', content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,11 +1,21 @@
 
-from task_manager.tasks.tasks import periodic_emailer
-from django.test import TestCase
+from task_manager.tasks import metrics
+from task_manager.tasks.locks import task_lock
+from task_manager.tasks.digest import MAX_ITEMS, build_digests, digest_contexts
+from task_manager.tasks.mail_backends import SinkEmailBackend
+from task_manager.tasks.outbox import MAX_ATTEMPTS
+from task_manager.tasks.tasks import (
+    EMAILER_RETRY_SECONDS, drain_outbox, periodic_emailer, schedule_report, schedule_reports,
+    send_report_batch
+)
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
-from task_manager.tasks.models import Task, Report
+from task_manager.tasks.models import Board, EmailOutbox, Status, Task, Report
 from datetime import datetime, timedelta
+from unittest import mock
 import pytz
 from django.core import mail
+from django.core.cache import cache
 
 
 User = get_user_model()
@@ -27,12 +37,22 @@ class TestCelery(TestCase):
         user1 = User.objects.create_user(**users[0])
         user2 = User.objects.create_user(**users[1])
 
-        Task.objects.create(user=user1, title="test")
-        Task.objects.create(user=user1, title="test", status="completed")
-        Task.objects.create(user=user1, title="test", status="cancelled")
-        Task.objects.create(user=user1, title="test", status="completed")
-        Task.objects.create(user=user2, title="test")
-        Task.objects.create(user=user2, title="test", status="in_progress")
+        statuses = {}
+        for user in (user1, user2):
+            board = Board.objects.create(user=user, title="board")
+            for title in ("pending", "completed", "in_progress", "cancelled"):
+                statuses[user, title] = Status.objects.create(user=user, board=board, title=title)
+
+        def create_task(user, status="pending"):
+            status = statuses[user, status]
+            Task.objects.create(user=user, title="test", priority="medium", board=status.board, status=status)
+
+        create_task(user1)
+        create_task(user1, status="completed")
+        create_task(user1, status="cancelled")
+        create_task(user1, status="completed")
+        create_task(user2)
+        create_task(user2, status="in_progress")
 
         r1 = Report.objects.create(user=user1, consent=True)
         r2 = Report.objects.create(user=user2, consent=True)
@@ -62,4 +82,182 @@ class TestCelery(TestCase):
         self.assertIn("1 cancelled", mail1.body)
 
         self.assertIn("1 pending", mail2.body)
-        self.assertIn("1 in progress", mail2.body)
\ No newline at end of file
+        self.assertIn("1 in progress", mail2.body)
+
+    def test_retried_batch_claims_nothing(self):
+        user = User.objects.create_user(username="test1", email="sh2@rbst.eu.org", password="test1_pass")
+        now = datetime.now(tz=pytz.UTC)
+        report = Report.objects.create(user=user, consent=True, send_time=now - timedelta(minutes=5))
+
+        self.assertEqual(send_report_batch([report.id], now.isoformat()), 1)
+        report.refresh_from_db()
+        self.assertEqual(report.send_time, now - timedelta(minutes=5) + timedelta(days=1))
+
+        # a retried batch or an overlapping run finds nothing left to claim
+        self.assertEqual(send_report_batch([report.id], now.isoformat()), 0)
+        periodic_emailer()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_overlapping_run_is_skipped(self):
+        cache.clear()
+        user = User.objects.create_user(username="test1", email="sh2@rbst.eu.org", password="test1_pass")
+        Report.objects.create(user=user, consent=True, send_time=datetime.now(tz=pytz.UTC) - timedelta(minutes=5))
+
+        with task_lock("periodic_emailer", 60) as acquired, \
+                mock.patch.object(periodic_emailer, "apply_async") as apply_async:
+            self.assertTrue(acquired)
+            self.assertIsNone(periodic_emailer())
+            self.assertIsNone(periodic_emailer())
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(metrics.get("periodic_emailer.skipped"), 2)
+
+        # the skipped runs are retried once shortly after
+        apply_async.assert_called_once()
+        retry_at = apply_async.call_args.kwargs["eta"]
+        self.assertLessEqual(retry_at - datetime.now(tz=pytz.UTC), timedelta(seconds=EMAILER_RETRY_SECONDS))
+
+        self.assertEqual(periodic_emailer(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertGreaterEqual(metrics.get("periodic_emailer.lag"), 300)
+        self.assertIsNotNone(metrics.get("periodic_emailer.duration"))
+
+    @mock.patch.object(periodic_emailer, "apply_async")
+    def test_report_scheduling(self, apply_async):
+        cache.clear()
+        now = datetime.now(tz=pytz.UTC).replace(microsecond=0)
+        user1 = User.objects.create_user(username="test1", email="sh2@rbst.eu.org", password="test1_pass")
+        user2 = User.objects.create_user(username="test2", email="jsmith@rbst.eu.org", password="test2_pass")
+
+        # saving a report wakes the emailer at its send time, once per time
+        soon = now + timedelta(minutes=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            report = Report.objects.create(user=user1, consent=True, send_time=soon)
+        with self.captureOnCommitCallbacks(execute=True):
+            Report.objects.create(user=user2, consent=True, send_time=soon)
+            Report.objects.create(user=user2, consent=True, send_time=now + timedelta(hours=2))
+            Report.objects.create(user=user2, consent=False, send_time=now + timedelta(minutes=1))
+        apply_async.assert_called_once_with(eta=soon)
+
+        # the sweep only queues what is not queued yet, plus a run for overdue reports
+        self.assertEqual(schedule_reports(), 0)
+        cache.clear()
+        apply_async.reset_mock()
+        Report.objects.filter(id=report.id).update(send_time=now - timedelta(minutes=1))
+        self.assertEqual(schedule_reports(), 1)
+        self.assertEqual(apply_async.call_count, 2)
+        apply_async.assert_any_call(eta=soon)
+
+    @mock.patch.object(periodic_emailer, "apply_async")
+    def test_report_scheduling_without_cache(self, apply_async):
+        # a wake-up is only left out when it is known to be queued already
+        cache.clear()
+        soon = datetime.now(tz=pytz.UTC).replace(microsecond=0) + timedelta(minutes=5)
+        with mock.patch.object(cache, "add", return_value=None):
+            schedule_report(soon)
+        with mock.patch.object(cache, "add", side_effect=ConnectionError):
+            schedule_report(soon)
+        self.assertEqual(apply_async.call_count, 2)
+        schedule_report(soon)
+        schedule_report(soon)
+        self.assertEqual(apply_async.call_count, 3)
+
+
+class TestOutbox(TestCase):
+    sink = "task_manager.tasks.mail_backends.SinkEmailBackend"
+
+    def setUp(self):
+        cache.clear()
+        self.message = EmailOutbox.objects.create(to="sh2@rbst.eu.org", subject="Subject", body="Body")
+
+    def test_send(self):
+        sent = SinkEmailBackend.sent
+        self.assertEqual(drain_outbox(self.sink), 1)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, EmailOutbox.SENT)
+        self.assertIsNotNone(self.message.sent_at)
+        self.assertEqual(SinkEmailBackend.sent, sent + 1)
+        self.assertEqual(metrics.get("outbox.sent"), 1)
+        self.assertIsNotNone(metrics.get("outbox.throughput"))
+        # nothing left to send
+        self.assertEqual(drain_outbox(self.sink), 0)
+
+    @override_settings(EMAIL_SINK_FAILURE_RATE=1)
+    def test_backoff_and_dead_letter(self):
+        started = datetime.now(tz=pytz.UTC)
+        self.assertEqual(drain_outbox(self.sink), 0)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, EmailOutbox.PENDING)
+        self.assertEqual(self.message.attempts, 1)
+        self.assertIn("Sink rejected", self.message.last_error)
+        self.assertGreaterEqual(self.message.next_attempt_at, started + timedelta(seconds=30))
+        self.assertEqual(metrics.get("outbox.failed"), 1)
+
+        EmailOutbox.objects.filter(id=self.message.id).update(attempts=MAX_ATTEMPTS - 1, next_attempt_at=started)
+        drain_outbox(self.sink)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, EmailOutbox.DEAD)
+        self.assertEqual(self.message.attempts, MAX_ATTEMPTS)
+        self.assertEqual(metrics.get("outbox.dead"), 1)
+
+
+class TestDigest(TestCase):
+    def setUp(self):
+        self.users = []
+        for i in range(3):
+            user = User.objects.create_user(username=f"digest{i}", email=f"digest{i}@rbst.eu.org", password="pass")
+            board = Board.objects.create(user=user, title=f"Board <{i}>")
+            todo = Status.objects.create(user=user, board=board, title="pending")
+            done = Status.objects.create(user=user, board=board, title="completed")
+            task = Task.objects.create(user=user, title=f"Ship {i}", priority="high", board=board, status=todo)
+            Task.objects.create(user=user, title="Done", priority="low", board=board, status=done)
+            task.status = done
+            task.save()
+            self.users.append((user.id, user.username, user.email))
+
+        # an old high priority task that is still open
+        user_id = self.users[0][0]
+        old = Task.objects.create(
+            user_id=user_id, title="Renew domain", priority="high", board=Board.objects.get(user_id=user_id)
+        )
+        Task.objects.filter(id=old.id).update(date_created=datetime.now(tz=pytz.UTC) - timedelta(days=10))
+
+    def test_constant_queries(self):
+        with self.assertNumQueries(6):
+            messages = build_digests(self.users, datetime.now(tz=pytz.UTC))
+        self.assertEqual(len(messages), 3)
+
+        first = messages[0]
+        self.assertEqual(first.to, "digest0@rbst.eu.org")
+        self.assertIn("0 pending tasks, 2 completed tasks", first.body)
+        self.assertIn("Board <0> (3 tasks)", first.body)
+        self.assertIn("Ship 0: pending -> completed", first.body)
+        self.assertIn("Renew domain", first.body)
+        self.assertIn("Board &lt;0&gt;", first.html_body)
+        self.assertIn("Renew domain", first.html_body)
+        self.assertNotIn("Renew domain", messages[1].body)
+
+    def test_items_limited_per_user(self):
+        user_id = self.users[0][0]
+        task = Task.objects.get(user_id=user_id, title="Ship 0")
+        statuses = list(Status.objects.filter(user_id=user_id))
+        for i in range(MAX_ITEMS + 2):
+            task.status = statuses[i % 2]
+            task.save()
+        board = Board.objects.get(user_id=user_id)
+        old = [Task(user_id=user_id, title=f"Old {i}", priority="high", board=board) for i in range(MAX_ITEMS)]
+        Task.objects.bulk_create(old)
+        Task.objects.filter(title__startswith="Old").update(date_created=datetime.now(tz=pytz.UTC) - timedelta(days=5))
+
+        users = [(user_id, username) for user_id, username, _ in self.users]
+        contexts = digest_contexts(users, datetime.now(tz=pytz.UTC))
+        first = contexts[user_id]
+        self.assertEqual(len(first["changes"]), MAX_ITEMS)
+        self.assertEqual(first["changes_count"], MAX_ITEMS + 3)
+        self.assertEqual(first["changes"][0]["new_status"], statuses[(MAX_ITEMS + 1) % 2].title)
+        self.assertEqual(len(first["overdue"]), MAX_ITEMS)
+        self.assertEqual(first["overdue_count"], MAX_ITEMS + 1)
+        # the oldest first
+        self.assertEqual(first["overdue"][0]["title"], "Renew domain")
+        second = contexts[self.users[1][0]]
+        self.assertEqual((len(second["changes"]), second["changes_count"]), (1, 1))
+        self.assertEqual((second["overdue"], second["overdue_count"]), ([], 0))
@@ -1,10 +1,12 @@
 from django.contrib.auth.models import AnonymousUser
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
-User = get_user_model()
+from task_manager.tasks.context_processors import task_count
+from task_manager.tasks.models import Board, Task
 
-from task_manager.tasks.models import Task
+User = get_user_model()
 
 from django.test import TestCase, RequestFactory, Client
 
@@ -366,3 +368,57 @@ class TasksLogicTests(TestCase):
         response_data = response.render().content.decode()
         self.assertInHTML("0 of 0 tasks completed", response_data)
         self.assertInHTML("You have no tasks.", response_data)
+
+
+class TaskListPaginationTests(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="testfs", email="test@test.in", password="test_secret")
+        self.client.login(username="testfs", password="test_secret")
+        board = Board.objects.create(title="Board", user=self.user)
+        for i in range(7):
+            Task.objects.create(title=f"Paged task {i}", priority="medium", board=board, user=self.user)
+
+    def test_cursor_links(self):
+        response = self.client.get(reverse('all-tasks'))
+        self.assertEqual(len(response.context['tasks']), 5)
+        self.assertIsNone(response.context['previous_page_url'])
+        self.assertIsNotNone(response.context['next_page_url'])
+        self.assertIsNone(response.context['paginator'])
+
+        response = self.client.get(reverse('all-tasks') + response.context['next_page_url'])
+        self.assertEqual([task.title for task in response.context['tasks']], ["Paged task 5", "Paged task 6"])
+        self.assertIsNone(response.context['next_page_url'])
+        self.assertContains(response, "Previous")
+
+        response = self.client.get(reverse('all-tasks') + "?cursor=junk")
+        self.assertEqual(response.status_code, 404)
+
+
+class TaskCountContextTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="testfs", email="test@test.in", password="test_secret")
+        self.board = Board.objects.create(title="Board", user=self.user)
+        Task.objects.create(title="Task", priority="medium", board=self.board, user=self.user)
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def test_lazy_cached_counts(self):
+        with self.assertNumQueries(0):
+            context = task_count(self.request)
+        with self.assertNumQueries(1):
+            self.assertEqual(str(context['total_tasks']), "1")
+            self.assertEqual(str(context['completed_tasks']), "0")
+        with self.assertNumQueries(0):
+            self.assertEqual(str(task_count(self.request)['total_tasks']), "1")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title="Another", priority="low", completed=True, board=self.board, user=self.user)
+        context = task_count(self.request)
+        self.assertEqual(str(context['total_tasks']), "2")
+        self.assertEqual(str(context['completed_tasks']), "1")
+
+    def test_anonymous(self):
+        self.request.user = AnonymousUser()
+        with self.assertNumQueries(0):
+            self.assertEqual(str(task_count(self.request)['total_tasks']), "0")
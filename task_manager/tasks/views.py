@@ -1,7 +1,7 @@
 
 from django.shortcuts import redirect, render
 from django.views import View
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect
 from django.views.generic.list import ListView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 
@@ -14,6 +14,9 @@ from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.views import LoginView
 from django import forms
 from task_manager.tasks.models import Task, Report
+from task_manager.tasks.pagination import keyset_page
+from task_manager.tasks.search import search_tasks
+from rest_framework.exceptions import ValidationError as InvalidCursor
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 
@@ -36,6 +39,44 @@ class AuthorizedUserMixin(LoginRequiredMixin):
         return _from if _from else '/tasks/'
 
 
+class KeysetPaginationMixin:
+    """
+    Paginates a ListView with a cursor on `keyset_ordering` instead of page
+    numbers, so deep pages run no OFFSET and no COUNT(*). Search results are
+    paginated by rank.
+    """
+    keyset_ordering = ('priority', 'id')
+    search_ordering = ('-search_rank', 'id')
+
+    def get_keyset_ordering(self):
+        if self.request.GET.get('search'):
+            return self.search_ordering
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            tasks, next_cursor, previous_cursor = keyset_page(
+                queryset, self.get_keyset_ordering(), self.request.GET.get('cursor'), page_size)
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        self.next_page_url = self.get_page_url(next_cursor)
+        self.previous_page_url = self.get_page_url(previous_cursor)
+        return (None, None, tasks, bool(next_cursor or previous_cursor))
+
+    def get_page_url(self, cursor):
+        if cursor is None:
+            return None
+        query = self.request.GET.copy()
+        query['cursor'] = cursor
+        return '?' + query.urlencode()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['next_page_url'] = self.next_page_url
+        context['previous_page_url'] = self.previous_page_url
+        return context
+
+
 def index(request):
     return render(request, 'index.html')
 
@@ -256,15 +297,15 @@ class CompleteTaskView(AuthorizedUserMixin, View):
     def get(self, request, *args, **kwargs):
         task = get_object_or_404(
             self.get_queryset(), external_id=self.kwargs['slug'])
-        task.status = "completed"
-        task.save()
+        task.completed = True
+        task.save(update_fields=["completed"])
         _from = request.GET.get('next')
         return redirect(_from) if _from else redirect('/tasks/')
 
 # View all tasks
 
 
-class GenericListView(AuthorizedUserMixin, ListView):
+class GenericListView(KeysetPaginationMixin, AuthorizedUserMixin, ListView):
     template_name = 'tasks.html'
     context_object_name = 'tasks'
     paginate_by = 5
@@ -274,13 +315,13 @@ class GenericListView(AuthorizedUserMixin, ListView):
         tasks = super().get_queryset().filter(
             status='pending', completed=False).order_by('priority')
         if search_query:
-            tasks = tasks.filter(title__icontains=search_query)
+            tasks = search_tasks(tasks, search_query)
         return tasks
 
 # View all completed tasks
 
 
-class GenericCompletedListView(AuthorizedUserMixin, ListView):
+class GenericCompletedListView(KeysetPaginationMixin, AuthorizedUserMixin, ListView):
     template_name = 'tasks.html'
     context_object_name = 'tasks'
     paginate_by = 5
@@ -291,10 +332,11 @@ class GenericCompletedListView(AuthorizedUserMixin, ListView):
             status='completed'
             ).order_by('priority')
         if search_query:
-            tasks = tasks.filter(title__icontains=search_query)
+            tasks = search_tasks(tasks, search_query)
         return tasks
 
-class GenericInProgressListView(AuthorizedUserMixin, ListView):
+
+class GenericInProgressListView(KeysetPaginationMixin, AuthorizedUserMixin, ListView):
     template_name = 'tasks.html'
     context_object_name = 'tasks'
     paginate_by = 5
@@ -305,10 +347,11 @@ class GenericInProgressListView(AuthorizedUserMixin, ListView):
             status="in_progress",
             ).order_by('priority')
         if search_query:
-            tasks = tasks.filter(title__icontains=search_query)
+            tasks = search_tasks(tasks, search_query)
         return tasks
 
-class GenericCancelledListView(AuthorizedUserMixin, ListView):
+
+class GenericCancelledListView(KeysetPaginationMixin, AuthorizedUserMixin, ListView):
     template_name = 'tasks.html'
     context_object_name = 'tasks'
     paginate_by = 5
@@ -319,13 +362,13 @@ class GenericCancelledListView(AuthorizedUserMixin, ListView):
             status="cancelled",
             ).order_by('priority')
         if search_query:
-            tasks = tasks.filter(title__icontains=search_query)
+            tasks = search_tasks(tasks, search_query)
         return tasks
 
 # view all tasks and completed tasks
 
 
-class GenericAllTaskView(AuthorizedUserMixin, ListView):
+class GenericAllTaskView(KeysetPaginationMixin, AuthorizedUserMixin, ListView):
     template_name = 'tasks.html'
     context_object_name = 'tasks'
     paginate_by = 5
@@ -334,7 +377,7 @@ class GenericAllTaskView(AuthorizedUserMixin, ListView):
         search_query = self.request.GET.get('search')
         tasks = super().get_queryset().order_by('priority')
         if search_query:
-            tasks = tasks.filter(title__icontains=search_query)
+            tasks = search_tasks(tasks, search_query)
         return tasks
 
 